@@ -61,6 +61,12 @@ function PSO({ csvData }) {
   // State variables for handling API call and response
   const [loading, setLoading] = useState(false);
   const [responseData, setResponseData] = useState(null);
+  const [partialSolutions, setPartialSolutions] = useState(null);
+
+  // Graphs are rendered by the server on request; each is fetched when its panel is opened
+  const [graphTaskId, setGraphTaskId] = useState(null);
+  const [graphImages, setGraphImages] = useState({});
+  const [loadingGraphs, setLoadingGraphs] = useState({});
 
   // For polling
   const [taskId, setTaskId] = useState(null);
@@ -215,6 +221,58 @@ function PSO({ csvData }) {
     }
   };
 
+  // Fetch one graph the server renders on request
+  const fetchGraph = async (task_id, name) => {
+    try {
+      const response = await fetch(
+        `${import.meta.env.VITE_APP_API_URL}/api/graphs/${task_id}/${name}/`
+      );
+      if (!response.ok) return null;
+      const graph = await response.json();
+      return graph.image || null;
+    } catch (error) {
+      console.error(`Error fetching graph ${name}:`, error);
+      return null;
+    }
+  };
+
+  const resetGraphs = (task_id = null, images = {}) => {
+    setGraphTaskId(task_id);
+    setGraphImages(images);
+    setLoadingGraphs({});
+  };
+
+  // Load a graph when its panel is opened; already loaded graphs are kept
+  const loadGraph = async (name) => {
+    if (graphImages[name] || loadingGraphs[name] || !graphTaskId) return;
+    setLoadingGraphs((prev) => ({ ...prev, [name]: true }));
+    const image = await fetchGraph(graphTaskId, name);
+    if (image) {
+      setGraphImages((prev) => ({ ...prev, [name]: image }));
+    } else {
+      toast.error(`Could not load graph ${name}`);
+    }
+    setLoadingGraphs((prev) => ({ ...prev, [name]: false }));
+  };
+
+  // Names of the graphs of a result; older results carry the images themselves
+  const resultGraphNames = (data) =>
+    data.graph_names || Object.keys(data.combined_graphs || {});
+
+  // The ZIP needs every graph, so only the ones not opened yet are fetched here
+  const handleDownloadAllGraphs = async (graphNames) => {
+    const missing = graphNames.filter((name) => !graphImages[name]);
+    const images = await Promise.all(
+      missing.map((name) => fetchGraph(graphTaskId, name))
+    );
+    const graphs = { ...graphImages };
+    missing.forEach((name, index) => {
+      if (images[index]) graphs[name] = images[index];
+    });
+    setGraphImages(graphs);
+    handleDownloadAllAsZip(graphs, 'visualization');
+  };
+
   // Function to poll the Celery task status
   const pollTaskStatus = async (task_id) => {
     try {
@@ -272,6 +330,26 @@ function PSO({ csvData }) {
                       };
                       transformedTable.push(flatRow);
                     });
+                  } else if (modelData && Array.isArray(modelData.solutions)) {
+                    // Columnar result: one array per field, one solutions row per run
+                    modelData.solutions.forEach((solution, index) => {
+                      const flatRow = {
+                        Model: modelName,
+                        SolutionIndex: index,
+                        Prediction: modelData.prediction[index],
+                        Error: modelData.error[index],
+                        Runtime: modelData.runtime[index],
+                        Fopt: modelData.fopt[index],
+                      };
+                      // Error of the PSO optimum before local refinement, when enabled
+                      if (modelData.pre_refine_error && modelData.pre_refine_error[index] !== null) {
+                        flatRow.PreRefineError = modelData.pre_refine_error[index];
+                      }
+                      (data.features || []).forEach((feature, i) => {
+                        flatRow[feature] = solution[i];
+                      });
+                      transformedTable.push(flatRow);
+                    });
                   }
                 });
 
@@ -283,6 +361,8 @@ function PSO({ csvData }) {
             }
           });
 
+          // Graphs are no longer part of the task result; they are fetched when opened
+          resetGraphs(task_id, data.combined_graphs || {});
           setResponseData(data);
         } else {
           // If there's an error or no results
@@ -300,6 +380,15 @@ function PSO({ csvData }) {
       } else {
         // STILL PENDING or IN PROGRESS. Just keep polling.
         console.log(`Task status: ${data.status}`);
+
+        // Show the best solutions found so far while the sweep runs
+        if (data.runs_total) {
+          const done = Math.floor((100 * data.runs_completed) / data.runs_total);
+          setProgress((prev) => Math.max(prev, Math.min(done, 96)));
+        }
+        if (data.best_solutions && data.best_solutions.length > 0) {
+          setPartialSolutions(data.best_solutions);
+        }
       }
     } catch (error) {
       console.error('Polling error:', error);
@@ -324,6 +413,8 @@ function PSO({ csvData }) {
 
     setLoading(true);
     setResponseData(null);
+    resetGraphs();
+    setPartialSolutions(null);
     setTaskId(null);
 
     const requestData = {
@@ -384,6 +475,9 @@ function PSO({ csvData }) {
 
         console.log('Task ID:', data.task_id);
         setTaskId(data.task_id);
+        if (data.reused) {
+          toast.info('An identical optimization was submitted recently; showing its results.');
+        }
 
         // Start polling every 3 seconds
         pollIntervalRef.current = setInterval(
@@ -549,6 +643,8 @@ function PSO({ csvData }) {
       setSelectedFeaturesForBounds([]);
       setHyperparameterBounds({});
       setResponseData(null);
+      resetGraphs();
+      setPartialSolutions(null);
       setTaskId(null); // Clear task ID
       // Clear any ongoing PSO operations
       if (pollIntervalRef.current) {
@@ -827,6 +923,23 @@ function PSO({ csvData }) {
             </div>
           )}
 
+          {/* Best solutions so far, while the optimization is still running */}
+          {loading && partialSolutions && (
+            <div className="mt-12">
+              <Typography variant="h4" className="!font-medium" gutterBottom>
+                Best Solutions So Far
+              </Typography>
+              <AgGridAutoDataComponent
+                rowData={partialSolutions}
+                rowHeight={50}
+                paginationPageSize={10}
+                headerHeight={50}
+                download={false}
+                height="400px"
+              />
+            </div>
+          )}
+
           {/* Show final results once SUCCESS */}
           {responseData &&
             responseData.results &&
@@ -992,7 +1105,7 @@ function PSO({ csvData }) {
                   );
                 })}
 
-                {responseData.combined_graphs && (
+                {resultGraphNames(responseData).length > 0 && (
                                       <div className="mt-16">
                                             <Typography
                         variant="h5"
@@ -1003,14 +1116,29 @@ function PSO({ csvData }) {
                       </Typography>
 
                       <div className="grid grid-cols-2 gap-8">
-                      {Object.entries(responseData.combined_graphs).map(
-                        ([key, b64]) => (
+                      {resultGraphNames(responseData).map((key) => {
+                        const b64 = graphImages[key];
+                        return (
                                                       <div key={key}>
                               <Typography variant="h6" className="text-center font-semibold text-gray-600 mb-3" gutterBottom>
                                 {key.replace(/_/g, ' ').split(' ').map(word => 
                                   word.charAt(0).toUpperCase() + word.slice(1).toLowerCase()
                                 ).join(' ')}
                               </Typography>
+                              {!b64 ? (
+                              <div className="flex justify-center">
+                                <Button
+                                  variant="outlined"
+                                  size="small"
+                                  startIcon={<span>📊</span>}
+                                  disabled={!!loadingGraphs[key]}
+                                  onClick={() => loadGraph(key)}
+                                >
+                                  {loadingGraphs[key] ? 'Loading...' : 'Show Graph'}
+                                </Button>
+                              </div>
+                              ) : (
+                              <>
                               <img
                                 src={`data:image/png;base64,${b64}`}
                                 alt={key}
@@ -1043,16 +1171,18 @@ function PSO({ csvData }) {
                                   View Full Size
                                 </Button>
                               </div>
+                              </>
+                              )}
                             </div>
-                        )
-                      )}
+                        );
+                      })}
                     </div>
                     <div className="flex justify-center gap-4 mt-6">
                       <Button
                         variant="contained"
                         color="secondary"
                         startIcon={<span>📦</span>}
-                        onClick={() => handleDownloadAllAsZip(responseData.combined_graphs, 'visualization')}
+                        onClick={() => handleDownloadAllGraphs(resultGraphNames(responseData))}
                         sx={{ mb: 2 }}
                       >
                         Download All as ZIP
@@ -177,3 +177,33 @@ CORS_ALLOW_METHODS = [
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# On-disk cache of trained PSO models, reused when the same dataset is resubmitted
+PSO_MODEL_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'pso_models')
+PSO_MODEL_CACHE_MAX_ENTRIES = 20
+PSO_MODEL_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB
+
+# PNGs rendered on request from finished PSO task results
+PSO_GRAPH_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'pso_graphs')
+# Graphs are kept for this many of the most recently viewed tasks
+PSO_GRAPH_CACHE_MAX_TASKS = 200
+
+# Minimum seconds between PSO progress updates written to the Celery result backend
+PSO_PROGRESS_INTERVAL = 1.0
+
+# Best PSO solutions per dataset and target, used to warm-start later requests
+PSO_SOLUTION_STORE_DIR = os.path.join(BASE_DIR, 'cache', 'pso_solutions')
+
+# Identical PSO requests within PSO_REQUEST_TTL seconds reuse the first task and its result (0 disables)
+PSO_REQUEST_STORE_DIR = os.path.join(BASE_DIR, 'cache', 'pso_requests')
+PSO_REQUEST_TTL = 600
+
+# Trained SMILES-generation VAEs, reused by requests on the same data and configs
+SMILES_VAE_REGISTRY_DIR = os.path.join(BASE_DIR, 'cache', 'smiles_vae')
+SMILES_VAE_REGISTRY_MAX_ENTRIES = 20
+# Upper bound on the molecules drawn by one sampling request
+SMILES_SAMPLING_MAX_SAMPLES = 100_000
+
+# Generated SMILES are checked with RDKit in chunks of SMILES_FILTER_CHUNK_SIZE over this many processes
+SMILES_FILTER_WORKERS = 4
+SMILES_FILTER_CHUNK_SIZE = 2000
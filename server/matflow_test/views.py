@@ -718,7 +718,7 @@ def filter_result(data, filter_var, filter_operator, filter_value):
 
 
 from .utils import objective_function  # Import the objective function
-from pyswarm import pso
+from pso.swarm import pso
 
 
 class PsoOptimizeModel(APIView):
@@ -741,8 +741,9 @@ class PsoOptimizeModel(APIView):
         minfunc = data.get('minfunc', 1e-8)
         debug = data.get('debug', True)
 
-        best_params, best_mse = pso(
-            objective_function,
+        # The swarm is scored as a whole; the objective trains one model per particle
+        best_params, best_mse, _ = pso(
+            lambda X, *args: [objective_function(x, *args) for x in X],
             lb, ub,
             args=(model_type, X_train_scaled, y_train, X_test_scaled, y_test, debug),
             swarmsize=swarmsize,
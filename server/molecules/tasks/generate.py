@@ -2,7 +2,7 @@
 from __future__ import annotations
 from celery import shared_task
 
-from molecules.utils.generate import generate_smiles
+from molecules.utils.generate import generate_smiles_with_model, sample_smiles
 
 
 @shared_task(bind=True)
@@ -12,8 +12,9 @@ def smiles_generation_task(self, payload: dict) -> dict:
     `payload` is exactly what came from the POST body.
     """
     try:
-        results = generate_smiles(**payload)
-        return {"results": results}          # shown when state == SUCCESS
+        results, model_id, summary = generate_smiles_with_model(**payload)
+        # model_id lets later requests sample from the stored VAE without retraining
+        return {"results": results, "model_id": model_id, "summary": summary}          # shown when state == SUCCESS
     except Exception as exc:
         # store the traceback/message inside Celery so the polling API can expose it
         error_msg = str(exc)
@@ -31,3 +32,29 @@ def smiles_generation_task(self, payload: dict) -> dict:
             "exc_type": type(exc).__name__,
             "status": "FAILURE"
         }
+
+
+@shared_task(bind=True)
+def smiles_sampling_task(self, payload: dict) -> dict:
+    """
+    Sample molecules from a stored VAE in the background.
+    `payload` is exactly what came from the POST body.
+    """
+    try:
+        results, model_id, summary = sample_smiles(**payload)
+        return {"results": results, "model_id": model_id, "summary": summary}
+    except Exception as exc:
+        error_msg = str(exc)
+        self.update_state(
+            state="FAILURE",
+            meta={
+                "error": error_msg,
+                "exc_type": type(exc).__name__,
+                "status": "FAILURE"
+            }
+        )
+        return {
+            "error": error_msg,
+            "exc_type": type(exc).__name__,
+            "status": "FAILURE"
+        }
@@ -0,0 +1,257 @@
+import importlib.util
+import json
+import os
+import tempfile
+import time
+from unittest import mock, skipUnless
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from .utils.vae_registry import VAERegistry
+
+HAS_RDKIT = importlib.util.find_spec("rdkit") is not None
+HAS_SELFIES = importlib.util.find_spec("selfies") is not None
+HAS_TENSORFLOW = importlib.util.find_spec("tensorflow") is not None
+
+if HAS_RDKIT:
+    from .utils import candidates
+if HAS_RDKIT and HAS_TENSORFLOW:
+    from .utils import generate
+
+
+class _Model:
+    """Stands in for a keras model; only `save_weights` is used by the registry"""
+
+    def save_weights(self, path):
+        with open(path, "w") as f:
+            f.write("weights")
+
+
+def _model_id(n):
+    return f"{n:064x}"
+
+
+class VAERegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.registry = VAERegistry(self.directory.name, max_entries=2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        self.assertIsNone(self.registry.get(_model_id(1)))
+        self.registry.put(_model_id(1), {"encoder": _Model(), "decoder": _Model()}, {"max_len": 12})
+        self.assertEqual(self.registry.get(_model_id(1))["max_len"], 12)
+        self.assertTrue(os.path.exists(self.registry.weights_path(_model_id(1), "encoder")))
+        self.assertTrue(os.path.exists(self.registry.weights_path(_model_id(1), "decoder")))
+        # No temporary directory is left behind
+        self.assertEqual(os.listdir(self.directory.name), [_model_id(1)])
+
+    def test_evicts_least_recently_used(self):
+        for n in (1, 2):
+            self.registry.put(_model_id(n), {"encoder": _Model()}, {"n": n})
+            # mtime resolution
+            time.sleep(0.02)
+        self.assertIsNotNone(self.registry.get(_model_id(1)))
+        time.sleep(0.02)
+        self.registry.put(_model_id(3), {"encoder": _Model()}, {"n": 3})
+
+        self.assertIsNotNone(self.registry.get(_model_id(1)))
+        self.assertIsNone(self.registry.get(_model_id(2)))
+        self.assertIsNotNone(self.registry.get(_model_id(3)))
+
+    def test_unreadable_meta_is_a_miss(self):
+        os.makedirs(self.registry.path(_model_id(1)))
+        with open(os.path.join(self.registry.path(_model_id(1)), "meta.json"), "w") as f:
+            f.write("{")
+        self.assertIsNone(self.registry.get(_model_id(1)))
+        with open(os.path.join(self.registry.path(_model_id(1)), "meta.json"), "w") as f:
+            json.dump({"max_len": 3}, f)
+        self.assertEqual(self.registry.get(_model_id(1)), {"max_len": 3})
+
+    def test_rejects_invalid_model_ids(self):
+        for model_id in ("", "abc", "../" + _model_id(1)[3:], "A" * 64):
+            with self.assertRaises(ValueError):
+                self.registry.path(model_id)
+
+
+@skipUnless(HAS_RDKIT and HAS_TENSORFLOW, "needs TensorFlow and RDKit")
+class VAEModelIdTests(SimpleTestCase):
+    smiles = ["CCO", "c1ccccc1", "CC(=O)O"]
+
+    def test_ignores_pipeline_fields(self):
+        model_id = generate.vae_model_id(self.smiles, generate.VAEConfig(), generate.TrainCfg())
+        pipeline = dict(zip(generate.PIPELINE_FIELDS, (1, 4, 2)))
+        self.assertEqual(generate.vae_model_id(self.smiles, generate.VAEConfig(), generate.TrainCfg(**pipeline)),
+                         model_id)
+
+    def test_depends_on_data_and_training_configs(self):
+        model_id = generate.vae_model_id(self.smiles, generate.VAEConfig(), generate.TrainCfg())
+        self.assertRegex(model_id, r"^[0-9a-f]{64}$")
+        for smiles, vcfg, tcfg in (
+                (self.smiles[::-1], generate.VAEConfig(), generate.TrainCfg()),
+                (self.smiles, generate.VAEConfig(epochs=1), generate.TrainCfg()),
+                (self.smiles, generate.VAEConfig(), generate.TrainCfg(random_state=0)),
+        ):
+            self.assertNotEqual(generate.vae_model_id(smiles, vcfg, tcfg), model_id)
+
+
+@skipUnless(HAS_RDKIT and HAS_TENSORFLOW, "needs TensorFlow and RDKit")
+class LengthBucketedDatasetTests(SimpleTestCase):
+    def test_batches_are_padded_to_their_longest_row(self):
+        lengths = np.array([2, 9, 3, 8, 2, 9, 4, 1])
+        X = np.zeros((len(lengths), 10), dtype=np.int32)
+        for i, n in enumerate(lengths):
+            X[i, :n] = i + 1
+
+        ds = generate.length_bucketed_dataset(X, lengths, batch_size=3, tcfg=generate.TrainCfg(n_buckets=2))
+        rows = []
+        for batch in ds:
+            batch = batch.numpy()
+            batch_lengths = (batch != 0).sum(axis=1)
+            self.assertEqual(batch.shape[1], batch_lengths.max())
+            rows.extend(row[0] - 1 for row in batch)
+        # Every row exactly once, with its tokens intact
+        self.assertEqual(sorted(rows), list(range(len(lengths))))
+
+
+@skipUnless(HAS_RDKIT and HAS_TENSORFLOW, "needs TensorFlow and RDKit")
+class TokenizerTests(SimpleTestCase):
+    smiles = ["CC(=O)Oc1ccccc1C(=O)O", "Clc1ccc(Br)cc1", "C[C@@H](N)C(=O)[O-].[Na+]", "C%12CCCCC%12", "", "C"]
+
+    def test_round_trip(self):
+        tokens, lengths = generate.tokenize_batch(self.smiles)
+        self.assertEqual(lengths.tolist(), [len(generate.tokenize(s)) for s in self.smiles])
+        self.assertEqual(lengths.sum(), len(tokens))
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.assertEqual(["".join(tokens[a:b]) for a, b in zip(offsets[:-1], offsets[1:])], self.smiles)
+
+    def test_multi_character_tokens(self):
+        self.assertEqual(generate.tokenize("Clc1ccc(Br)cc1")[:2], ["Cl", "c"])
+        self.assertIn("Br", generate.tokenize("Clc1ccc(Br)cc1"))
+        self.assertEqual(generate.tokenize("C[C@@H](N)[O-]"), ["C", "[C@@H]", "(", "N", ")", "[O-]"])
+        self.assertEqual(generate.tokenize("C%12CC%12"), ["C", "%12", "C", "C", "%12"])
+
+    def test_empty_batch(self):
+        tokens, lengths = generate.tokenize_batch([])
+        self.assertEqual((len(tokens), len(lengths)), (0, 0))
+
+    def test_unknown_tokenizer(self):
+        with self.assertRaises(ValueError):
+            generate.tokenize_batch(["CCO"], "bpe")
+
+    @skipUnless(HAS_SELFIES, "needs selfies")
+    def test_selfies_round_trip(self):
+        smiles = ["CCO", "c1ccccc1Cl"]
+        tokens, lengths = generate.tokenize_batch(smiles, "selfies")
+        self.assertTrue(all(t.startswith("[") for t in tokens))
+        tok2i, i2tok = generate.build_vocab(tokens)
+        X = generate.encode(tokens, lengths, tok2i, int(lengths.max()))
+        decoded = generate.detokenize(X, i2tok, "selfies")
+        self.assertEqual(decoded[0], "CCO")
+        self.assertEqual(generate.tokenize(decoded[1]), generate.tokenize("C1=CC=CC=C1Cl"))
+
+    def test_encode_matches_row_by_row(self):
+        tokens, lengths = generate.tokenize_batch(self.smiles)
+        tok2i, i2tok = generate.build_vocab(tokens)
+        self.assertNotIn(0, i2tok)
+        pad_len = 8
+        X = generate.encode(tokens, lengths, tok2i, pad_len)
+
+        self.assertEqual(X.shape, (len(self.smiles), pad_len))
+        for row, s in zip(X, self.smiles):
+            ids = [tok2i[t] for t in generate.tokenize(s)][:pad_len]
+            self.assertEqual(row.tolist(), ids + [0] * (pad_len - len(ids)))
+        # Rows that were not cut decode back to their SMILES
+        self.assertEqual(generate.detokenize(X, i2tok)[-2:], self.smiles[-2:])
+
+    def test_encode_maps_unknown_tokens_to_pad(self):
+        tokens, lengths = generate.tokenize_batch(["CCO", "CBr"])
+        X = generate.encode(tokens, lengths, {"C": 1, "O": 2}, 4)
+        self.assertEqual(X.tolist(), [[1, 1, 2, 0], [1, 0, 0, 0]])
+
+
+def _info(canonical, key, rings=1):
+    return canonical, key, "C6H6", rings
+
+
+@skipUnless(HAS_RDKIT, "needs RDKit")
+class FilterCandidatesTests(SimpleTestCase):
+    def test_deduplicates_by_inchikey(self):
+        infos = [_info("c1ccccc1", "A"), None, _info("C1=CC=CC=C1", "A"), _info("C1CC1", "B"), _info("CCO", "C", rings=0)]
+        kept, summary = candidates.filter_candidates(infos)
+        self.assertEqual(kept, [(0, "c1ccccc1", "C6H6"), (3, "C1CC1", "C6H6")])
+        self.assertEqual({k: summary[k] for k in ("generated", "valid", "unique", "kept")},
+                         {"generated": 5, "valid": 4, "unique": 3, "kept": 2})
+        self.assertAlmostEqual(summary["validity"], 4 / 5)
+        self.assertAlmostEqual(summary["uniqueness"], 3 / 4)
+        self.assertIsNone(summary["novel"])
+        self.assertIsNone(summary["novelty"])
+
+    def test_drops_training_molecules(self):
+        infos = [_info("c1ccccc1", "A"), _info("C1CC1", "B"), _info("C1CC1", "B"), _info("CCO", "C", rings=0)]
+        kept, summary = candidates.filter_candidates(infos, training_keys={"A"})
+        self.assertEqual([i for i, _, _ in kept], [1])
+        self.assertEqual((summary["unique"], summary["novel"]), (3, 2))
+        self.assertAlmostEqual(summary["novelty"], 2 / 3)
+
+    def test_empty_batch(self):
+        kept, summary = candidates.filter_candidates([], training_keys=set())
+        self.assertEqual(kept, [])
+        self.assertEqual((summary["validity"], summary["uniqueness"], summary["novelty"]), (0.0, 0.0, 0.0))
+
+    def test_check_smiles(self):
+        infos = candidates.check_smiles(["c1ccccc1O", "C1=CC=CC=C1O", "C1CC", "", "CCO"])
+        self.assertEqual(infos[0], infos[1])
+        self.assertEqual(infos[0][2:], ("C6H6O", 1))
+        self.assertEqual(infos[2:4], [None, None])
+        self.assertEqual(infos[4][3], 0)
+        self.assertEqual(candidates.inchikeys(infos), {infos[0][1], infos[4][1]})
+
+    def test_pool_matches_serial(self):
+        smiles = ["c1ccccc1O", "CCO", "C1CC", "C1CCCCC1", "Clc1ccccc1"] * 3
+        self.assertEqual(candidates.check_all(smiles, n_workers=2, chunk_size=4), candidates.check_smiles(smiles))
+
+
+@skipUnless(HAS_RDKIT and HAS_TENSORFLOW, "needs TensorFlow and RDKit")
+class GenerateSmilesTests(SimpleTestCase):
+    smiles = ["c1ccccc1O", "CCO", "C1CCCCC1", "c1ccncc1", "CC(=O)Oc1ccccc1C(=O)O",
+              "C1CC1N", "Clc1ccccc1Br", "C[C@@H](O)c1ccccc1", "O=C1CCCN1", "c1ccc2ccccc2c1"] * 3
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = override_settings(SMILES_VAE_REGISTRY_DIR=self.directory.name, SMILES_FILTER_WORKERS=1)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.directory.cleanup()
+
+    def test_train_reuse_and_sample(self):
+        kwargs = {
+            "dataset": [{"smiles": s, "eps": i / 10} for i, s in enumerate(self.smiles)],
+            "smiles_column": "smiles",
+            "epsilon_column": "eps",
+            "vae_config": {"epochs": 1, "batch_size": 8, "latent_dim": 4, "embedding_dim": 4, "lstm_units": 8},
+            "training_config": {"n_buckets": 3},
+        }
+        results, model_id, summary = generate.generate_smiles_with_model(**kwargs)
+        self.assertIsNotNone(generate.get_vae_registry().get(model_id))
+        self.assertEqual(summary["generated"], 6)
+        self.assertEqual(len(results), summary["kept"])
+
+        # Same data and configs, other pipeline settings: loaded, not trained again
+        with mock.patch.object(generate, "train_vae") as train_vae:
+            _, reused_id, _ = generate.generate_smiles_with_model(**{**kwargs, "training_config": {"n_buckets": 1}})
+        train_vae.assert_not_called()
+        self.assertEqual(reused_id, model_id)
+
+        _, sampled_id, summary = generate.generate_smiles_with_model(model_id=model_id, n_samples=10)
+        self.assertEqual((sampled_id, summary["generated"]), (model_id, 10))
+        _, _, summary = generate.sample_smiles(model_id=model_id, n_samples=7, batch_size=3,
+                                               seed_smiles=["CCO", "c1ccccc1O"], random_state=0)
+        self.assertEqual(summary["generated"], 7)
+        with self.assertRaises(ValueError):
+            generate.sample_smiles(model_id="0" * 64)
@@ -2,7 +2,7 @@ from django.urls import path
 
 from molecules.views.Psi4DFT import Psi4DFTView
 from molecules.views.SAScore import SmilesSAScoreView
-from molecules.views.generate import SmilesGenerationView, SmilesGenerationStatusView
+from molecules.views.generate import SmilesGenerationView, SmilesGenerationStatusView, SmilesSamplingView
 from molecules.views.iupac import SmilesIupacConvertView, SmilesIupacStatusView
 from molecules.views.scaler import ScalerEvaluationView
 from molecules.views.structure import SmilesStructureGenerateView, SmilesStructureStatusView, SmilesStructureZipDownloadView
@@ -16,6 +16,7 @@ urlpatterns = [
     path("smiles-structure/download-zip/<str:task_id>/", SmilesStructureZipDownloadView.as_view(), name="smiles_struct_zip"),
     path("smiles-generation/generate/", SmilesGenerationView.as_view(), name="smiles_gen_generate"),
     path("smiles-generation/status/<str:task_id>/", SmilesGenerationStatusView.as_view(), name="smiles_gen_status"),
+    path("smiles-generation/sample/", SmilesSamplingView.as_view(), name="smiles_gen_sample"),
     path("organic-check/", organic_check_view),
     path('scale-evaluate/', ScalerEvaluationView.as_view(), name='scaler-evaluation'),
     path("smiles-sa-score/", SmilesSAScoreView.as_view(), name="smiles-sa-score"),
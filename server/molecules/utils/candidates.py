@@ -0,0 +1,107 @@
+"""
+Validity, ring and formula checks of generated SMILES.
+
+Once sampling is batched, parsing every decoded string with RDKit is the
+slowest step of generation. Candidates are therefore checked in chunks by
+a process pool. Workers are spawned and import only this module and RDKit,
+not TensorFlow, which is why it is kept apart from `generate`.
+
+Valid molecules are canonicalized and deduplicated by InChIKey. Molecules
+whose key is in the training set are dropped as reconstructions. One
+summary of aggregated counters replaces logging every molecule.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import billiard
+from rdkit import Chem, RDLogger
+from rdkit.Chem import rdMolDescriptors
+
+# (canonical SMILES, InChIKey, formula, number of rings), or None for an invalid SMILES
+MolInfo = Optional[Tuple[str, str, str, int]]
+
+
+def check_smiles(smiles: Sequence[str]) -> List[MolInfo]:
+    """Parse every SMILES of a chunk; this is the unit of work of the pool"""
+    # Every invalid candidate would otherwise log its own parse error
+    RDLogger.DisableLog("rdApp.*")
+    infos: List[MolInfo] = []
+    for s in smiles:
+        mol = Chem.MolFromSmiles(s) if s else None
+        if mol is None:
+            infos.append(None)
+            continue
+        canonical = Chem.MolToSmiles(mol)
+        # An empty key means InChI generation failed; the canonical SMILES still identifies the molecule
+        key = Chem.MolToInchiKey(mol) or canonical
+        infos.append((canonical, key, rdMolDescriptors.CalcMolFormula(mol), mol.GetRingInfo().NumRings()))
+    return infos
+
+
+def check_all(smiles: Sequence[str], n_workers: int = 1, chunk_size: int = 2000) -> List[MolInfo]:
+    """`check_smiles` of all SMILES, in order, over up to `n_workers` processes"""
+    smiles = list(smiles)
+    chunk_size = max(int(chunk_size), 1)
+    chunks = [smiles[start:start + chunk_size] for start in range(0, len(smiles), chunk_size)]
+    n_workers = min(int(n_workers or 1), os.cpu_count() or 1, len(chunks))
+    if n_workers <= 1:
+        return [info for chunk in chunks for info in check_smiles(chunk)]
+
+    # billiard (Celery's multiprocessing fork) may start children from inside a Celery worker
+    pool = billiard.get_context("spawn").Pool(processes=n_workers)
+    try:
+        return [info for infos in pool.imap(check_smiles, chunks) for info in infos]
+    finally:
+        pool.close()
+        pool.join()
+
+
+def inchikeys(infos: Iterable[MolInfo]) -> set[str]:
+    """InChIKeys of the valid molecules among `infos`"""
+    return {info[1] for info in infos if info is not None}
+
+
+def filter_candidates(
+        infos: Sequence[MolInfo],
+        training_keys: set[str] | None = None,
+) -> Tuple[List[Tuple[int, str, str]], Dict[str, Any]]:
+    """
+    Keep the first occurrence of every valid molecule with at least one ring
+    that is not in `training_keys`.
+    Returns (candidates, summary): (index in `infos`, canonical SMILES,
+    formula) of every kept molecule, and the counts and rates of the batch:
+    validity = valid / generated, uniqueness = unique / valid and
+    novelty = novel / unique (None when the training set is unknown).
+    """
+    seen: set[str] = set()
+    candidates: List[Tuple[int, str, str]] = []
+    n_valid = n_novel = 0
+    for i, info in enumerate(infos):
+        if info is None:
+            continue
+        n_valid += 1
+        canonical, key, formula, rings = info
+        if key in seen:
+            continue
+        seen.add(key)
+        if training_keys is not None:
+            if key in training_keys:
+                continue
+            n_novel += 1
+        if rings > 0:
+            candidates.append((i, canonical, formula))
+
+    n_generated, n_unique = len(infos), len(seen)
+    summary = {
+        "generated": n_generated,
+        "valid": n_valid,
+        "unique": n_unique,
+        "novel": n_novel if training_keys is not None else None,
+        "kept": len(candidates),
+        "validity": n_valid / n_generated if n_generated else 0.0,
+        "uniqueness": n_unique / n_valid if n_valid else 0.0,
+        "novelty": (n_novel / n_unique if n_unique else 0.0) if training_keys is not None else None,
+    }
+    return candidates, summary
@@ -7,18 +7,29 @@ from the POST body and get back a list of dicts ready for JSON response.
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import List, Dict, Any, Sequence
+import hashlib
+import json
+import re
+from dataclasses import asdict, dataclass
+from typing import List, Dict, Any, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 import tensorflow as tf
-from rdkit import Chem
-from rdkit.Chem import rdMolDescriptors
 from sklearn.model_selection import train_test_split
 from tensorflow.keras.layers import Input, Dense, Embedding, LSTM, Layer, Reshape
 from tensorflow.keras.models import Model
 from tensorflow.keras.optimizers import Adam
+from django.conf import settings
+
+from molecules.utils import candidates
+from molecules.utils.vae_registry import VAERegistry
+
+try:
+    import selfies as sf
+    _HAS_SELFIES = True
+except ImportError:          # selfies not installed
+    _HAS_SELFIES = False
 
 
 # ─── Dataclasses for strongly-typed configs ────────────────────────────
@@ -30,28 +41,100 @@ class VAEConfig:
     learning_rate: float = 1e-3
     embedding_dim: int = 128
     lstm_units: int = 128
+    max_len: int | None = None          # cap on tokens per SMILES; longer ones are truncated
+    tokenizer: str = "smiles"           # "smiles" or "selfies" (needs the selfies package)
 
 
 @dataclass
 class TrainCfg:
     test_size: float = 0.2
     random_state: int = 42
+    n_buckets: int = 8                  # length buckets of the training pipeline (1 = no bucketing)
+    threadpool_size: int = -1           # threads of the tf.data pipeline, -1 = TensorFlow's shared pool
+    prefetch: int = -1                  # batches prefetched, -1 = autotune
+
+
+# Input-pipeline settings of TrainCfg; they change speed, not the model, so they are not part of its id
+PIPELINE_FIELDS = ("n_buckets", "threadpool_size", "prefetch")
 
 
 # ─── Tokenisation / vocab helpers ──────────────────────────────────────
-def tokenize(smiles: str) -> list[str]: return list(smiles)
+TOKENIZERS = ("smiles", "selfies")
+
+# Bracket atoms, Cl/Br, @@ and two-digit ring bonds are single tokens; anything else is one character.
+# "\n" separates the SMILES of a batch.
+SMILES_TOKEN_RE = re.compile(r"\[[^\]]+\]|Br|Cl|@@|%\d{2}|\n|.")
+SELFIES_TOKEN_RE = re.compile(r"\[[^\]]*\]|\n|.")
+
+
+def _to_selfies(smiles: str) -> str:
+    try:
+        return sf.encoder(smiles) or ""
+    except Exception:
+        return ""
+
+
+def tokenize_batch(smiles: Sequence[str], tokenizer: str = "smiles") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tokenize all SMILES with one regex pass over the newline-joined batch.
+    Returns (tokens, lengths): every token in order as one flat array, and
+    the number of tokens of each SMILES (0 for those SELFIES cannot encode).
+    """
+    if tokenizer == "smiles":
+        strings, pattern = smiles, SMILES_TOKEN_RE
+    elif tokenizer == "selfies":
+        if not _HAS_SELFIES:
+            raise ValueError("The selfies tokenizer needs the selfies package")
+        strings, pattern = [_to_selfies(s) for s in smiles], SELFIES_TOKEN_RE
+    else:
+        raise ValueError(f"tokenizer must be one of {', '.join(TOKENIZERS)}")
+    if len(strings) == 0:
+        return np.empty(0, dtype=object), np.empty(0, dtype=int)
 
+    tokens = np.array(pattern.findall("\n".join(strings) + "\n"), dtype=object)
+    separators = tokens == "\n"
+    lengths = np.diff(np.concatenate([[-1], np.flatnonzero(separators)])) - 1
+    return tokens[~separators], lengths
 
-def build_vocab(tokenised: Sequence[Sequence[str]]):
-    uniq = sorted({t for s in tokenised for t in s})
+
+def tokenize(smiles: str, tokenizer: str = "smiles") -> list[str]:
+    return tokenize_batch([smiles], tokenizer)[0].tolist()
+
+
+def build_vocab(tokens: np.ndarray):
+    uniq = np.unique(tokens).tolist()
     tok2i = {t: i + 1 for i, t in enumerate(uniq)}  # 0 = PAD
     i2tok = {i: t for t, i in tok2i.items()}
     return tok2i, i2tok
 
 
-def encode(batch: Sequence[Sequence[str]], tok2i, pad_len: int) -> np.ndarray:
-    enc = [[tok2i.get(t, 0) for t in seq] for seq in batch]
-    return np.array([seq + [0] * (pad_len - len(seq)) for seq in enc], dtype=np.int32)
+def encode(tokens: np.ndarray, lengths: np.ndarray, tok2i, pad_len: int) -> np.ndarray:
+    """
+    (n_smiles, pad_len) id matrix of the flat `tokens` split by `lengths`,
+    filled by one scatter. Tokens past `pad_len` are cut; unknown tokens map to PAD.
+    """
+    ids = pd.Series(tokens, dtype=object).map(tok2i).fillna(0).to_numpy(dtype=np.int32)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    cols = np.arange(len(tokens)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    keep = cols < pad_len
+    X = np.zeros((len(lengths), pad_len), dtype=np.int32)
+    X[rows[keep], cols[keep]] = ids[keep]
+    return X
+
+
+def detokenize(token_ids: np.ndarray, i2tok, tokenizer: str = "smiles") -> List[str]:
+    """SMILES strings of rows of token ids; PAD ids are skipped"""
+    strings = ["".join(i2tok.get(i, "") for i in row if i) for row in token_ids]
+    if tokenizer == "selfies":
+        strings = [_from_selfies(s) for s in strings]
+    return strings
+
+
+def _from_selfies(selfies: str) -> str:
+    try:
+        return sf.decoder(selfies) or ""
+    except Exception:
+        return ""
 
 
 # ─── VAE layers & model builders ───────────────────────────────────────
@@ -63,7 +146,8 @@ class Sampling(Layer):
 
 
 def build_encoder(max_len, vocab_sz, cfg: VAEConfig):
-    inp = Input(shape=(max_len,))
+    # Any length up to max_len: training batches are only padded to their own longest SMILES
+    inp = Input(shape=(None,))
     x = Embedding(vocab_sz, cfg.embedding_dim, mask_zero=True)(inp)
     x = LSTM(cfg.lstm_units)(x)
     z_mean = Dense(cfg.latent_dim)(x)
@@ -99,7 +183,12 @@ class VAE(Model):
         return recon, z_m, z_lv
 
     def _loss(self, x, recon, z_m, z_lv):
-        rl = tf.reduce_sum(tf.keras.losses.sparse_categorical_crossentropy(x, recon), axis=1)
+        # The decoder always emits max_len positions; those past the batch length are PAD (id 0),
+        # which keeps the loss identical to that of a batch padded to max_len
+        length = tf.shape(x)[1]
+        rl = tf.reduce_sum(tf.keras.losses.sparse_categorical_crossentropy(x, recon[:, :length]), axis=1)
+        tail = tf.clip_by_value(recon[:, length:, 0], 1e-7, 1.0)
+        rl -= tf.reduce_sum(tf.math.log(tail), axis=1)
         kl = -0.5 * tf.reduce_sum(1 + z_lv - tf.square(z_m) - tf.exp(z_lv), axis=1)
         return tf.reduce_mean(rl + kl)
 
@@ -121,25 +210,262 @@ class VAE(Model):
         return {"loss": self.loss_tracker.result()}
 
 
-# ─── High-level public helper -----------------------------------------
+# ─── Model registry ─────────────────────────────────────────────────────
 from celery.utils.log import get_task_logger
 logger = get_task_logger(__name__)
 
+# Bump when the architecture or tokenisation changes, so old weights are not reused
+REGISTRY_FORMAT_VERSION = 2
+
+
+@dataclass
+class TrainedVAE:
+    model_id: str
+    encoder: Model
+    decoder: Model
+    tok2i: Dict[str, int]
+    i2tok: Dict[int, str]
+    max_len: int
+    vae_config: VAEConfig
+    n_val: int
+    training_keys: set[str] | None = None   # InChIKeys of the training SMILES, for novelty
+
+
+def get_vae_registry() -> VAERegistry | None:
+    """VAE registry configured in settings, or None when disabled"""
+    registry_dir = getattr(settings, "SMILES_VAE_REGISTRY_DIR", None)
+    if not registry_dir:
+        return None
+    return VAERegistry(registry_dir, max_entries=getattr(settings, "SMILES_VAE_REGISTRY_MAX_ENTRIES", 20))
+
+
+def vae_model_id(smiles: Sequence[str], vcfg: VAEConfig, tcfg: TrainCfg) -> str:
+    """Registry key of the VAE trained on `smiles` (in order) with the given configs, minus `PIPELINE_FIELDS`"""
+    dataset = hashlib.sha256("\n".join(smiles).encode("utf-8")).hexdigest()
+    blob = json.dumps({
+        "version": REGISTRY_FORMAT_VERSION,
+        "dataset": dataset,
+        "vae_config": asdict(vcfg),
+        "training_config": {k: v for k, v in asdict(tcfg).items() if k not in PIPELINE_FIELDS},
+    }, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def load_vae(model_id: str, registry: VAERegistry | None) -> TrainedVAE | None:
+    """Rebuild a stored VAE from the registry, or None if it is not stored"""
+    meta = registry.get(model_id) if registry is not None else None
+    if meta is None:
+        return None
+    vcfg = VAEConfig(**meta["vae_config"])
+    tok2i = meta["tok2i"]
+    encoder = build_encoder(meta["max_len"], len(tok2i) + 1, vcfg)
+    decoder = build_decoder(meta["max_len"], len(tok2i) + 1, vcfg)
+    encoder.load_weights(registry.weights_path(model_id, "encoder"))
+    decoder.load_weights(registry.weights_path(model_id, "decoder"))
+    i2tok = {i: t for t, i in tok2i.items()}
+    training_keys = set(meta["training_inchikeys"]) if meta.get("training_inchikeys") is not None else None
+    return TrainedVAE(model_id, encoder, decoder, tok2i, i2tok, meta["max_len"], vcfg, meta["n_val"],
+                      training_keys)
+
+
+def length_bucketed_dataset(X: np.ndarray, lengths: np.ndarray, batch_size: int, tcfg: TrainCfg,
+                            shuffle: bool = False) -> tf.data.Dataset:
+    """
+    tf.data pipeline over the padded token matrix `X`: rows are cut back to
+    their real `lengths`, grouped into `n_buckets` length buckets (boundaries
+    at length quantiles) and every batch is padded only to its own longest
+    row, so LSTM steps and activations follow the real token count.
+    """
+    ds = tf.data.Dataset.from_tensor_slices((X, lengths.astype(np.int32)))
+    # Dense rows of their own length; padded_batch does not take ragged elements
+    ds = ds.map(lambda x, n: x[:n], num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+    if shuffle:
+        ds = ds.shuffle(len(X), seed=tcfg.random_state, reshuffle_each_iteration=True)
+
+    quantiles = np.linspace(0, 1, max(tcfg.n_buckets, 1) + 1)[1:-1]
+    boundaries = sorted({int(b) + 1 for b in np.quantile(lengths, quantiles)} - {int(lengths.max()) + 1})
+    ds = ds.bucket_by_sequence_length(
+        element_length_func=lambda x: tf.shape(x)[0],
+        bucket_boundaries=boundaries,
+        bucket_batch_sizes=[batch_size] * (len(boundaries) + 1),
+    )
+
+    options = tf.data.Options()
+    if tcfg.threadpool_size > 0:
+        options.threading.private_threadpool_size = tcfg.threadpool_size
+    ds = ds.with_options(options)
+    return ds.prefetch(tf.data.AUTOTUNE if tcfg.prefetch < 0 else tcfg.prefetch)
+
+
+def train_vae(model_id, X_train, X_val, len_train, len_val, tok2i, i2tok, max_len, vcfg: VAEConfig,
+              tcfg: TrainCfg, registry: VAERegistry | None, truncation: Dict[str, Any] | None = None,
+              training_keys: set[str] | None = None) -> TrainedVAE:
+    """Train a fresh VAE on length-bucketed batches and store it in the registry"""
+    encoder = build_encoder(max_len, len(tok2i) + 1, vcfg)
+    decoder = build_decoder(max_len, len(tok2i) + 1, vcfg)
+    vae = VAE(encoder, decoder)
+    vae.compile(Adam(vcfg.learning_rate))
+    logger.info("Model compiled. Starting training...")
+
+    vae.fit(
+        length_bucketed_dataset(X_train, len_train, vcfg.batch_size, tcfg, shuffle=True),
+        epochs=vcfg.epochs,
+        validation_data=length_bucketed_dataset(X_val, len_val, vcfg.batch_size, tcfg),
+        # The pipeline shuffles itself
+        shuffle=False,
+        verbose=0,
+    )
+    logger.info("Training finished")
+
+    if registry is not None:
+        registry.put(model_id, {"encoder": encoder, "decoder": decoder}, {
+            "tok2i": tok2i,
+            "max_len": max_len,
+            "vae_config": asdict(vcfg),
+            "training_config": asdict(tcfg),
+            "n_train": len(X_train),
+            "n_val": len(X_val),
+            "truncation": truncation,
+            "training_inchikeys": sorted(training_keys) if training_keys is not None else None,
+        })
+        logger.info(f"Stored VAE {model_id[:12]} in the registry")
+    return TrainedVAE(model_id, encoder, decoder, tok2i, i2tok, max_len, vcfg, len(X_val), training_keys)
+
+
+def decode_latent(trained: TrainedVAE, z) -> List[str]:
+    """Greedy decoding of latent vectors into SMILES strings"""
+    # Only token ids are kept, so memory is bounded by one batch of logits
+    token_ids = trained.decoder.predict_on_batch(z).argmax(-1)
+    return detokenize(token_ids, trained.i2tok, trained.vae_config.tokenizer)
+
+
+def latent_batches(trained: TrainedVAE, n_samples: int, batch_size: int,
+                   seed_smiles: Sequence[str] | None = None, sigma: float = 1.0,
+                   random_state: int | None = None):
+    """
+    Yield latent vectors in batches of at most `batch_size`, `n_samples` in
+    total: drawn from the prior N(0, sigma² I), or, with `seed_smiles`,
+    around the encoded seed molecules (their posterior widened by `sigma`),
+    cycling through the seeds.
+    """
+    rng = np.random.default_rng(random_state)
+    latent_dim = trained.vae_config.latent_dim
+
+    seed_mean = seed_std = None
+    if seed_smiles:
+        tokens, lengths = tokenize_batch(seed_smiles, trained.vae_config.tokenizer)
+        X_seeds = encode(tokens, lengths, trained.tok2i, trained.max_len)[lengths > 0]
+        if len(X_seeds) == 0:
+            raise ValueError("None of the seed SMILES could be tokenized")
+        z_m, z_lv, _ = trained.encoder.predict(X_seeds, verbose=0)
+        seed_mean, seed_std = z_m, np.exp(0.5 * z_lv)
+
+    for start in range(0, n_samples, batch_size):
+        n = min(batch_size, n_samples - start)
+        eps = sigma * rng.standard_normal((n, latent_dim))
+        if seed_mean is None:
+            z = eps
+        else:
+            seeds = np.arange(start, start + n) % len(seed_mean)
+            z = seed_mean[seeds] + seed_std[seeds] * eps
+        yield z.astype(np.float32)
+
+
+def check_smiles(smiles: Sequence[str]) -> List[candidates.MolInfo]:
+    """RDKit checks of all SMILES, in chunks over the worker processes configured in settings"""
+    return candidates.check_all(
+        smiles,
+        n_workers=getattr(settings, "SMILES_FILTER_WORKERS", 1),
+        chunk_size=getattr(settings, "SMILES_FILTER_CHUNK_SIZE", 2000),
+    )
+
+
+def filter_candidates(smi_out: Sequence[str], eps_series: pd.Series,
+                      training_keys: set[str] | None = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Unique, valid SMILES with at least one ring that are not in the training
+    set, canonicalized and with their formula (see `candidates.filter_candidates`).
+    Returns (results, summary).
+    """
+    kept, summary = candidates.filter_candidates(check_smiles(smi_out), training_keys)
+    result = [{
+        "Generated_SMILES": smiles,
+        "Formula": formula,
+        "Epsilon": eps_series.iloc[i % len(eps_series)] if not eps_series.empty else None,
+        "Validity": 1,
+    } for i, smiles, formula in kept]
+
+    logger.info(f"Generated: {summary['generated']}, Valid: {summary['valid']}, Unique: {summary['unique']}, "
+                f"Novel: {summary['novel']}, Kept with rings: {summary['kept']}")
+    return result, summary
+
+
+def sample_smiles(
+        *,
+        model_id: str,
+        n_samples: int = 1000,
+        batch_size: int = 512,
+        seed_smiles: Sequence[str] | None = None,
+        sigma: float = 1.0,
+        random_state: int | None = None,
+) -> Tuple[List[Dict[str, Any]], str, Dict[str, Any]]:
+    """
+    Draw `n_samples` molecules from a stored VAE without training, decoding
+    `batch_size` latent vectors at a time (see `latent_batches`).
+    Returns the filtered candidates, the model id and the filter summary.
+    """
+    max_samples = getattr(settings, "SMILES_SAMPLING_MAX_SAMPLES", 100_000)
+    if not 0 < n_samples <= max_samples:
+        raise ValueError(f"n_samples must be between 1 and {max_samples}")
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+
+    trained = load_vae(model_id, get_vae_registry())
+    if trained is None:
+        raise ValueError(f"Unknown model_id '{model_id}'")
+
+    logger.info(f"Sampling {n_samples} molecules from VAE {model_id[:12]} in batches of {batch_size}")
+    smi_out: List[str] = []
+    for z in latent_batches(trained, n_samples, batch_size, seed_smiles, sigma, random_state):
+        smi_out.extend(decode_latent(trained, z))
+    logger.info(f"Decoded {len(smi_out)} candidate SMILES")
+
+    result, summary = filter_candidates(smi_out, pd.Series(dtype=float), trained.training_keys)
+    return result, model_id, summary
+
+
 # ─── High-level public helper -----------------------------------------
-def generate_smiles(
+def generate_smiles(**kwargs) -> List[Dict[str, Any]]:
+    """
+    Main entry point called by the DRF view.
+    Returns a list of dicts, each serialisable to JSON.
+    """
+    results, _, _ = generate_smiles_with_model(**kwargs)
+    return results
+
+
+def generate_smiles_with_model(
         *,
         dataset: List[Dict[str, Any]] = None,
         train_dataset: List[Dict[str, Any]] = None,
         test_dataset: List[Dict[str, Any]] = None,
-        training_mode: str,
-        smiles_column: str,
-        epsilon_column: str | None,
-        vae_config: Dict[str, Any],
-        training_config: Dict[str, Any],
-) -> List[Dict[str, Any]]:
+        training_mode: str = "inference",
+        smiles_column: str = None,
+        epsilon_column: str | None = None,
+        vae_config: Dict[str, Any] = None,
+        training_config: Dict[str, Any] = None,
+        model_id: str | None = None,
+        n_samples: int | None = None,
+) -> Tuple[List[Dict[str, Any]], str, Dict[str, Any]]:
     """
-    Main entry point called by the DRF view.
-    Returns a list of dicts, each serialisable to JSON.
+    Same as `generate_smiles`, also returning the id of the VAE used and the
+    validity/uniqueness/novelty summary of the generated molecules.
+
+    A VAE trained earlier on the same SMILES with the same configs is loaded
+    from the registry instead of being trained again. With `model_id` and no
+    dataset, the stored VAE only samples (see `sample_smiles`): `n_samples`
+    latent vectors (default: the size of its validation split) are drawn
+    from the prior and decoded.
     """
 
     logger.info("==== [generate_smiles] starting ====")
@@ -147,119 +473,113 @@ def generate_smiles(
     logger.debug(f"vae_config={vae_config}, training_config={training_config}")
 
     # ---- prepare configs ------------------------------------------------
-    vcfg = VAEConfig(**vae_config)
-    tcfg = TrainCfg(**training_config)
+    vcfg = VAEConfig(**(vae_config or {}))
+    tcfg = TrainCfg(**(training_config or {}))
+    registry = get_vae_registry()
+
+    if model_id is not None and dataset is None and train_dataset is None:
+        # ---- sample only, from a stored model --------------------------
+        meta = registry.get(model_id) if registry is not None else None
+        if meta is None:
+            raise ValueError(f"Unknown model_id '{model_id}'")
+        return sample_smiles(model_id=model_id, n_samples=n_samples or meta["n_val"],
+                             batch_size=vcfg.batch_size)
 
-    # Handle separate datasets or original single dataset
-    if train_dataset is not None and test_dataset is not None:
-        logger.info(f"Using train/test datasets: train={len(train_dataset)}, test={len(test_dataset)}")
-        df_train = pd.DataFrame(train_dataset)
-        df_test = pd.DataFrame(test_dataset)
-
-        if smiles_column not in df_train.columns:
-            raise ValueError(f"smiles_column '{smiles_column}' not in train dataset")
-
-        smiles_train = df_train[smiles_column].dropna().tolist()
-        logger.info(f"Loaded {len(smiles_train)} SMILES from train dataset")
+    else:
+        # Handle separate datasets or original single dataset
+        if train_dataset is not None and test_dataset is not None:
+            logger.info(f"Using train/test datasets: train={len(train_dataset)}, test={len(test_dataset)}")
+            df_train = pd.DataFrame(train_dataset)
+            df_test = pd.DataFrame(test_dataset)
 
-        # Build vocab only from training data
-        toks_train = [tokenize(s) for s in smiles_train]
-        tok2i, i2tok = build_vocab(toks_train)
-        max_len = max(map(len, toks_train))
-        logger.info(f"Vocab size={len(tok2i)}, max_len={max_len}")
+            if smiles_column not in df_train.columns:
+                raise ValueError(f"smiles_column '{smiles_column}' not in train dataset")
 
-        X_train = encode(toks_train, tok2i, max_len)
-        logger.info(f"Encoded training set shape={X_train.shape}")
+            smiles_list = df_train[smiles_column].dropna().tolist()
+            logger.info(f"Loaded {len(smiles_list)} SMILES from train dataset")
 
-        # Create validation set by splitting training data
-        X_train_split, X_val = train_test_split(
-            X_train, test_size=tcfg.test_size, random_state=tcfg.random_state
-        )
-        logger.info(f"Train split={X_train_split.shape}, Val split={X_val.shape}")
+            # Use test dataset for epsilon values
+            eps_series = df_test[epsilon_column] if epsilon_column and epsilon_column in df_test else pd.Series()
 
-        # Use test dataset for epsilon values
-        eps_series = df_test[epsilon_column] if epsilon_column and epsilon_column in df_test else pd.Series()
-        logger.info(f"Epsilon series length={len(eps_series)}")
+        else:
+            logger.info("Using single dataset mode")
+            if dataset is None:
+                raise ValueError("Either provide 'dataset' or both 'train_dataset' and 'test_dataset'")
 
-    else:
-        logger.info("Using single dataset mode")
-        if dataset is None:
-            raise ValueError("Either provide 'dataset' or both 'train_dataset' and 'test_dataset'")
+            df = pd.DataFrame(dataset)
+            if smiles_column not in df.columns:
+                raise ValueError(f"smiles_column '{smiles_column}' not in payload")
 
-        df = pd.DataFrame(dataset)
-        if smiles_column not in df.columns:
-            raise ValueError(f"smiles_column '{smiles_column}' not in payload")
+            smiles_list = df[smiles_column].dropna().tolist()
+            logger.info(f"Loaded {len(smiles_list)} SMILES from dataset")
 
-        smiles_list = df[smiles_column].dropna().tolist()
-        logger.info(f"Loaded {len(smiles_list)} SMILES from dataset")
+            eps_series = df[epsilon_column] if epsilon_column and epsilon_column in df else pd.Series()
+        logger.info(f"Epsilon series length={len(eps_series)}")
 
-        toks = [tokenize(s) for s in smiles_list]
-        tok2i, i2tok = build_vocab(toks)
-        max_len = max(map(len, toks))
+        tokens, lengths = tokenize_batch(smiles_list, vcfg.tokenizer)
+        if not lengths.any():
+            raise ValueError("No SMILES could be tokenized")
+        model_id = vae_model_id(smiles_list, vcfg, tcfg)
+        trained = load_vae(model_id, registry)
+
+        truncation = None
+        if trained is not None:
+            # The vocabulary and max_len were built with the stored model
+            tok2i, i2tok, max_len = trained.tok2i, trained.i2tok, trained.max_len
+        else:
+            # Build vocab only from training data
+            tok2i, i2tok = build_vocab(tokens)
+            max_len = int(lengths.max())
+
+        # Optional cap on the sequence length: one very long SMILES would otherwise set it for all
+        if trained is None and vcfg.max_len and max_len > vcfg.max_len:
+            truncation = {
+                "max_len": vcfg.max_len,
+                "longest": max_len,
+                "truncated_smiles": int((lengths > vcfg.max_len).sum()),
+                "dropped_tokens": int(np.maximum(lengths - vcfg.max_len, 0).sum()),
+                "total_tokens": int(lengths.sum()),
+            }
+            logger.info(f"Truncating {truncation['truncated_smiles']} of {len(lengths)} SMILES to "
+                        f"{vcfg.max_len} tokens ({truncation['dropped_tokens']} of "
+                        f"{truncation['total_tokens']} tokens dropped)")
+            max_len = vcfg.max_len
         logger.info(f"Vocab size={len(tok2i)}, max_len={max_len}")
 
-        enc_all = encode(toks, tok2i, max_len)
+        # SMILES without tokens (not encodable as SELFIES) are left out
+        enc_all = encode(tokens, lengths, tok2i, max_len)[lengths > 0]
+        lengths = np.minimum(lengths[lengths > 0], max_len)
         logger.info(f"Encoded dataset shape={enc_all.shape}")
 
-        X_train_split, X_val = train_test_split(
-            enc_all, test_size=tcfg.test_size, random_state=tcfg.random_state
+        X_train_split, X_val, len_train, len_val = train_test_split(
+            enc_all, lengths, test_size=tcfg.test_size, random_state=tcfg.random_state
         )
         logger.info(f"Train split={X_train_split.shape}, Val split={X_val.shape}")
 
-        eps_series = df[epsilon_column] if epsilon_column and epsilon_column in df else pd.Series()
-        logger.info(f"Epsilon series length={len(eps_series)}")
-
-    # ---- model build ----------------------------------------------------
-    encoder = build_encoder(max_len, len(tok2i) + 1, vcfg)
-    decoder = build_decoder(max_len, len(tok2i) + 1, vcfg)
-    vae = VAE(encoder, decoder)
-    vae.compile(Adam(vcfg.learning_rate))
-    logger.info("Model compiled. Starting training...")
-
-    vae.fit(
-        X_train_split,
-        epochs=vcfg.epochs,
-        batch_size=vcfg.batch_size,
-        validation_data=(X_val,),
-        verbose=0,
-    )
-    logger.info("Training finished")
-
-    # ---- sample latent --------------------------------------------------
-    z_m, z_lv, _ = encoder.predict(X_val, verbose=0)
-    logger.debug(f"Latent mean shape={z_m.shape}, logvar shape={z_lv.shape}")
-    z = z_m + tf.exp(0.5 * z_lv) * tf.random.normal(tf.shape(z_m))
-    logits = decoder.predict(z, verbose=0)
-    logger.info(f"Generated logits shape={logits.shape}")
+        # ---- model build ------------------------------------------------
+        # InChIKeys of the training set, to drop generated molecules that only reproduce it
+        training_keys = trained.training_keys if trained is not None else None
+        if training_keys is None:
+            training_keys = candidates.inchikeys(check_smiles(smiles_list))
+
+        if trained is not None:
+            logger.info(f"Reusing stored VAE {model_id[:12]}")
+        else:
+            trained = train_vae(model_id, X_train_split, X_val, len_train, len_val, tok2i, i2tok, max_len,
+                                vcfg, tcfg, registry, truncation, training_keys)
+
+        # ---- sample latent ----------------------------------------------
+        z_m, z_lv, _ = trained.encoder.predict(X_val, verbose=0)
+        logger.debug(f"Latent mean shape={z_m.shape}, logvar shape={z_lv.shape}")
+        z = (z_m + tf.exp(0.5 * z_lv) * tf.random.normal(tf.shape(z_m))).numpy()
+        smi_out = []
+        for start in range(0, len(z), vcfg.batch_size):
+            smi_out.extend(decode_latent(trained, z[start:start + vcfg.batch_size]))
 
-    smi_out = ["".join(i2tok.get(i, "") for i in row.argmax(1) if i) for row in logits]
     logger.info(f"Decoded {len(smi_out)} candidate SMILES")
 
     # ---- ring filter ----------------------------------------------------
-    result: list[dict[str, Any]] = []
-    valid_count = 0
-    ring_count = 0
-    total_generated = len(smi_out)
-
-    for i, s in enumerate(smi_out):
-        mol = Chem.MolFromSmiles(s)
-        logger.debug(f"{i}: raw='{s}' -> mol={mol}")
-        if mol:
-            valid_count += 1
-            rings = mol.GetRingInfo().NumRings()
-            if rings > 0:
-                ring_count += 1
-                logger.info(f"{i}: VALID with {rings} ring(s): {s}")
-                result.append({
-                    "Generated_SMILES": s,
-                    "Formula": rdMolDescriptors.CalcMolFormula(mol),
-                    "Epsilon": eps_series.iloc[i % len(eps_series)] if not eps_series.empty else None,
-                    "Validity": 1,
-                })
-            else:
-                logger.debug(f"{i}: valid molecule but no rings: {s}")
-
-    logger.info(f"Generated: {total_generated}, Valid: {valid_count}, With rings: {ring_count}")
+    result, summary = filter_candidates(smi_out, eps_series, training_keys)
     logger.info("==== [generate_smiles] finished ====")
 
-    return result
\ No newline at end of file
+    return result, model_id, summary
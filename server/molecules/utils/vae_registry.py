@@ -0,0 +1,80 @@
+"""
+On-disk registry of trained SMILES VAEs.
+
+Training the generation VAE takes minutes, so every trained encoder/decoder
+pair is kept here together with what is needed to use it again: the token
+vocabulary, `max_len` and the configs it was trained with. An entry is a
+directory named by the model id (see `generate.vae_model_id`) holding one
+`<name>.weights.h5` file per model and a `meta.json`. Entries are written
+to a temporary directory and renamed into place, so readers never see a
+partial entry; the least recently used entries beyond `max_entries` are
+deleted.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import time
+from typing import Any, Dict
+
+
+class VAERegistry:
+    """Trained VAE weights and metadata keyed by model id"""
+
+    def __init__(self, directory: str, max_entries: int = 20):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, model_id: str) -> str:
+        if not re.fullmatch(r"[0-9a-f]{64}", model_id or ""):
+            raise ValueError(f"Invalid model_id '{model_id}'")
+        return os.path.join(self.directory, model_id)
+
+    def weights_path(self, model_id: str, name: str) -> str:
+        return os.path.join(self.path(model_id), f"{name}.weights.h5")
+
+    def get(self, model_id: str) -> Dict[str, Any] | None:
+        """Metadata of a stored model, or None if it is not in the registry"""
+        meta_path = os.path.join(self.path(model_id), "meta.json")
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Mark as recently used
+        os.utime(self.path(model_id))
+        return meta
+
+    def put(self, model_id: str, models: Dict[str, Any], meta: Dict[str, Any]) -> None:
+        """Store the weights of `models` ({name: keras model}) and `meta` under `model_id`"""
+        final_path = self.path(model_id)
+        tmp_path = f"{final_path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        try:
+            for name, model in models.items():
+                model.save_weights(os.path.join(tmp_path, f"{name}.weights.h5"))
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump({**meta, "created": time.time()}, f)
+            os.replace(tmp_path, final_path)
+        except OSError:
+            # Another process stored the same model first
+            if not os.path.exists(os.path.join(final_path, "meta.json")):
+                raise
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.prune()
+
+    def prune(self) -> None:
+        """Delete the least recently used entries beyond `max_entries`"""
+        entries = [
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if re.fullmatch(r"[0-9a-f]{64}", name)
+        ]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            shutil.rmtree(path, ignore_errors=True)
@@ -4,14 +4,17 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
-from ..tasks.generate import smiles_generation_task
-from molecules.utils.generate import generate_smiles
+from ..tasks.generate import smiles_generation_task, smiles_sampling_task
+from molecules.utils.generate import generate_smiles_with_model, sample_smiles
 
 
 class SmilesGenerationView(APIView):
     """
     POST /api/smiles-generation/generate/
     If you prefer async, send `?async=true` and you’ll get back a task_id.
+    The response carries the `model_id` of the VAE used; posting only
+    `model_id` (and optionally `n_samples`) samples from that stored VAE
+    without training.
     """
     def post(self, request, *args, **kwargs):
         payload = request.data
@@ -23,8 +26,33 @@ class SmilesGenerationView(APIView):
 
         # Fallback: run synchronously (small datasets, tests)
         try:
-            results = generate_smiles(**payload)
-            return Response({"results": results}, status=status.HTTP_200_OK)
+            results, model_id, summary = generate_smiles_with_model(**payload)
+            return Response({"results": results, "model_id": model_id, "summary": summary},
+                            status=status.HTTP_200_OK)
+        except Exception as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SmilesSamplingView(APIView):
+    """
+    POST /api/smiles-generation/sample/
+    Body: {"model_id": "...", "n_samples": 10000, "batch_size": 512,
+           "seed_smiles": ["..."] | null, "sigma": 1.0, "random_state": null}
+    Samples from a VAE stored by an earlier generation request, without
+    training. Send `?async=true` to get back a task_id for the status endpoint.
+    """
+    def post(self, request, *args, **kwargs):
+        payload = request.data
+        async_flag = request.query_params.get("async") == "true"
+
+        if async_flag:
+            task = smiles_sampling_task.delay(payload)
+            return Response({"task_id": task.id}, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            results, model_id, summary = sample_smiles(**payload)
+            return Response({"results": results, "model_id": model_id, "summary": summary},
+                            status=status.HTTP_200_OK)
         except Exception as exc:
             return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -36,6 +64,9 @@ class SmilesGenerationStatusView(APIView):
     {
       "status": "PENDING|STARTED|SUCCESS|FAILURE",
       "results": { ... } | null,
+      "model_id": "..." | null,
+      "summary": {"generated", "valid", "unique", "novel", "kept",
+                  "validity", "uniqueness", "novelty"} | null,
       "error": "..." | null
     }
     """
@@ -46,6 +77,8 @@ class SmilesGenerationStatusView(APIView):
             payload = {
                 "status": async_res.status,   # Celery states
                 "results": None,
+                "model_id": None,
+                "summary": None,
                 "error": None,
             }
 
@@ -57,6 +90,8 @@ class SmilesGenerationStatusView(APIView):
                     payload["error"] = result.get("error", "Task failed")
                 else:
                     payload["results"] = result.get("results", {})
+                    payload["model_id"] = result.get("model_id")
+                    payload["summary"] = result.get("summary")
             elif async_res.failed():
                 # If we raised inside the task, Celery keeps the exception object in .result
                 meta = getattr(async_res, "result", None)
@@ -0,0 +1,314 @@
+# benchmark.py
+"""
+Benchmarks of MLOptimizer on reproducible synthetic dye datasets.
+
+Datasets are shaped like `dataset/Graphs/small_dataset_100rows.csv`: an id,
+a SMILES string, numeric RDKit-style descriptors (mostly integer counts,
+correlated through a few latent "molecule size" factors, many of them
+constant) and a skewed positive `Epsilon` target. Column names, ranges and
+integer/constant columns are taken from the reference CSV when it exists.
+
+Every stage is timed separately: model training, the cost of one objective
+evaluation (one batched predict call per swarm and iteration), the whole
+PSO sweep, graph rendering and JSON serialization of the task result.
+The report is written as JSON so runs can be compared for regressions.
+A case whose PSO runs did not all complete without error is marked failed,
+with the optimizer's error messages, and the command exits with status 1.
+
+Usage, from the server directory:
+
+    python -m pso.benchmark --features 20 100 --swarmsize 30 100 \\
+        --maxiter 20 --targets 1 5 --output pso_benchmark.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from .compiled import COMPILE_BACKENDS
+from .graphs import GRAPH_RENDERERS, render_graph
+from .results import encode_columnar, to_columnar
+from .utils import MLOptimizer, predict_raw
+
+REPORT_VERSION = 2
+
+REFERENCE_DATASET = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'dataset', 'Graphs', 'small_dataset_100rows.csv'
+)
+
+# Fragments joined into placeholder SMILES; they only need to look like the real column
+_SMILES_FRAGMENTS = ('c1ccccc1', 'C(=O)O', 'N', 'c1ccc2ccccc2c1', 'CC', 'O', 'C#N', 'S(=O)(=O)O', 'Cl')
+
+
+def _column_profiles(reference_path):
+    """Per-column (name, mean, std, min, max, is_integer) of the reference descriptors"""
+    if not reference_path or not os.path.exists(reference_path):
+        return []
+    df = pd.read_csv(reference_path).drop(columns=['id', 'Smiles', 'Epsilon'], errors='ignore')
+    df = df.select_dtypes(include='number')
+    return [
+        (name, float(col.mean()), float(col.std(ddof=0)), float(col.min()), float(col.max()),
+         bool((col % 1 == 0).all()))
+        for name, col in df.items()
+    ]
+
+
+def synthetic_dataset(n_rows=100, n_features=246, seed=0, reference_path=REFERENCE_DATASET):
+    """
+    Reproducible dataset of `n_rows` molecules with `n_features` descriptors.
+
+    Returns (df, features, target) where df has the same column layout as the
+    reference CSV: id, Smiles, the descriptors, then Epsilon.
+    """
+    rng = np.random.default_rng(seed)
+    profiles = _column_profiles(reference_path)
+    if not profiles:
+        profiles = [(f'Descriptor {i}', 10.0, 5.0, 0.0, 50.0, i % 4 != 0) for i in range(n_features)]
+
+    # Descriptors of real molecules are strongly correlated through their size
+    latent = rng.standard_normal((n_rows, 3))
+    columns = {}
+    for i in range(n_features):
+        name, mean, std, lo, hi, is_int = profiles[i % len(profiles)]
+        if i >= len(profiles):
+            name = f'{name} {i // len(profiles)}'
+        if std == 0:
+            values = np.full(n_rows, mean)
+        else:
+            loading = rng.normal(0, 1, 3)
+            signal = latent @ loading / np.linalg.norm(loading)
+            values = np.clip(mean + std * (0.8 * signal + 0.6 * rng.standard_normal(n_rows)), lo, hi)
+            if is_int:
+                values = np.round(values)
+        columns[name] = values
+
+    features = list(columns)
+    X = np.column_stack(list(columns.values()))
+
+    # Skewed, positive target driven by a handful of the varying descriptors
+    std = X.std(axis=0)
+    informative = np.flatnonzero(std > 0)[:8]
+    z = (X[:, informative] - X[:, informative].mean(axis=0)) / std[informative] if informative.size else np.zeros((n_rows, 0))
+    signal = z @ rng.normal(0, 1, z.shape[1])
+    if signal.std() > 0:
+        signal = (signal - signal.mean()) / signal.std()
+    # Median near 11000 and a long upper tail, like the reference Epsilon
+    epsilon = np.exp(9.3 + 0.7 * signal + 0.3 * rng.standard_normal(n_rows))
+
+    smiles = [
+        ''.join(rng.choice(_SMILES_FRAGMENTS, size=rng.integers(2, 6)))
+        for _ in range(n_rows)
+    ]
+    df = pd.DataFrame({'id': np.arange(1, n_rows + 1), 'Smiles': smiles, **columns, 'Epsilon': epsilon})
+    return df, features, 'Epsilon'
+
+
+def _timed(func, *args, log=None, **kwargs):
+    """(result, seconds) of one call, with the optimizer's debug prints silenced (kept in `log` if given)"""
+    with contextlib.redirect_stdout(log if log is not None else io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+
+def _run_check(progress, payload, log):
+    """Completed, failed and expected PSO runs of a case, solutions per target and the failure messages"""
+    runs_total = progress.get('runs_total', 0)
+    runs_completed = progress.get('runs_completed', 0)
+    runs_failed = progress.get('runs_failed', 0)
+    errors = [line for line in log.getvalue().splitlines() if 'failed' in line.lower()]
+    return {
+        'runs_total': runs_total,
+        'runs_completed': runs_completed,
+        'runs_failed': runs_failed,
+        'solutions_per_target': [
+            sum(len(solutions) for solutions in result['comparison_table'].values())
+            for result in payload['results']
+        ] if payload else [],
+        'errors': errors,
+        'failed': not payload or runs_failed > 0 or runs_completed != runs_total,
+    }
+
+
+def _objective_cost(optimizer, batch_size, repeats, rng):
+    """Median seconds of one batched objective predict call on `batch_size` particles, per model"""
+    lb = np.asarray(optimizer.pso_config['lb'], dtype=float)
+    ub = np.asarray(optimizer.pso_config['ub'], dtype=float)
+    X = lb + rng.random((batch_size, lb.size)) * (ub - lb)
+
+    costs = {}
+    for model_name, model in optimizer.predictors.items():
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            predict_raw(model, optimizer.objective_scaler, X)
+            samples.append(time.perf_counter() - start)
+        costs[model_name] = float(np.median(samples))
+    return costs
+
+
+def _graph_timings(results):
+    """Seconds to render every registered graph from `results`"""
+    timings = {}
+    for name in GRAPH_RENDERERS:
+        _, seconds = _timed(render_graph, name, results)
+        timings[name] = seconds
+    return timings
+
+
+def _serialization_timings(payload, features):
+    """Seconds and bytes of storing `payload` the way run_optimization_task does"""
+    columnar, to_columnar_seconds = _timed(to_columnar, payload, features)
+    encoded, encode_seconds = _timed(encode_columnar, columnar)
+    blob, dumps_seconds = _timed(json.dumps, encoded)
+    legacy_blob, legacy_seconds = _timed(json.dumps, payload)
+    return {
+        'to_columnar_seconds': to_columnar_seconds,
+        'encode_seconds': encode_seconds,
+        'json_dumps_seconds': dumps_seconds,
+        'json_bytes': len(blob),
+        'legacy_json_dumps_seconds': legacy_seconds,
+        'legacy_json_bytes': len(legacy_blob),
+    }
+
+
+def run_benchmark(rows=100, feature_counts=(20,), target_counts=(1,), swarmsizes=(30,),
+                  maxiters=(20,), n_solutions=2, repeats=5, seed=0, multi_target=False,
+                  render_graphs=True, compile_backend=None, reference_path=REFERENCE_DATASET):
+    """
+    Benchmark every combination of the given sizes; models are trained once per
+    feature count. Returns the report as a dict.
+    """
+    cases = []
+    for n_features in feature_counts:
+        df, features, target = synthetic_dataset(rows, n_features, seed, reference_path)
+        data = df[features + [target]].to_dict(orient='records')
+        optimizer, training_seconds = _timed(
+            MLOptimizer, data, features, target,
+            {'n_solutions': n_solutions, 'nprocessors': 1, 'multi_target': multi_target,
+             'compile': compile_backend}
+        )
+
+        for n_targets, swarmsize, maxiter in itertools.product(target_counts, swarmsizes, maxiters):
+            rng = np.random.default_rng(seed)
+            optimizer.pso_config.update(swarmsize=swarmsize, maxiter=maxiter)
+            target_values = np.quantile(df[target], np.linspace(0.1, 0.9, n_targets)).tolist()
+
+            # One swarm per target shares each predict call in multi-target mode
+            batch_size = swarmsize * (n_targets if multi_target else 1)
+            objective_costs = _objective_cost(optimizer, batch_size, repeats, rng)
+
+            progress, log = {}, io.StringIO()
+            try:
+                payload, optimize_seconds = _timed(
+                    optimizer.optimize_for_targets, target_values, log=log,
+                    render_graphs=False, progress_callback=progress.update
+                )
+            except ValueError as e:
+                # Raised when a target ends without any solution
+                payload, optimize_seconds = None, None
+                log.write(f"Optimization failed: {str(e)}\n")
+            iterations = progress.get('iterations', 0)
+            runs = _run_check(progress, payload, log)
+
+            timings = {
+                'training_seconds': training_seconds,
+                'objective_seconds': objective_costs,
+                'optimize_seconds': optimize_seconds,
+                'optimize_seconds_per_iteration': optimize_seconds / iterations if payload and iterations else None,
+                'graphs_seconds': _graph_timings(payload['results']) if payload and render_graphs else None,
+                'serialization': _serialization_timings(payload, features) if payload else None,
+            }
+            cases.append({
+                'params': {
+                    'rows': rows,
+                    'n_features': n_features,
+                    'n_targets': n_targets,
+                    'swarmsize': swarmsize,
+                    'maxiter': maxiter,
+                    'n_solutions': n_solutions,
+                    'multi_target': multi_target,
+                    'compile': compile_backend,
+                },
+                'models': {model_name: getattr(predictor, 'backend', 'model')
+                           for model_name, predictor in optimizer.predictors.items()},
+                'iterations': iterations,
+                'runs': runs,
+                'failed': runs['failed'],
+                'timings': timings,
+            })
+            outcome = (f"FAILED ({runs['runs_failed']} of {runs['runs_total']} runs failed)" if runs['failed']
+                       else f"optimize {optimize_seconds:.2f}s")
+            print(f"n_features={n_features} n_targets={n_targets} swarmsize={swarmsize} "
+                  f"maxiter={maxiter}: {outcome}", file=sys.stderr)
+
+    return {
+        'version': REPORT_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'seed': seed,
+        'failed': any(case['failed'] for case in cases),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+        },
+        'cases': cases,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark MLOptimizer on synthetic dye datasets")
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--features', type=int, nargs='+', default=[20])
+    parser.add_argument('--targets', type=int, nargs='+', default=[1])
+    parser.add_argument('--swarmsize', type=int, nargs='+', default=[30])
+    parser.add_argument('--maxiter', type=int, nargs='+', default=[20])
+    parser.add_argument('--n-solutions', type=int, default=2)
+    parser.add_argument('--repeats', type=int, default=5, help="predict calls timed per model")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--multi-target', action='store_true')
+    parser.add_argument('--skip-graphs', action='store_true')
+    parser.add_argument('--compile', choices=COMPILE_BACKENDS, help="compile models for the objective")
+    parser.add_argument('--reference', default=REFERENCE_DATASET, help="CSV the synthetic columns are modelled on")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        rows=args.rows,
+        feature_counts=args.features,
+        target_counts=args.targets,
+        swarmsizes=args.swarmsize,
+        maxiters=args.maxiter,
+        n_solutions=args.n_solutions,
+        repeats=args.repeats,
+        seed=args.seed,
+        multi_target=args.multi_target,
+        render_graphs=not args.skip_graphs,
+        compile_backend=args.compile,
+        reference_path=args.reference,
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
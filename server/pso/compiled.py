@@ -0,0 +1,262 @@
+# compiled.py
+"""
+Lean compiled predictors for the PSO objective.
+
+The objective calls `predict` thousands of times per run on small batches,
+where the input validation, joblib dispatch and per-call setup of the
+scikit-learn, XGBoost and CatBoost APIs cost far more than walking the trees.
+`compile_predictor` converts a trained model once into a predictor with a
+bare `predict(X)`:
+
+* "onnx": the model exported to ONNX and run by onnxruntime on one CPU
+  thread (needs onnxruntime, plus skl2onnx for scikit-learn models and
+  onnxmltools for XGBoost).
+* "numpy": every tree flattened into shared node arrays and traversed for
+  all rows and trees at once, one vectorized step per tree level.
+
+Every compiled predictor is checked against the original model at compile
+time and rejected if the predictions differ.
+
+Numpy predictors of bagged ensembles (Random Forest) also provide
+`predict_with_std`, the spread of the individual tree predictions, from the
+same traversal as the mean.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+from catboost import CatBoostRegressor
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+from xgboost import XGBRegressor
+
+try:
+    import onnxruntime
+    _HAS_ONNX = True
+except ImportError:          # onnxruntime not installed
+    _HAS_ONNX = False
+
+COMPILE_BACKENDS = ('auto', 'onnx', 'numpy')
+
+
+def supports_prediction_std(model):
+    """Whether the numpy predictor of `model` provides per-tree spreads"""
+    return isinstance(model, RandomForestRegressor)
+
+
+class NodeTreePredictor:
+    """Binary trees stored as node arrays; leaves point to themselves"""
+
+    backend = 'numpy'
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, strict, bagged=False):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        # XGBoost goes left on x < split, scikit-learn on x <= threshold
+        self.strict = strict
+        # Trees of a bagged ensemble each predict the target; boosted trees only add corrections
+        self.bagged = bagged
+        self.offset = 0.0
+
+    def _tree_values(self, X):
+        """(n_rows, n_trees) leaf value of every tree for every row"""
+        # Both libraries compare features as float32
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.roots.size))
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            go_left = x < self.threshold[node] if self.strict else x <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def predict(self, X):
+        return self._tree_values(X).sum(axis=1) + self.offset
+
+    def predict_with_std(self, X):
+        """Mean prediction and standard deviation of the individual tree predictions"""
+        if not self.bagged:
+            raise ValueError("Per-tree predictions are only defined for bagged ensembles")
+        values = self._tree_values(X)
+        # Leaf values are stored pre-divided by the number of trees
+        return values.sum(axis=1) + self.offset, (values * self.roots.size).std(axis=1)
+
+
+class ObliviousTreePredictor:
+    """CatBoost symmetric trees: one split per level, the split outcomes index the leaf"""
+
+    backend = 'numpy'
+
+    def __init__(self, feature, border, leaf_values):
+        self.feature = feature          # (n_trees, depth)
+        self.border = border            # (n_trees, depth), +inf pads shallower trees
+        self.leaf_values = leaf_values  # (n_trees, 2 ** depth)
+        self.bits = 1 << np.arange(feature.shape[1])
+        self.offset = 0.0
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        index = ((X[:, self.feature] > self.border) * self.bits).sum(axis=2)
+        return self.leaf_values[np.arange(len(self.leaf_values)), index].sum(axis=1) + self.offset
+
+
+class OnnxPredictor:
+    """ONNX model run by onnxruntime; the session is rebuilt after unpickling"""
+
+    backend = 'onnx'
+
+    def __init__(self, model_bytes):
+        self.model_bytes = model_bytes
+        self.offset = 0.0
+        self._session = None
+
+    def __getstate__(self):
+        return {'model_bytes': self.model_bytes, 'offset': self.offset, '_session': None}
+
+    def predict(self, X):
+        if self._session is None:
+            # Batches are small, so extra threads only add synchronization
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = 1
+            self._session = onnxruntime.InferenceSession(
+                self.model_bytes, options, providers=['CPUExecutionProvider']
+            )
+        name = self._session.get_inputs()[0].name
+        output = self._session.run(None, {name: np.asarray(X, dtype=np.float32)})[0]
+        return np.asarray(output, dtype=float).ravel() + self.offset
+
+
+def _sklearn_node_predictor(trees, scale, bagged=False):
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    depth, start = 0, 0
+    for tree in trees:
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        nodes = np.arange(n) + start
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        left.append(np.where(is_leaf, nodes, tree.children_left + start))
+        right.append(np.where(is_leaf, nodes, tree.children_right + start))
+        value.append(tree.value[:, 0, 0] * scale)
+        roots.append(start)
+        depth = max(depth, tree.max_depth)
+        start += n
+    return NodeTreePredictor(*(np.concatenate(a) for a in (feature, threshold, left, right, value)),
+                             np.array(roots), depth, strict=False, bagged=bagged)
+
+
+def _xgboost_node_predictor(model):
+    booster = model.get_booster()
+    names = booster.feature_names
+    index = {name: i for i, name in enumerate(names)} if names else None
+    df = booster.trees_to_dataframe()
+    position = {node_id: i for i, node_id in enumerate(df['ID'])}
+
+    is_leaf = (df['Feature'] == 'Leaf').to_numpy()
+    nodes = np.arange(len(df))
+    feature = np.array([0 if leaf else (index[f] if index else int(f[1:]))
+                        for f, leaf in zip(df['Feature'], is_leaf)])
+    left = np.array([n if leaf else position[y] for n, y, leaf in zip(nodes, df['Yes'], is_leaf)])
+    right = np.array([n if leaf else position[no] for n, no, leaf in zip(nodes, df['No'], is_leaf)])
+    threshold = np.where(is_leaf, 0.0, df['Split'].fillna(0.0)).astype(np.float32).astype(np.float64)
+    value = np.where(is_leaf, df['Gain'], 0.0)
+    roots = np.flatnonzero(df['Node'].to_numpy() == 0)
+    depth = int(model.get_params().get('max_depth') or 6)
+    # max_depth bounds the depth; deeper loops are harmless since leaves point to themselves
+    return NodeTreePredictor(feature, threshold, left, right, value, roots, depth, strict=True)
+
+
+def _catboost_oblivious_predictor(model):
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        model.save_model(path, format='json')
+        with open(path) as f:
+            dump = json.load(f)
+    finally:
+        os.remove(path)
+
+    trees = dump['oblivious_trees']
+    depth = max(len(tree['splits']) for tree in trees)
+    scale = dump.get('scale_and_bias', [1.0, [0.0]])[0]
+    feature = np.zeros((len(trees), depth), dtype=int)
+    border = np.full((len(trees), depth), np.inf, dtype=np.float32)
+    leaf_values = np.zeros((len(trees), 2 ** depth))
+    for t, tree in enumerate(trees):
+        for bit, split in enumerate(tree['splits']):
+            feature[t, bit] = split['float_feature_index']
+            border[t, bit] = split['border']
+        leaf_values[t, :len(tree['leaf_values'])] = np.asarray(tree['leaf_values']) * scale
+    return ObliviousTreePredictor(feature, border, leaf_values)
+
+
+def _numpy_predictor(model):
+    if isinstance(model, DecisionTreeRegressor):
+        return _sklearn_node_predictor([model.tree_], 1.0)
+    if isinstance(model, RandomForestRegressor):
+        return _sklearn_node_predictor([est.tree_ for est in model.estimators_], 1.0 / len(model.estimators_),
+                                       bagged=True)
+    if isinstance(model, XGBRegressor):
+        return _xgboost_node_predictor(model)
+    if isinstance(model, CatBoostRegressor):
+        return _catboost_oblivious_predictor(model)
+    raise ValueError(f"No numpy predictor for {type(model).__name__}")
+
+
+def _onnx_predictor(model, n_features):
+    if not _HAS_ONNX:
+        raise ValueError("onnxruntime is not installed")
+
+    if isinstance(model, CatBoostRegressor):
+        fd, path = tempfile.mkstemp(suffix='.onnx')
+        os.close(fd)
+        try:
+            model.save_model(path, format='onnx')
+            with open(path, 'rb') as f:
+                return OnnxPredictor(f.read())
+        finally:
+            os.remove(path)
+
+    if isinstance(model, XGBRegressor):
+        from onnxmltools.convert import convert_xgboost
+        from onnxmltools.convert.common.data_types import FloatTensorType
+        onx = convert_xgboost(model, initial_types=[('input', FloatTensorType([None, n_features]))])
+    else:
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+        onx = convert_sklearn(model, initial_types=[('input', FloatTensorType([None, n_features]))])
+    return OnnxPredictor(onx.SerializeToString())
+
+
+def compile_predictor(model, X_check, backend='auto', rtol=1e-5):
+    """
+    Compile `model` into a lean predictor with the given backend ("auto"
+    tries onnx, then numpy). `X_check` are inputs in the model's own input
+    space; the predictor's constant offset (base score / bias) is fitted on
+    them and its predictions must match `model.predict` within `rtol`.
+    Raises ValueError if no backend produces a matching predictor.
+    """
+    X_check = np.asarray(X_check, dtype=float)
+    expected = np.asarray(model.predict(X_check), dtype=float)
+    backends = ('onnx', 'numpy') if backend == 'auto' else (backend,)
+
+    errors = []
+    for name in backends:
+        try:
+            predictor = _onnx_predictor(model, X_check.shape[1]) if name == 'onnx' else _numpy_predictor(model)
+            diff = expected - predictor.predict(X_check)
+            predictor.offset = float(np.median(diff))
+            deviation = np.max(np.abs(diff - predictor.offset))
+            if deviation > rtol * (1.0 + np.max(np.abs(expected))):
+                raise ValueError(f"predictions differ by up to {deviation:.3g}")
+            return predictor
+        except Exception as e:
+            errors.append(f"{name}: {str(e)}")
+
+    raise ValueError(f"Could not compile {type(model).__name__} ({'; '.join(errors)})")
@@ -0,0 +1,138 @@
+# constraints.py
+"""
+Per-feature type constraints for the particle swarm.
+
+Many descriptors are counts (atoms, rings, RDKit fragment counts) that only
+make sense as non-negative integers, some must stay fixed, and some are sums
+of others (e.g. a total atom count). `FeatureConstraints` projects particle
+positions onto the feasible set after every swarm update, so no objective
+evaluation is spent on an infeasible point and every reported solution is
+usable as-is.
+
+The `constraints` entry of `pso_config` looks like:
+
+    {
+        "integer": ["C Atom Count", "H Atom Count"],   # or "auto"
+        "nonnegative": "auto",                         # or a list of features
+        "fixed": {"Cu Atom Count": 0},
+        "linked_sums": [
+            {"features": ["C Atom Count", "H Atom Count"], "total": "Total Atoms"},
+            {"features": ["Chi0N", "Chi0V"], "total": 40.0}
+        ]
+    }
+
+"auto" selects the features whose training values are all integers (for
+"integer") or all non-negative (for "nonnegative"). A linked sum whose
+total is a feature name sets that feature to the sum of its parts, after
+moving the parts as needed to keep that sum within the total's own bounds;
+a numeric total shifts the parts onto that sum as closely as the bounds
+allow.
+"""
+import numpy as np
+
+CONSTRAINT_TYPES = ('integer', 'nonnegative', 'fixed', 'linked_sums')
+
+
+def constraint_features(spec):
+    """Every feature name referenced by a constraints spec"""
+    names = []
+    for key in ('integer', 'nonnegative'):
+        if isinstance(spec.get(key), list):
+            names.extend(spec[key])
+    names.extend(spec.get('fixed', {}))
+    for link in spec.get('linked_sums', []):
+        names.extend(link.get('features', []))
+        if isinstance(link.get('total'), str):
+            names.append(link['total'])
+    return names
+
+
+class FeatureConstraints:
+    """Projection of particle positions onto the feasible feature values"""
+
+    def __init__(self, spec, features, lb, ub, X=None):
+        unknown = set(spec) - set(CONSTRAINT_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown constraint types: {', '.join(sorted(unknown))}")
+        missing = [name for name in constraint_features(spec) if name not in features]
+        if missing:
+            raise ValueError(f"Constrained features not in features: {', '.join(missing)}")
+
+        index = {feature: i for i, feature in enumerate(features)}
+        values = None if X is None else np.asarray(X, dtype=float)
+
+        def resolve(key, auto_mask):
+            names = spec.get(key, [])
+            if names == 'auto':
+                if values is None:
+                    raise ValueError(f"'{key}': 'auto' needs training data")
+                return np.flatnonzero(auto_mask(values))
+            return np.array([index[name] for name in names], dtype=int)
+
+        self.integer = resolve('integer', lambda v: np.all(v == np.round(v), axis=0))
+        self.nonnegative = resolve('nonnegative', lambda v: np.all(v >= 0, axis=0))
+        fixed = spec.get('fixed', {})
+        self.fixed = np.array([index[name] for name in fixed], dtype=int)
+        self.fixed_values = np.array(list(fixed.values()), dtype=float)
+
+        self.derived_sums = []
+        self.constant_sums = []
+        for link in spec.get('linked_sums', []):
+            parts = np.array([index[name] for name in link['features']], dtype=int)
+            if isinstance(link['total'], str):
+                self.derived_sums.append((parts, index[link['total']]))
+            else:
+                self.constant_sums.append((parts, float(link['total'])))
+
+        # Non-negative features never need to search below zero
+        self.lb = np.asarray(lb, dtype=float).copy()
+        self.ub = np.asarray(ub, dtype=float).copy()
+        self.lb[self.nonnegative] = np.maximum(self.lb[self.nonnegative], 0.0)
+        self.ub = np.where(self.ub > self.lb, self.ub, self.lb + 1.0)
+
+        # Integer features round into the integers inside their bounds
+        self.int_lo = np.ceil(self.lb[self.integer])
+        self.int_hi = np.floor(self.ub[self.integer])
+        empty = self.int_lo > self.int_hi
+        self.int_lo[empty] = self.int_hi[empty] = np.round((self.lb + self.ub)[self.integer][empty] / 2)
+
+        # Bounds every feature can actually take, integer ones on the integer grid
+        self.is_integer = np.zeros(len(features), dtype=bool)
+        self.is_integer[self.integer] = True
+        self.value_lo = self.lb.copy()
+        self.value_hi = self.ub.copy()
+        self.value_lo[self.integer] = self.int_lo
+        self.value_hi[self.integer] = self.int_hi
+
+    def __call__(self, x):
+        """Feasible copy of positions `x` with shape (..., n_features)"""
+        x = np.array(x, dtype=float)
+        x[..., self.fixed] = self.fixed_values
+
+        # Spread the gap to each constant total evenly over its parts
+        for parts, total in self.constant_sums:
+            gap = total - x[..., parts].sum(axis=-1, keepdims=True)
+            x[..., parts] += gap / len(parts)
+
+        x = np.clip(x, self.lb, self.ub)
+        x[..., self.integer] = np.clip(np.round(x[..., self.integer]), self.int_lo, self.int_hi)
+
+        # Clipping and rounding leave a residual; parts absorb it in order, within their bounds
+        for parts, total in self.constant_sums:
+            for part in parts:
+                gap = total - x[..., parts].sum(axis=-1)
+                x[..., part] = np.clip(x[..., part] + gap, self.lb[part], self.ub[part])
+
+        # A derived total keeps to its own bounds: parts absorb the excess in order, within theirs
+        for parts, total in self.derived_sums:
+            for part in parts:
+                current = x[..., parts].sum(axis=-1)
+                gap = np.clip(current, self.value_lo[total], self.value_hi[total]) - current
+                if self.is_integer[part]:
+                    # Whole steps, rounded away from zero so the sum lands inside the bounds
+                    gap = np.where(gap > 0, np.ceil(gap), np.floor(gap))
+                x[..., part] = np.clip(x[..., part] + gap, self.value_lo[part], self.value_hi[part])
+            x[..., total] = x[..., parts].sum(axis=-1)
+
+        x[..., self.fixed] = self.fixed_values
+        return x
@@ -0,0 +1,67 @@
+# graph_cache.py
+"""
+On-disk cache of graphs rendered from finished PSO tasks.
+
+Each task gets a directory named by its id holding one PNG per graph, so a
+graph is drawn at most once per task. Only the `max_tasks` most recently
+used task directories are kept; older ones are deleted whenever a new graph
+is stored.
+"""
+import os
+import re
+import shutil
+
+
+class GraphCache:
+    """Rendered PNGs per task id and graph name, least recently used tasks evicted first"""
+
+    def __init__(self, directory, max_tasks=200):
+        self.directory = directory
+        self.max_tasks = max_tasks
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, task_id, graph_name):
+        if not re.fullmatch(r'[\w-]+', task_id):
+            raise ValueError(f"Invalid task id '{task_id}'")
+        return os.path.join(self.directory, task_id, f"{graph_name}.png")
+
+    def get(self, task_id, graph_name):
+        """PNG bytes of a cached graph, or None"""
+        path = self._path(task_id, graph_name)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+        except FileNotFoundError:
+            return None
+        # Mark the task as recently used
+        try:
+            os.utime(os.path.dirname(path))
+        except FileNotFoundError:
+            pass
+        return png
+
+    def put(self, task_id, graph_name, png):
+        """Store the PNG bytes of a graph, then evict the least recently used tasks"""
+        path = self._path(task_id, graph_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(png)
+        # Atomic, so concurrent requests never read a partial file
+        os.replace(tmp_path, path)
+        os.utime(os.path.dirname(path))
+        self.prune()
+
+    def prune(self):
+        """Delete the task directories beyond the `max_tasks` most recently used"""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.isdir(path):
+                    entries.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_tasks:]:
+            shutil.rmtree(path, ignore_errors=True)
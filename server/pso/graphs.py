@@ -0,0 +1,410 @@
+# graphs.py
+"""
+Visualizations of MLOptimizer results.
+
+Every graph is rendered from the plain result list returned by
+`MLOptimizer.optimize_for_targets`, so it can be produced inside the
+optimization task or later, on request, from the stored task result.
+"""
+import base64
+import io
+import threading
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.lines import Line2D
+
+matplotlib.use('Agg')  # Use non-interactive backend
+import matplotlib.pyplot as plt
+from sklearn.decomposition import PCA
+
+# pyplot keeps global state, so renders from concurrent requests must not interleave
+_render_lock = threading.Lock()
+
+
+def plot_to_base64(fig):
+    """Convert matplotlib figure to base64 string"""
+
+    buffer = io.BytesIO()
+    # fname = f"{uuid.uuid4()}.png"
+    # fig.savefig(fname, format='png', dpi=100, bbox_inches='tight')
+    fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+    buffer.seek(0)
+    image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    buffer.close()
+    plt.close(fig)
+    return image_base64
+
+
+# ───────────────────────────────────────────────────────────
+# 1️⃣  MODEL-COMPARISON  (bar chart of mean R² / MSE / ACC)
+# ───────────────────────────────────────────────────────────
+def plot_model_comparison(results):
+    """Aggregate per-model metrics across all PSO runs and plot."""
+    try:
+        plot_data = []
+
+        for res in results:
+            for model_name, runs in res['comparison_table'].items():
+                # ── aggregate (mean) across runs ──────────────────────────
+                r2 = np.mean([r['r2'] for r in runs])
+                mse = np.mean([r['mse'] for r in runs])
+                acc = np.mean([r['accuracy_like'] for r in runs])
+                plot_data.append({
+                    'Model': model_name,
+                    'R2 Score': r2,
+                    'MSE': mse,
+                    'Accuracy (pseudo)': acc
+                })
+
+        results_df = pd.DataFrame(plot_data)
+        metrics_df = results_df.groupby("Model")[["R2 Score", "MSE", "Accuracy (pseudo)"]].mean().reset_index()
+
+        colors = ['#4c72b0', '#55a868', '#c44e52', '#8172b3'][:len(metrics_df)]
+        bar_width = 0.2
+        x_spacing = 0.3
+        models = metrics_df["Model"].tolist()
+        x_pos = [i * x_spacing for i in range(len(models))]
+
+        fig, axes = plt.subplots(1, 3, figsize=(12, 3))
+        metrics = [("R2 Score", "R² Score"),
+                   ("MSE", "MSE"),
+                   ("Accuracy (pseudo)", "Accuracy")]
+
+        for i, (key, ylabel) in enumerate(metrics):
+            vals = metrics_df[key]
+            axes[i].bar(x_pos, vals, width=bar_width, color=colors, edgecolor='white', linewidth=.5)
+            axes[i].set_xticks(x_pos)
+            axes[i].set_xticklabels(models, rotation=45, ha='right')
+            axes[i].set_ylabel(ylabel)
+            for pos, val in zip(x_pos, vals):
+                axes[i].text(pos, val * 1.02, f"{val:.2f}", ha='center', va='bottom', fontsize=8)
+
+        plt.suptitle("Model Performance Metrics (mean across PSO runs)", y=1.08)
+        plt.tight_layout()
+        return plot_to_base64(fig)
+
+    except Exception as e:
+        print(f"Model comparison plot failed: {e}")
+        return None
+
+def _is_pareto(result):
+    """Whether `result` comes from a Pareto run, whose convergence holds scalarized scores, not errors"""
+    return result.get('pareto_front') is not None
+
+
+def plot_pso_convergence(results):
+    """Plot PSO convergence curves from the per-iteration history of every run (None for Pareto runs)"""
+    try:
+        convergence_data = []
+
+        for result in results:
+            if _is_pareto(result):
+                continue
+            target_value = result['target_value']
+
+            for model_name, model_solutions in result['comparison_table'].items():
+                for solution in model_solutions:
+                    for iteration, fopt in enumerate(solution.get('convergence', [])):
+                        convergence_data.append({
+                            'Target Value': target_value,
+                            'Model': model_name,
+                            'Iteration': iteration,
+                            '% Error': fopt * 100  # Convert to percentage
+                        })
+
+        if not convergence_data:
+            return None
+        convergence_df = pd.DataFrame(convergence_data)
+        convergence_df = convergence_df.groupby(['Model', 'Iteration'])['% Error'].min().reset_index()
+
+        plt.figure(figsize=(10, 6))
+        for model in convergence_df['Model'].unique():
+            subset = convergence_df[convergence_df['Model'] == model]
+            plt.plot(subset['Iteration'], subset['% Error'], marker='o', label=model)
+
+        plt.title("PSO Convergence Curve (Best % Error per Iteration)")
+        plt.xlabel("Iteration")
+        plt.ylabel("Best % Error")
+        plt.legend()
+        plt.grid(True)
+        plt.tight_layout()
+        fig = plt.gcf()
+        return plot_to_base64(fig)
+
+    except Exception as e:
+        print(f"PSO convergence plot failed: {str(e)}")
+        return None
+
+# ───────────────────────────────────────────────────────────
+# 2️⃣  PCA-SCATTER  (every PSO run shown)
+# ───────────────────────────────────────────────────────────
+def plot_pca_analysis(results):
+    """PCA scatter: colour=model, size=%error (all runs)."""
+    try:
+        rows = []
+        for res in results:
+            tgt = res["target_value"]
+            for mdl, runs in res["comparison_table"].items():
+                for sol in runs:  # ← all runs
+                    rows.append({
+                        "Model": mdl,
+                        "Target": tgt,
+                        "Predicted": sol["prediction"],
+                        "%Error": sol["error"],
+                        **sol["solution"]  # feature columns
+                    })
+
+        if not rows:
+            print("PCA plot skipped: empty.")
+            return None
+
+        df = pd.DataFrame(rows)
+        metric_cols = {"Model", "Target", "Predicted", "%Error"}
+        feat_cols = [c for c in df.columns if c not in metric_cols]
+        if not feat_cols:
+            print("PCA plot skipped: no numeric features.")
+            return None
+
+        # Determine number of PCA components based on available features
+        n_features = len(feat_cols)
+        n_samples = len(df)
+
+        print(f"PCA Analysis: {n_samples} samples, {n_features} features")
+
+        # PCA components cannot exceed min(n_samples, n_features)
+        max_components = min(n_samples, n_features)
+        n_components = min(2, max_components)
+
+        if n_components < 1:
+            print("PCA plot skipped: insufficient data for PCA analysis.")
+            return None
+
+        print(f"Using {n_components} PCA components")
+
+        pca = PCA(n_components=n_components)
+        pca_result = pca.fit_transform(df[feat_cols])
+
+        if n_components == 1:
+            # For 1D PCA, create a second dimension with zeros for visualization
+            df["PCA1"] = pca_result[:, 0]
+            df["PCA2"] = np.zeros(len(df))  # Add zeros for second dimension
+            print("PCA analysis completed with 1D projection (adding zeros for PCA2)")
+        else:
+            df["PCA1"] = pca_result[:, 0]
+            df["PCA2"] = pca_result[:, 1]
+            print("PCA analysis completed with 2D projection")
+
+        bins = [0, 5, 10, 20, 50, 100, np.inf]
+        labels = ["0–5%", "5–10%", "10–20%", "20–50%", "50–100%", "≥100%"]
+        size_map = dict(zip(labels, [50, 100, 150, 200, 250, 300]))
+        df["ErrBin"] = pd.cut(df["%Error"] * 100, bins=bins, labels=labels)
+        df["ErrSize"] = df["ErrBin"].map(size_map)
+
+        plt.figure(figsize=(10, 6))
+        sns.scatterplot(data=df, x="PCA1", y="PCA2",
+                        hue="Model", size="ErrSize",
+                        palette="tab10", sizes=(50, 300), alpha=.7, legend=False)
+
+        # colour legend
+        handles = [Line2D([0], [0], marker='o', linestyle='', markerfacecolor=c,
+                          markeredgecolor='w', markersize=10, label=m)
+                   for m, c in zip(df["Model"].unique(),
+                                   sns.color_palette("tab10", n_colors=len(df["Model"].unique())))]
+        l1 = plt.legend(handles=handles, title="Model", loc='upper right')
+        plt.gca().add_artist(l1)
+
+        # size legend
+        for lab, sz in size_map.items():
+            plt.scatter([], [], s=sz, c='gray', alpha=.6, label=lab)
+        plt.legend(title="% Error", loc='lower right')
+
+        plt.title("Optimised Solutions in PCA Space")
+        plt.tight_layout()
+        return plot_to_base64(plt.gcf())
+
+    except Exception as e:
+        print(f"PCA analysis plot failed: {e}")
+        return None
+
+# ───────────────────────────────────────────────────────────
+# 3️⃣  R²  HEATMAP  (one value per model – first run is fine)
+# ───────────────────────────────────────────────────────────
+def plot_r2_heatmap(results):
+    """Heat-map of R² (one per model)."""
+    try:
+        heatmap_rows = []
+        for res in results:
+            tgt = res['target_value']
+            for model_name, runs in res['comparison_table'].items():
+                heatmap_rows.append({
+                    "Model": model_name,
+                    "Target Value": tgt,
+                    "R2": runs[0]['r2']  # identical across runs
+                })
+        df = pd.DataFrame(heatmap_rows)
+        pivot = df.pivot(index="Model", columns="Target Value", values="R2")
+
+        plt.figure(figsize=(8, 5))
+        sns.heatmap(pivot, annot=True, cmap="Blues", fmt=".2f",
+                    vmin=df["R2"].min(), vmax=df["R2"].max(),
+                    cbar_kws={'label': 'R²'})
+        plt.title("Model R² vs Target Value")
+        plt.tight_layout()
+        return plot_to_base64(plt.gcf())
+
+    except Exception as e:
+        print(f"R² heatmap plot failed: {e}")
+        return None
+
+# ───────────────────────────────────────────────────────────
+# 4️⃣  ERROR  BOX-PLOT  (all runs)
+# ───────────────────────────────────────────────────────────
+def plot_error_distribution(results):
+    """Box-plot of % error per model/target (all runs)."""
+    try:
+        rows = []
+        for res in results:
+            tgt = str(res['target_value'])
+            for model_name, runs in res['comparison_table'].items():
+                for sol in runs:
+                    rows.append({
+                        "Model": model_name,
+                        "Target Value": tgt,
+                        "% Error": sol['error'] * 100
+                    })
+
+        if not rows:
+            return None
+        df = pd.DataFrame(rows)
+
+        plt.figure(figsize=(12, 6))
+        sns.boxplot(data=df, x="Model", y="% Error", hue="Target Value",
+                    palette="viridis", showfliers=True)
+        plt.axhline(0, ls='--', c='gray', alpha=.5)
+        plt.title("% Error Distribution")
+        plt.tight_layout()
+        return plot_to_base64(plt.gcf())
+
+    except Exception as e:
+        print(f"Error-boxplot failed: {e}")
+        return None
+
+# ───────────────────────────────────────────────────────────
+# 5️⃣  STRIP  (Predicted vs Target)  – one point *per run*
+# ───────────────────────────────────────────────────────────
+def plot_predicted_vs_target_strip(results):
+    try:
+        rows = []
+        for res in results:
+            tgt = res['target_value']
+            for model_name, runs in res['comparison_table'].items():
+                for sol in runs:
+                    rows.append({
+                        "Model": model_name,
+                        "Target Value": tgt,
+                        "Predicted": sol['prediction'],
+                        "R2": sol['r2'],
+                        "MSE": sol['mse'],
+                        "ACC": sol['accuracy_like']
+                    })
+        df = pd.DataFrame(rows)
+
+        # legend labels with mean metrics
+        mean_metrics = df.groupby("Model")[["R2", "MSE", "ACC"]].mean()
+        lbl_map = {m: f"{m} (R²={r['R2']:.2f}, MSE={r['MSE']:.2f}, ACC={r['ACC']:.2f})"
+                   for m, r in mean_metrics.iterrows()}
+        df["ModelLbl"] = df["Model"].map(lbl_map)
+
+        plt.figure(figsize=(12, 6))
+        sns.stripplot(data=df, x="Target Value", y="Predicted",
+                      hue="ModelLbl", dodge=True, jitter=.2, alpha=.7)
+        xs = sorted(df["Target Value"].unique())
+        # plt.plot(xs, xs, 'k--', alpha=.3)
+        plt.title("Predicted vs Target (all PSO runs)")
+        plt.tight_layout()
+        return plot_to_base64(plt.gcf())
+    except Exception as e:
+        print(f"Strip plot failed: {e}")
+        return None
+
+# ───────────────────────────────────────────────────────────
+# 6️⃣  SCATTER  (Predicted vs Target)  – best run per model
+# ───────────────────────────────────────────────────────────
+def plot_predicted_vs_target_scatter(results):
+    try:
+        rows = []
+        for res in results:
+            tgt = res['target_value']
+            for model_name, runs in res['comparison_table'].items():
+                best = min(runs, key=lambda d: d['error'])  # one point per model
+                rows.append({
+                    "Model": model_name,
+                    "Target Value": tgt,
+                    "Predicted": best['prediction'],
+                    "R2": best['r2']
+                })
+        df = pd.DataFrame(rows)
+        mean_r2 = df.groupby("Model")["R2"].mean()
+        lbl_map = {m: f"{m} (R²={r:.2f})" for m, r in mean_r2.items()}
+        df["ModelLbl"] = df["Model"].map(lbl_map)
+
+        plt.figure(figsize=(12, 6))
+        sns.scatterplot(data=df, x="Target Value", y="Predicted",
+                        hue="ModelLbl", style="ModelLbl", s=100, alpha=.8)
+
+        mn = min(df["Target Value"].min(), df["Predicted"].min())
+        mx = max(df["Target Value"].max(), df["Predicted"].max())
+        # plt.plot([mn, mx], [mn, mx], 'k--', alpha=.3)
+        plt.grid(True, alpha=.2)
+        plt.title("Predicted vs Target (best PSO run per model)")
+        plt.tight_layout()
+        return plot_to_base64(plt.gcf())
+    except Exception as e:
+        print(f"Scatter plot failed: {e}")
+        return None
+
+
+# Graph name -> renderer, in the order graphs are generated
+GRAPH_RENDERERS = {
+    'pso_convergence': plot_pso_convergence,
+    'pca_analysis': plot_pca_analysis,
+    'r2_heatmap': plot_r2_heatmap,
+    'error_distribution': plot_error_distribution,
+    'predicted_vs_target_strip': plot_predicted_vs_target_strip,
+    'predicted_vs_target_scatter': plot_predicted_vs_target_scatter,
+    'model_comparison': plot_model_comparison,
+}
+
+
+def available_graphs(results):
+    """Names of the graphs that apply to `results`"""
+    names = list(GRAPH_RENDERERS)
+    # Each Pareto restart minimizes its own weighted sum, so there is no error curve to plot
+    if results and all(_is_pareto(result) for result in results):
+        names.remove('pso_convergence')
+    return names
+
+
+def render_graph(name, results):
+    """Render one named graph as a base64 PNG (None if the plot failed)"""
+    if name not in GRAPH_RENDERERS:
+        raise ValueError(f"Unknown graph: {name}")
+    with _render_lock:
+        return GRAPH_RENDERERS[name](results)
+
+
+def generate_graphs(results):
+    """Generate visualization graphs"""
+    graphs = {}
+
+    try:
+        for name in available_graphs(results):
+            graphs[name] = render_graph(name, results)
+
+    except Exception as e:
+        print(f"Graph generation failed: {str(e)}")
+
+    return graphs
@@ -0,0 +1,105 @@
+# model_cache.py
+"""
+On-disk cache of trained MLOptimizer models.
+
+Entries are keyed by a content hash of everything that determines the trained
+models (data, features, target, scaling and model hyperparameters), so a
+resubmitted dataset with a different `target_value` reuses the fitted models
+instead of retraining them. The least recently used entries are evicted once
+the cache exceeds its entry count or total size limit.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import joblib
+import pandas as pd
+
+CACHE_FORMAT_VERSION = 1
+
+
+def dataset_fingerprint(data, features, target, scale_before_fit, model_params, cv_folds=0):
+    """Content hash identifying a set of trained models"""
+    frame = pd.DataFrame(data)[list(features) + [target]]
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    digest.update(json.dumps({
+        'version': CACHE_FORMAT_VERSION,
+        'features': list(features),
+        'target': target,
+        'scale_before_fit': bool(scale_before_fit),
+        'model_params': model_params,
+        'cv_folds': int(cv_folds or 0),
+    }, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """LRU cache of pickled model bundles stored as one file per key"""
+
+    def __init__(self, directory, max_entries=20, max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.joblib")
+
+    def get(self, key):
+        """Return the cached bundle for `key`, or None on a miss"""
+        path = self._path(key)
+        try:
+            bundle = joblib.load(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Discarding unreadable model cache entry {key}: {str(e)}")
+            self._remove(path)
+            return None
+
+        # Mark as recently used
+        os.utime(path)
+        return bundle
+
+    def put(self, key, bundle):
+        """Store `bundle` under `key` and evict old entries beyond the limits"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump(bundle, tmp_path)
+            # Atomic, so concurrent workers never read a partial file
+            os.replace(tmp_path, self._path(key))
+        finally:
+            self._remove(tmp_path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.joblib'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Newest first; keep entries while both limits hold
+        entries.sort(reverse=True)
+        kept, total_bytes = 0, 0
+        for _, size, path in entries:
+            if kept >= self.max_entries or total_bytes + size > self.max_bytes:
+                self._remove(path)
+                continue
+            kept += 1
+            total_bytes += size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
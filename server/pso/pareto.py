@@ -0,0 +1,140 @@
+# pareto.py
+"""
+Multi-objective (Pareto) inverse design.
+
+Matching the target is not the only thing that matters: a solution far from
+every training row relies on the model extrapolating, and some descriptors
+are costlier to change than others. In Pareto mode every candidate is scored
+on
+
+* error: |prediction - target|,
+* distance: RMS z-score distance to the nearest training row,
+* penalty: the user-weighted feature cost sum_j w_j * (x_j - lb_j) / (ub_j - lb_j),
+  normalized by sum_j |w_j| (only when `feature_penalties` are given),
+
+and the result is the set of candidates no other candidate beats on every
+objective. Each PSO restart minimizes its own weighted sum of the normalized
+objectives, so restarts spread along the front, while an archive keeps the
+non-dominated particles seen during the whole run.
+"""
+import numpy as np
+
+from .swarm import pso
+
+
+def _dominance(F):
+    """(n, n) matrix whose [i, j] is True when row i of F dominates row j"""
+    no_worse = np.all(F[:, None, :] <= F[None, :, :], axis=2)
+    better = np.any(F[:, None, :] < F[None, :, :], axis=2)
+    return no_worse & better
+
+
+def crowding_distance(F):
+    """NSGA-II crowding distance of every row of F; boundary rows are infinite"""
+    F = np.asarray(F, dtype=float)
+    n = len(F)
+    if n <= 2:
+        return np.full(n, np.inf)
+
+    order = np.argsort(F, axis=0, kind='stable')
+    sorted_F = np.take_along_axis(F, order, axis=0)
+    span = sorted_F[-1] - sorted_F[0]
+    span[span == 0] = 1.0
+    gaps = np.empty_like(F)
+    gaps[1:-1] = (sorted_F[2:] - sorted_F[:-2]) / span
+    gaps[[0, -1]] = np.inf
+
+    distance = np.zeros(n)
+    np.add.at(distance, order.ravel(), gaps.ravel())
+    return distance
+
+
+def pareto_front(F, size=None):
+    """Indices of the non-dominated rows of F, thinned to the `size` least crowded"""
+    F = np.asarray(F, dtype=float)
+    front = np.flatnonzero(~_dominance(F).any(axis=0))
+    if size is not None and front.size > size:
+        crowding = crowding_distance(F[front])
+        front = np.sort(front[np.argsort(-crowding, kind='stable')[:size]])
+    return front
+
+
+class ParetoObjectives:
+    """Objective vectors of candidate solutions, in raw feature units"""
+
+    def __init__(self, X_train, lb, ub, penalties=None):
+        X_train = np.asarray(X_train, dtype=float)
+        std = X_train.std(axis=0)
+        self.mean = X_train.mean(axis=0)
+        self.scale = np.where(std > 0, std, 1.0)
+        self.Z_train = (X_train - self.mean) / self.scale
+        self.Z_train_sq = (self.Z_train ** 2).sum(axis=1)
+
+        self.lb = np.asarray(lb, dtype=float)
+        self.width = np.asarray(ub, dtype=float) - self.lb
+        self.penalties = None
+        if penalties is not None and np.any(penalties):
+            penalties = np.asarray(penalties, dtype=float)
+            self.penalties = penalties / np.abs(penalties).sum()
+        self.names = ('error', 'distance') + (('penalty',) if self.penalties is not None else ())
+
+    def __call__(self, X, errors):
+        """(n, len(names)) objectives of the rows of X with target errors `errors`"""
+        X = np.asarray(X, dtype=float)
+        Z = (X - self.mean) / self.scale
+        # Squared distances to every training row from one matrix product
+        sq = (Z ** 2).sum(axis=1)[:, None] + self.Z_train_sq[None, :] - 2 * Z @ self.Z_train.T
+        distance = np.sqrt(np.maximum(sq.min(axis=1), 0.0) / X.shape[1])
+        columns = [np.asarray(errors, dtype=float), distance]
+        if self.penalties is not None:
+            columns.append(((X - self.lb) / self.width) @ self.penalties)
+        return np.column_stack(columns)
+
+    def weights(self, solution_num, seed):
+        """Scalarization weights of restart `solution_num`; the first restart only matches the target"""
+        if solution_num == 0:
+            return np.eye(len(self.names))[0]
+        return np.random.default_rng([seed, solution_num]).dirichlet(np.ones(len(self.names)))
+
+    @staticmethod
+    def scalarize(F, target_value, weights):
+        """Weighted sum of the objectives, with the error relative to the target"""
+        scale = np.ones(F.shape[1])
+        scale[0] = max(abs(target_value), 1e-10)
+        return (F / scale) @ weights
+
+
+class ParetoArchive:
+    """Non-dominated (X, F) rows seen so far, at most `size` of them"""
+
+    def __init__(self, size):
+        self.size = size
+        self.X = None
+        self.F = None
+
+    def add(self, X, F):
+        finite = np.all(np.isfinite(F), axis=1)
+        X, F = X[finite], F[finite]
+        if self.X is not None:
+            X, F = np.vstack([self.X, X]), np.vstack([self.F, F])
+        front = pareto_front(F, self.size)
+        self.X, self.F = X[front], F[front]
+
+
+def pareto_pso(predict, target_value, objectives, weights, archive_size, lb, ub, **swarm_kwargs):
+    """
+    One PSO run minimizing the `weights` scalarization of `objectives`.
+    Returns (xopt, fopt, history, (X_front, F_front)), the last being the
+    archive of non-dominated particles evaluated during the run.
+    """
+    archive = ParetoArchive(archive_size)
+
+    def objective(X):
+        F = objectives(X, np.abs(np.asarray(predict(X), dtype=float) - target_value))
+        archive.add(X, F)
+        return objectives.scalarize(F, target_value, weights)
+
+    xopt, fopt, history = pso(objective, lb, ub, **swarm_kwargs)
+    if archive.X is None:
+        archive.X, archive.F = np.empty((0, np.size(lb))), np.empty((0, len(objectives.names)))
+    return xopt, fopt, history, (archive.X, archive.F)
@@ -0,0 +1,81 @@
+# refine.py
+"""
+Bounded local polishing of PSO optima.
+
+PSO gets close to the target quickly but converges slowly on it. Starting
+from each swarm optimum, a local optimizer inside [lb, ub] usually closes
+the remaining gap for a fraction of the cost of more iterations or restarts.
+
+The trained models are tree ensembles, so their predictions are piecewise
+constant and have no useful analytic gradient. L-BFGS-B therefore works on
+the squared error with a forward-difference gradient whose step is relative
+to the box width, large enough to cross leaf boundaries; the objective and
+the whole gradient come from one batched predict call. Nelder-Mead needs no
+gradient and is the more robust choice for very coarse models.
+"""
+import numpy as np
+from scipy.optimize import minimize
+
+REFINE_METHODS = ('l-bfgs-b', 'nelder-mead')
+
+
+def _squared_error_with_gradient(predict, target_value, lb, ub, step):
+    """(f, grad) of (predict(x) - target)^2, both from a single predict call"""
+    h = step * (ub - lb)
+
+    def fun(x):
+        # Step backwards where a forward step would leave the box
+        steps = np.where(x + h <= ub, h, -h)
+        X = np.vstack([x, x + np.diag(steps)])
+        f = (np.asarray(predict(X), dtype=float) - target_value) ** 2
+        return f[0], (f[1:] - f[0]) / steps
+
+    return fun
+
+
+def refine_solution(predict, x0, target_value, lb, ub, method='l-bfgs-b', maxiter=50, step=0.05,
+                    repair=None):
+    """
+    Polish one PSO optimum with a bounded local optimizer.
+
+    `predict` maps a (n, n_features) matrix to n predictions. `step` is
+    relative to the box width: the finite-difference step of L-BFGS-B and
+    the initial simplex edge of Nelder-Mead. The refined point is passed
+    through `repair`, if given, so it meets the same feature constraints as
+    the swarm. Returns
+    (x, error_before, error_after); `x` stays `x0` unless refinement
+    lowered |predict(x) - target_value|. `method` is case-insensitive.
+    """
+    method = str(method).lower()
+    lb = np.asarray(lb, dtype=float)
+    ub = np.asarray(ub, dtype=float)
+    x0 = np.clip(np.asarray(x0, dtype=float), lb, ub)
+
+    def error(x):
+        return float(abs(np.asarray(predict(x.reshape(1, -1)), dtype=float)[0] - target_value))
+
+    error_before = error(x0)
+    bounds = list(zip(lb, ub))
+
+    if method == 'l-bfgs-b':
+        res = minimize(
+            _squared_error_with_gradient(predict, target_value, lb, ub, step), x0,
+            jac=True, method='L-BFGS-B', bounds=bounds, options={'maxiter': maxiter}
+        )
+    elif method == 'nelder-mead':
+        # Box-relative simplex; every vertex costs one predict, so cap evaluations too
+        edges = step * (ub - lb)
+        simplex = np.vstack([x0, x0 + np.diag(np.where(x0 + edges <= ub, edges, -edges))])
+        res = minimize(error, x0, method='Nelder-Mead', bounds=bounds, options={
+            'maxiter': maxiter, 'maxfev': x0.size + 1 + 2 * maxiter, 'initial_simplex': simplex
+        })
+    else:
+        raise ValueError(f"Unknown refinement method: {method}")
+
+    x = np.clip(res.x, lb, ub)
+    if repair is not None:
+        x = repair(x)
+    error_after = error(x)
+    if not np.isfinite(error_after) or error_after >= error_before:
+        return x0, error_before, error_before
+    return x, error_before, error_after
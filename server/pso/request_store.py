@@ -0,0 +1,124 @@
+# request_store.py
+"""
+Deduplication of identical PSO submissions.
+
+Users double-click "Optimize" and the client may re-post the same payload;
+every post used to start another task that keeps a worker busy for minutes.
+`RequestStore` maps the fingerprint of a request to the id of the task
+started for it, so an identical request within `ttl` seconds gets that task
+id back, whether the task is still running or has finished. Finished results
+are kept here as well for `ttl` seconds, independently of the Celery result
+backend.
+
+Everything is stored as small files under one directory, shared by the web
+and worker processes of the host. Registering a task is a single atomic
+hard link, so concurrent identical requests cannot both start a task.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+
+def request_fingerprint(request_data):
+    """SHA-256 of a request payload, independent of key order"""
+    blob = json.dumps(request_data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+class RequestStore:
+    """Task id per request fingerprint and result per task id, each kept for `ttl` seconds"""
+
+    def __init__(self, directory, ttl):
+        self.requests_dir = os.path.join(directory, 'requests')
+        self.results_dir = os.path.join(directory, 'results')
+        os.makedirs(self.requests_dir, exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+        self.ttl = ttl
+
+    def _fresh(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) < self.ttl
+        except OSError:
+            return False
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def claim(self, fingerprint, task_id, is_reusable=None):
+        """
+        Register `task_id` for `fingerprint` unless a task registered within
+        `ttl` (and accepted by `is_reusable(task_id)`, if given) already
+        exists. Returns (task_id, reused): the existing task id and True, or
+        `task_id` and False when the caller should start it.
+        """
+        path = os.path.join(self.requests_dir, fingerprint)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(task_id)
+
+        try:
+            # A second attempt follows the removal of a stale or unusable entry
+            for _ in range(2):
+                try:
+                    os.link(tmp_path, path)
+                    return task_id, False
+                except FileExistsError:
+                    try:
+                        with open(path) as f:
+                            existing = f.read().strip()
+                    except FileNotFoundError:
+                        continue
+                    if existing and self._fresh(path) and (is_reusable is None or is_reusable(existing)):
+                        return existing, True
+                    self._remove(path)
+            return task_id, False
+        finally:
+            self._remove(tmp_path)
+            self.prune()
+
+    def release(self, fingerprint, task_id):
+        """Drop the entry of `fingerprint` if it still names `task_id`, e.g. when the task could not be started"""
+        path = os.path.join(self.requests_dir, fingerprint)
+        try:
+            with open(path) as f:
+                if f.read().strip() != task_id:
+                    return
+        except FileNotFoundError:
+            return
+        self._remove(path)
+
+    def put_result(self, task_id, payload):
+        """Keep the JSON-serializable result of a finished task"""
+        path = os.path.join(self.results_dir, f"{task_id}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    def get_result(self, task_id):
+        """Result stored for `task_id` within `ttl`, or None"""
+        if not re.fullmatch(r'[\w-]+', task_id):
+            return None
+        path = os.path.join(self.results_dir, f"{task_id}.json")
+        if not self._fresh(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def prune(self):
+        """Delete request entries and results older than `ttl`"""
+        for directory in (self.requests_dir, self.results_dir):
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if not name.endswith('.tmp') and not self._fresh(path):
+                    self._remove(path)
@@ -0,0 +1,151 @@
+# results.py
+"""
+Compact columnar storage of MLOptimizer results.
+
+`MLOptimizer.optimize_for_targets` returns one dict per PSO run, repeating
+every feature name and the model's test-set predictions in each of them. The
+task stores results columnar instead: per target and model, one matrix of
+solutions (runs x features) plus one array per metric, with the per-model
+metrics kept once. Each array is made NaN-safe in one vectorized pass when
+the task stores it, so the status view can return it without walking it.
+"""
+import numpy as np
+
+COLUMNAR_FORMAT = 'columnar'
+
+# Per-run scalar fields stored as one array per model
+RUN_FIELDS = ('prediction', 'error', 'runtime', 'fopt', 'accuracy_like', 'pre_refine_error', 'duplicates',
+              'uncertainty')
+
+
+def nan_safe(values):
+    """Array-like of floats -> nested list with NaN/inf replaced by None"""
+    arr = np.asarray(values, dtype=float)
+    out = arr.astype(object)
+    out[~np.isfinite(arr)] = None
+    return out.tolist()
+
+
+def _nan_safe_scalar(value):
+    return float(value) if value is not None and np.isfinite(value) else None
+
+
+def to_columnar(payload, features):
+    """Convert an optimize_for_targets payload into the columnar format"""
+    model_metrics = {}
+    results = []
+
+    for result in payload.get('results', []):
+        table = {}
+        for model_name, runs in result['comparison_table'].items():
+            if runs and model_name not in model_metrics:
+                model_metrics[model_name] = {
+                    'r2': runs[0]['r2'],
+                    'mse': runs[0]['mse'],
+                    'r2_std': runs[0].get('r2_std'),
+                    'mse_std': runs[0].get('mse_std'),
+                    'y_pred_on_test': np.asarray(runs[0]['y_pred_on_test'], dtype=float),
+                }
+            table[model_name] = {
+                'solutions': np.array([[run['solution'][f] for f in features] for run in runs],
+                                      dtype=float).reshape(len(runs), len(features)),
+                **{field: np.array([run[field] for run in runs], dtype=float) for field in RUN_FIELDS},
+                'convergence': [np.asarray(run.get('convergence', []), dtype=float) for run in runs],
+            }
+
+        best_solution = {k: v for k, v in result['best_solution'].items() if k != 'y_pred_on_test'}
+        results.append({
+            'target_value': result['target_value'],
+            'best_model': result['best_model'],
+            'best_runtime': result['best_runtime'],
+            'best_fopt': result['best_fopt'],
+            'best_solution': best_solution,
+            'comparison_table': table,
+            'pareto_front': result.get('pareto_front'),
+        })
+
+    return {
+        'format': COLUMNAR_FORMAT,
+        'features': list(features),
+        'model_metrics': model_metrics,
+        'results': results,
+        'combined_graphs': payload.get('combined_graphs'),
+    }
+
+
+def encode_columnar(columnar):
+    """Make a columnar payload JSON serializable, converting every array NaN-safe in one pass"""
+    encoded_results = []
+    for result in columnar['results']:
+        table = {}
+        for model_name, runs in result['comparison_table'].items():
+            table[model_name] = {
+                'solutions': nan_safe(runs['solutions']),
+                **{field: nan_safe(runs[field]) for field in RUN_FIELDS},
+                'convergence': [nan_safe(c) for c in runs['convergence']],
+            }
+        best_solution = dict(result['best_solution'])
+        best_solution['features'] = dict(zip(best_solution['features'],
+                                             nan_safe(list(best_solution['features'].values()))))
+        for key in ('prediction', 'error', 'pre_refine_error', 'runtime', 'mse', 'r2', 'accuracy_like'):
+            if key in best_solution:
+                best_solution[key] = _nan_safe_scalar(best_solution[key])
+        pareto_front = result.get('pareto_front')
+        if pareto_front is not None:
+            pareto_front = {key: values if key == 'model' else nan_safe(values)
+                            for key, values in pareto_front.items()}
+        encoded_results.append({
+            **result,
+            'pareto_front': pareto_front,
+            'best_runtime': _nan_safe_scalar(result['best_runtime']),
+            'best_fopt': _nan_safe_scalar(result['best_fopt']),
+            'best_solution': best_solution,
+            'comparison_table': table,
+        })
+
+    return {
+        **columnar,
+        'model_metrics': {
+            model_name: {
+                'r2': _nan_safe_scalar(metrics['r2']),
+                'mse': _nan_safe_scalar(metrics['mse']),
+                'r2_std': _nan_safe_scalar(metrics.get('r2_std')),
+                'mse_std': _nan_safe_scalar(metrics.get('mse_std')),
+                'y_pred_on_test': nan_safe(metrics['y_pred_on_test']),
+            }
+            for model_name, metrics in columnar['model_metrics'].items()
+        },
+        'results': encoded_results,
+    }
+
+
+def from_columnar(columnar):
+    """Expand a stored columnar payload back into per-run dicts (used for plotting)"""
+    features = columnar['features']
+    model_metrics = columnar['model_metrics']
+    results = []
+
+    for result in columnar['results']:
+        comparison_table = {}
+        for model_name, runs in result['comparison_table'].items():
+            metrics = model_metrics.get(model_name, {})
+            comparison_table[model_name] = [
+                {
+                    'solution': dict(zip(features, solution)),
+                    # Results stored before a field was added lack its column
+                    **{field: runs[field][i] if field in runs else None for field in RUN_FIELDS},
+                    'convergence': runs['convergence'][i],
+                    'mse': metrics.get('mse'),
+                    'r2': metrics.get('r2'),
+                    'r2_std': metrics.get('r2_std'),
+                    'mse_std': metrics.get('mse_std'),
+                    'y_pred_on_test': metrics.get('y_pred_on_test'),
+                }
+                for i, solution in enumerate(runs['solutions'])
+            ]
+
+        best_solution = dict(result['best_solution'])
+        best_solution['y_pred_on_test'] = model_metrics.get(result['best_model'], {}).get('y_pred_on_test')
+        results.append({**result, 'best_solution': best_solution, 'comparison_table': comparison_table})
+
+    return {'results': results, 'combined_graphs': columnar.get('combined_graphs')}
@@ -0,0 +1,49 @@
+# solution_store.py
+"""
+Persisted PSO solutions, used to warm-start later requests.
+
+For every set of trained models (identified by the same dataset fingerprint
+as the model cache) the store keeps, per model, the best solution found for
+each target value. A later request on the same dataset seeds the swarm of a
+target with the stored solutions of its nearest targets, so sweeping a
+target grid over several requests does not start every swarm cold.
+"""
+import numpy as np
+
+from .model_cache import ModelCache
+
+
+class SolutionStore:
+    """Best solution per (model, target value), stored as one file per dataset fingerprint"""
+
+    def __init__(self, directory, max_entries=100, max_solutions=1000):
+        self.files = ModelCache(directory, max_entries=max_entries)
+        self.max_solutions = max_solutions
+
+    def get(self, key):
+        """{model_name: {'targets', 'X', 'errors'}} stored for `key`, empty on a miss"""
+        return self.files.get(key) or {}
+
+    def add(self, key, solutions):
+        """
+        Merge {model_name: (targets, X, errors)} into the entry for `key`,
+        keeping the lowest-error solution per target and the most recent
+        `max_solutions` targets per model.
+        """
+        stored = self.get(key)
+        for model_name, (targets, X, errors) in solutions.items():
+            old = stored.get(model_name, {'targets': np.empty(0), 'X': np.empty((0, np.shape(X)[1])),
+                                          'errors': np.empty(0)})
+            all_targets = np.concatenate([old['targets'], np.asarray(targets, dtype=float)])
+            all_X = np.vstack([old['X'], np.asarray(X, dtype=float)])
+            all_errors = np.concatenate([old['errors'], np.asarray(errors, dtype=float)])
+
+            # Lowest error first, then keep the first occurrence of every target
+            order = np.lexsort((all_errors, all_targets))
+            _, first = np.unique(all_targets[order], return_index=True)
+            keep = order[first]
+            # New solutions come last, so the highest indices are the most recent
+            keep = np.sort(keep)[-self.max_solutions:]
+            stored[model_name] = {'targets': all_targets[keep], 'X': all_X[keep], 'errors': all_errors[keep]}
+
+        self.files.put(key, stored)
@@ -0,0 +1,204 @@
+# swarm.py
+"""
+Batched Particle Swarm Optimizer used by MLOptimizer.
+
+Follows the same update rule and stopping criteria as `pyswarm.pso`, but the
+objective is called once per iteration with the whole swarm as a
+(swarmsize, n_features) matrix and must return one score per particle. This
+lets a trained model score every particle with a single `predict` call.
+
+`pso_multi_target` runs one independent swarm per target value and stacks
+all of them into a single `predict` call per iteration, since a particle's
+prediction does not depend on the target it is scored against.
+
+An optional `repair` callable maps positions of shape (..., n_features) onto
+the feasible set (see `constraints.FeatureConstraints`). It is applied right
+after every position update, so only feasible points are ever evaluated.
+
+Swarms start uniformly at random unless given `init_positions`;
+`quasi_random_positions` draws those from one scrambled Sobol sequence or
+Latin hypercube shared by all restarts, each restart taking its own block,
+so restarts together cover the box evenly instead of overlapping.
+"""
+import numpy as np
+from scipy.stats import qmc
+
+INIT_METHODS = ('uniform', 'sobol', 'lhs')
+
+
+def quasi_random_positions(method, lb, ub, shape, block, n_blocks, seed):
+    """
+    Initial positions of `shape` (n_swarms, swarmsize, n_dims) for restart
+    `block` of `n_blocks`, taken from one low-discrepancy design over
+    [lb, ub] determined by `seed`.
+    """
+    n_swarms, swarmsize, n_dims = shape
+    n = n_swarms * swarmsize
+    lb = np.asarray(lb, dtype=float)
+    ub = np.asarray(ub, dtype=float)
+
+    if method == 'sobol':
+        sampler = qmc.Sobol(d=n_dims, scramble=True, seed=seed)
+        if block:
+            sampler.fast_forward(block * n)
+        unit = sampler.random(n)
+    elif method == 'lhs':
+        # Strata span every restart, so each block is a disjoint share of one design
+        design = qmc.LatinHypercube(d=n_dims, seed=seed).random(n * max(n_blocks, block + 1))
+        unit = design[block * n:(block + 1) * n]
+    else:
+        raise ValueError(f"Unknown initialization method: {method}")
+
+    return (lb + unit * (ub - lb)).reshape(shape)
+
+
+def _search(evaluate, lb, ub, n_swarms, swarmsize, omega, phip, phig,
+            maxiter, minstep, minfunc, seed, patience=0, patience_tol=0.0, fstop=None,
+            repair=None, init_positions=None):
+    """
+    Run `n_swarms` independent swarms in lock-step.
+
+    `evaluate(x, active)` receives the positions of the still-running swarms,
+    shape (len(active), swarmsize, n_dims), together with their swarm indices
+    and returns scores of shape (len(active), swarmsize).
+
+    Besides pyswarm's `minstep`/`minfunc` criteria, a swarm stops once its best
+    score has not improved by more than `patience_tol` for `patience`
+    consecutive iterations (0 disables), or once it reaches `fstop`.
+    """
+    lb = np.asarray(lb, dtype=float)
+    ub = np.asarray(ub, dtype=float)
+    if lb.shape != ub.shape:
+        raise ValueError("Lower- and upper-bounds must be the same length")
+    if not np.all(ub > lb):
+        raise ValueError("All upper-bound values must be greater than lower-bound values")
+
+    rng = np.random.default_rng(seed)
+    n_dims = lb.size
+    vhigh = np.abs(ub - lb)
+    vlow = -vhigh
+
+    def score(positions, active):
+        scores = np.asarray(evaluate(positions, active), dtype=float)
+        scores = scores.reshape(len(active), swarmsize)
+        # Treat failed predictions as the worst possible score
+        return np.where(np.isfinite(scores), scores, np.inf)
+
+    # Initialize the swarms
+    shape = (n_swarms, swarmsize, n_dims)
+    if init_positions is None:
+        x = lb + rng.random(shape) * (ub - lb)
+    else:
+        x = np.array(init_positions, dtype=float).reshape(shape)
+    if repair is not None:
+        x = repair(x)
+    v = vlow + rng.random(shape) * (vhigh - vlow)
+    fx = score(x, np.arange(n_swarms))
+
+    p = x.copy()
+    fp = fx.copy()
+    i_best = np.argmin(fp, axis=1)
+    g = p[np.arange(n_swarms), i_best].copy()
+    fg = fp[np.arange(n_swarms), i_best].copy()
+    histories = [[float(f)] for f in fg]
+    running = np.ones(n_swarms, dtype=bool)
+    if fstop is not None:
+        running &= fg > fstop
+    stalled = np.zeros(n_swarms, dtype=int)
+
+    for _ in range(maxiter):
+        active = np.flatnonzero(running)
+        if active.size == 0:
+            break
+
+        rp = rng.random((active.size, swarmsize, n_dims))
+        rg = rng.random((active.size, swarmsize, n_dims))
+
+        # Update velocities and positions, keeping particles inside the box
+        xa, pa, ga = x[active], p[active], g[active][:, None, :]
+        va = omega * v[active] + phip * rp * (pa - xa) + phig * rg * (ga - xa)
+        xa = np.clip(xa + va, lb, ub)
+        if repair is not None:
+            xa = repair(xa)
+        fxa = score(xa, active)
+        v[active] = va
+        x[active] = xa
+
+        # Update personal bests
+        fpa = fp[active]
+        improved = fxa < fpa
+        pa[improved] = xa[improved]
+        fpa[improved] = fxa[improved]
+        p[active] = pa
+        fp[active] = fpa
+
+        # Update the global best of every swarm that is still running
+        i_best = np.argmin(fpa, axis=1)
+        for k, swarm in enumerate(active):
+            f_new = fpa[k, i_best[k]]
+            improvement = 0.0
+            if f_new < fg[swarm]:
+                x_new = pa[k, i_best[k]]
+                stepsize = np.sqrt(np.sum((g[swarm] - x_new) ** 2))
+                improvement = fg[swarm] - f_new
+                if improvement <= minfunc or stepsize <= minstep:
+                    running[swarm] = False
+                g[swarm] = x_new
+                fg[swarm] = f_new
+            histories[swarm].append(float(fg[swarm]))
+
+            # Early termination on stagnation or once the score is good enough
+            stalled[swarm] = 0 if improvement > patience_tol else stalled[swarm] + 1
+            if patience and stalled[swarm] >= patience:
+                running[swarm] = False
+            if fstop is not None and fg[swarm] <= fstop:
+                running[swarm] = False
+
+    return g, fg, histories
+
+
+def pso(func, lb, ub, args=(), swarmsize=100, omega=0.5, phip=0.5, phig=0.5,
+        maxiter=100, minstep=1e-8, minfunc=1e-8, seed=None, patience=0,
+        patience_tol=0.0, fstop=None, repair=None, init_positions=None):
+    """
+    Minimize `func` inside the box [lb, ub].
+
+    Returns (xopt, fopt, history) where `history` holds the best objective
+    value after initialization and after every iteration actually run.
+    """
+    def evaluate(x, active):
+        return func(x[0], *args)
+
+    g, fg, histories = _search(evaluate, lb, ub, 1, swarmsize, omega, phip, phig,
+                               maxiter, minstep, minfunc, seed, patience, patience_tol, fstop, repair,
+                               init_positions)
+    return g[0], float(fg[0]), histories[0]
+
+
+def pso_multi_target(predict, target_values, lb, ub, swarmsize=100, omega=0.5,
+                     phip=0.5, phig=0.5, maxiter=100, minstep=1e-8, minfunc=1e-8,
+                     seed=None, patience=0, patience_tol=0.0, fstop=None, repair=None,
+                     init_positions=None):
+    """
+    Minimize |predict(x) - t| for every t in `target_values`, one swarm per target.
+
+    `predict` maps a (n_particles, n_features) matrix to one prediction per row
+    and is called once per iteration for all running swarms together. It may
+    also return a (predictions, penalties) pair; the penalties are then added
+    to the errors.
+    Returns (xopt, fopt, histories) with one entry per target.
+    """
+    target_values = np.asarray(target_values, dtype=float)
+    n_dims = np.asarray(lb).size
+
+    def evaluate(x, active):
+        output = predict(x.reshape(-1, n_dims))
+        predictions, penalties = output if isinstance(output, tuple) else (output, 0.0)
+        predictions = np.asarray(predictions, dtype=float).reshape(len(active), swarmsize)
+        penalties = np.reshape(penalties, (len(active), swarmsize) if np.ndim(penalties) else ())
+        return np.abs(predictions - target_values[active][:, None]) + penalties
+
+    g, fg, histories = _search(evaluate, lb, ub, len(target_values), swarmsize,
+                               omega, phip, phig, maxiter, minstep, minfunc, seed,
+                               patience, patience_tol, fstop, repair, init_positions)
+    return g, [float(f) for f in fg], histories
@@ -1,8 +1,14 @@
 import logging
+import time
 
 import pandas as pd
 from celery import shared_task
+from django.conf import settings
 
+from .model_cache import ModelCache
+from .request_store import RequestStore
+from .results import encode_columnar, to_columnar
+from .solution_store import SolutionStore
 from .utils import MLOptimizer, validate_request_data
 
 logger = logging.getLogger(__name__)
@@ -53,8 +59,59 @@ def prepare_default_dataset():
     }
 
 
-@shared_task
-def run_optimization_task(request_data):
+def get_model_cache():
+    """Trained-model cache configured in settings, or None when disabled"""
+    cache_dir = getattr(settings, 'PSO_MODEL_CACHE_DIR', None)
+    if not cache_dir:
+        return None
+    return ModelCache(
+        cache_dir,
+        max_entries=getattr(settings, 'PSO_MODEL_CACHE_MAX_ENTRIES', 20),
+        max_bytes=getattr(settings, 'PSO_MODEL_CACHE_MAX_BYTES', 2 * 1024 ** 3),
+    )
+
+
+def get_solution_store():
+    """Warm-start solution store configured in settings, or None when disabled"""
+    store_dir = getattr(settings, 'PSO_SOLUTION_STORE_DIR', None)
+    if not store_dir:
+        return None
+    return SolutionStore(store_dir)
+
+
+def get_request_store():
+    """Store of recent requests and results configured in settings, or None when disabled"""
+    store_dir = getattr(settings, 'PSO_REQUEST_STORE_DIR', None)
+    ttl = getattr(settings, 'PSO_REQUEST_TTL', 0)
+    if not store_dir or not ttl:
+        return None
+    return RequestStore(store_dir, ttl)
+
+
+def progress_publisher(task):
+    """
+    Callback publishing MLOptimizer progress snapshots as PROGRESS task meta,
+    at most once per PSO_PROGRESS_INTERVAL seconds except for the last run.
+    """
+    interval = getattr(settings, 'PSO_PROGRESS_INTERVAL', 1.0)
+    last_update = [0.0]
+
+    def publish(progress):
+        # Called directly rather than through a worker: there is no task to update
+        if not task.request.id:
+            return
+        now = time.monotonic()
+        finished = progress['runs_completed'] >= progress['runs_total']
+        if not finished and now - last_update[0] < interval:
+            return
+        last_update[0] = now
+        task.update_state(state='PROGRESS', meta=progress)
+
+    return publish
+
+
+@shared_task(bind=True)
+def run_optimization_task(self, request_data):
     """
     API endpoint for ML model optimization with PSO
     """
@@ -77,6 +134,8 @@ def run_optimization_task(request_data):
         pso_config = request_data.get('pso_config', {})
         target_values = request_data.get('target_value', [])
         scale_before_fit = request_data.get('scale_before_fit', True)
+        # Graphs are rendered on request by the graph endpoint unless asked for inline
+        render_graphs = request_data.get('render_graphs', False)
 
         logger.info(f"Starting optimization for targets: {target_values}")
         logger.info(f"Using {len(features)} features with {len(data)} data points")
@@ -87,12 +146,24 @@ def run_optimization_task(request_data):
             features=features,
             target=target,
             pso_config=pso_config,
-            scale_before_fit=scale_before_fit
+            scale_before_fit=scale_before_fit,
+            model_cache=get_model_cache(),
+            solution_store=get_solution_store()
         )
 
-        result = optimizer.optimize_for_targets(target_values)
+        result = optimizer.optimize_for_targets(
+            target_values,
+            render_graphs=render_graphs,
+            progress_callback=progress_publisher(self)
+        )
         logger.info("Optimization completed successfully")
-        return result
+        payload = encode_columnar(to_columnar(result, features))
+
+        # Identical requests reuse this result, even after the result backend dropped it
+        request_store = get_request_store()
+        if request_store is not None and self.request.id:
+            request_store.put_result(self.request.id, payload)
+        return payload
         
     except Exception as e:
         logger.error(f"Optimization failed: {str(e)}")
@@ -1,3 +1,647 @@
-from django.test import TestCase
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+from sklearn.preprocessing import StandardScaler
+
+from . import compiled
+from .benchmark import synthetic_dataset
+from .compiled import compile_predictor
+from .constraints import FeatureConstraints
+from .graph_cache import GraphCache
+from .graphs import GRAPH_RENDERERS, available_graphs, plot_pso_convergence
+from .model_cache import ModelCache
+from .pareto import crowding_distance, pareto_front
+from .refine import refine_solution
+from .request_store import RequestStore, request_fingerprint
+from .solution_store import SolutionStore
+from .results import RUN_FIELDS, encode_columnar, from_columnar, to_columnar
+from .swarm import pso, pso_multi_target
+from .tree_solver import _leaf_values_at, extract_tree_leaves, invert_tree_ensemble
+from .utils import AffineScaler, MLOptimizer, get_model, restart_seeds, validate_request_data
+
+HAS_ONNX = all(importlib.util.find_spec(name) is not None for name in ('onnxruntime', 'skl2onnx', 'onnxmltools'))
+
+
+def _optimizer(rows=60, n_features=6, scale_before_fit=True, model_cache=None, **config):
+    df, features, target = synthetic_dataset(rows, n_features, seed=0)
+    data = df[features + [target]].to_dict(orient='records')
+    optimizer = MLOptimizer(data, features, target, {'n_solutions': 2, 'nprocessors': 1, **config},
+                            scale_before_fit=scale_before_fit, model_cache=model_cache)
+    optimizer.pso_config.update(swarmsize=10, maxiter=5)
+    return optimizer, df[target]
+
+
+class AffineScalerTests(SimpleTestCase):
+    def test_matches_standard_scaler(self):
+        X = np.random.default_rng(0).normal(size=(50, 4))
+        scaler = StandardScaler().fit(X)
+        np.testing.assert_array_equal(AffineScaler(scaler).transform(X[:7]), scaler.transform(X[:7]))
+
+    def test_output_survives_read_only_consumers(self):
+        # CatBoost marks the array it predicts on read-only
+        scaler = AffineScaler(StandardScaler().fit(np.random.default_rng(0).normal(size=(20, 3))))
+        X = np.ones((5, 3))
+        first = scaler.transform(X)
+        first.flags.writeable = False
+        second = scaler.transform(X + 1)
+        self.assertFalse(np.shares_memory(first, second))
+
+
+class OptimizeForTargetsTests(SimpleTestCase):
+    def test_scale_before_fit_solves_every_run(self):
+        optimizer, y = _optimizer(scale_before_fit=True)
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            payload = optimizer.optimize_for_targets([float(y.median())], render_graphs=False)
+        self.assertNotIn("Optimization failed", log.getvalue())
+        [result] = payload['results']
+        for model_name in optimizer.objective_models:
+            self.assertTrue(result['comparison_table'][model_name], model_name)
+
+    def test_target_without_solutions_is_an_error(self):
+        optimizer, y = _optimizer()
+        optimizer._optimize_targets = lambda targets, *args: ([{m: [] for m in optimizer.objective_models}
+                                                               for _ in targets], None)
+        with self.assertRaisesRegex(ValueError, "No solution found"):
+            optimizer.optimize_for_targets([float(y.median())], render_graphs=False)
+
+
+class MergeDuplicatesTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.optimizer, _ = _optimizer(dedup_tol=0.01)
+
+    def _solution(self, position, prediction, error):
+        lb = np.asarray(self.optimizer.pso_config['lb'])
+        ub = np.asarray(self.optimizer.pso_config['ub'])
+        x = lb + position * (ub - lb)
+        return {'solution': dict(zip(self.optimizer.features, x)), 'prediction': prediction, 'error': error,
+                'duplicates': 0}
+
+    def test_distant_solutions_with_equal_predictions_are_kept(self):
+        model_name = self.optimizer.objective_models[0]
+        solutions = [self._solution(0.1, 100.0, 1.0), self._solution(0.9, 100.0, 1.0)]
+        self.assertEqual(len(self.optimizer._merge_duplicates(model_name, solutions)), 2)
+
+    def test_close_solutions_are_merged_into_the_better(self):
+        model_name = self.optimizer.objective_models[0]
+        solutions = [self._solution(0.5, 101.0, 2.0), self._solution(0.501, 100.5, 1.0)]
+        [kept] = self.optimizer._merge_duplicates(model_name, solutions)
+        self.assertEqual(kept['error'], 1.0)
+        self.assertEqual(kept['duplicates'], 1)
+
+    def test_disabled_by_default(self):
+        optimizer, _ = _optimizer()
+        self.assertEqual(optimizer.pso_config['dedup_tol'], 0.0)
+        self.assertEqual(optimizer.pso_config['init'], 'uniform')
+
+
+class WarmStartTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.optimizer, _ = _optimizer(warm_start=True, warm_start_neighbors=2)
+
+    def _results(self, solved):
+        """Per-target results with one solution, all features equal to `value`, for the solved targets"""
+        model_name = self.optimizer.objective_models[0]
+        return model_name, [
+            {model_name: [] if value is None else
+             [{'solution': {f: value for f in self.optimizer.features}, 'error': 0.0}]}
+            for value in solved
+        ]
+
+    def test_seeds_from_nearest_targets_and_interpolation(self):
+        model_name, results = self._results([1.0, None, 3.0, 7.0])
+        seeds = self.optimizer._warm_start_seeds(model_name, 1, [10.0, 20.0, 30.0, 70.0], results)
+        # Two nearest solved targets (10 and 30), then the interpolation between them
+        np.testing.assert_allclose(seeds[:, 0], [1.0, 3.0, 2.0])
+
+    def test_no_seeds_without_solved_targets(self):
+        model_name, results = self._results([None, None])
+        self.assertIsNone(self.optimizer._warm_start_seeds(model_name, 0, [10.0, 20.0], results))
+
+    def test_stored_solutions_seed(self):
+        model_name, results = self._results([None, None])
+        self.optimizer.stored_solutions = {model_name: {'targets': [15.0], 'X': [[5.0] * len(self.optimizer.features)]}}
+        try:
+            seeds = self.optimizer._warm_start_seeds(model_name, 0, [10.0, 20.0], results)
+        finally:
+            self.optimizer.stored_solutions = {}
+        np.testing.assert_allclose(seeds, [[5.0] * len(self.optimizer.features)])
+
+    def test_restarts_get_different_seeds(self):
+        seeds = np.array([[1.0, 1.0], [2.0, 2.0], [3.0, 3.0], [4.0, 4.0]])
+        lb, ub = np.zeros(2), np.full(2, 5.0)
+        np.testing.assert_array_equal(restart_seeds(seeds, 0, lb, ub, 123), seeds)
+        first, second = restart_seeds(seeds, 1, lb, ub, 123), restart_seeds(seeds, 2, lb, ub, 123)
+        self.assertEqual(len(first), 2)
+        self.assertFalse(np.array_equal(first, second))
+        self.assertTrue(np.all((first >= lb) & (first <= ub)))
+        np.testing.assert_array_equal(first, restart_seeds(seeds, 1, lb, ub, 123))
+
+    def test_off_by_default(self):
+        self.assertFalse(_optimizer()[0].pso_config['warm_start'])
+
+
+class SolutionStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = SolutionStore(self.directory.name, max_solutions=3)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip_keeps_best_per_target(self):
+        self.assertEqual(self.store.get('key'), {})
+        self.store.add('key', {'CatBoost': ([1.0, 2.0], [[1.0, 1.0], [2.0, 2.0]], [0.5, 0.5])})
+        self.store.add('key', {'CatBoost': ([1.0, 3.0], [[1.5, 1.5], [3.0, 3.0]], [0.1, 0.9])})
+        stored = SolutionStore(self.directory.name).get('key')['CatBoost']
+        order = np.argsort(stored['targets'])
+        np.testing.assert_array_equal(stored['targets'][order], [1.0, 2.0, 3.0])
+        np.testing.assert_array_equal(stored['X'][order][0], [1.5, 1.5])
+        np.testing.assert_array_equal(stored['errors'][order], [0.1, 0.5, 0.9])
+
+    def test_keeps_most_recent_targets(self):
+        for target in range(5):
+            self.store.add('key', {'CatBoost': ([float(target)], [[float(target)]], [0.0])})
+        np.testing.assert_array_equal(np.sort(self.store.get('key')['CatBoost']['targets']), [2.0, 3.0, 4.0])
+
+
+def _quadratic(center):
+    return lambda X: ((np.asarray(X) - center) ** 2).sum(axis=1)
+
+
+class SwarmTests(SimpleTestCase):
+    center = np.array([1.0, -2.0, 0.5])
+    lb, ub = [-5.0] * 3, [5.0] * 3
+
+    def test_finds_quadratic_minimum(self):
+        xopt, fopt, history = pso(_quadratic(self.center), self.lb, self.ub, swarmsize=30, maxiter=200,
+                                  minfunc=0, minstep=0, seed=0)
+        np.testing.assert_allclose(xopt, self.center, atol=1e-2)
+        self.assertLess(fopt, 1e-4)
+        self.assertEqual(history[-1], fopt)
+        self.assertTrue(np.all(np.diff(history) <= 0))
+
+    def test_stops_after_patience_stalled_iterations(self):
+        # With an unreachable tolerance every iteration counts as stalled
+        _, _, history = pso(_quadratic(self.center), self.lb, self.ub, swarmsize=10, maxiter=100,
+                            minfunc=0, minstep=0, seed=0, patience=3, patience_tol=np.inf)
+        self.assertEqual(len(history), 4)
+
+    def test_stops_at_fstop(self):
+        _, fopt, history = pso(_quadratic(self.center), self.lb, self.ub, swarmsize=10, maxiter=100,
+                               minfunc=0, minstep=0, seed=0, fstop=1.0)
+        self.assertLessEqual(fopt, 1.0)
+        self.assertTrue(all(f > 1.0 for f in history[:-1]))
+        self.assertLess(len(history), 101)
+
+    def test_rejects_inverted_bounds(self):
+        with self.assertRaises(ValueError):
+            pso(_quadratic(self.center), self.ub, self.lb)
+
+    def test_multi_target(self):
+        targets = [1.0, 5.0]
+        xopt, fopt, histories = pso_multi_target(lambda X: X.sum(axis=1), targets, [0.0] * 3, [3.0] * 3,
+                                                 swarmsize=20, maxiter=50, seed=0)
+        self.assertEqual(len(xopt), 2)
+        self.assertEqual(len(histories), 2)
+        np.testing.assert_allclose(np.asarray(xopt).sum(axis=1), targets, atol=1e-2)
+        self.assertTrue(all(f < 1e-2 for f in fopt))
+
+    def test_multi_target_adds_penalties(self):
+        _, fopt, _ = pso_multi_target(lambda X: (X.sum(axis=1), np.ones(len(X))), [1.0], [0.0] * 2,
+                                      [3.0] * 2, swarmsize=10, maxiter=20, seed=0)
+        self.assertGreaterEqual(fopt[0], 1.0)
+
+
+class RefineSolutionTests(SimpleTestCase):
+    def setUp(self):
+        from sklearn.ensemble import RandomForestRegressor
+
+        rng = np.random.default_rng(0)
+        X = rng.uniform(-1, 1, size=(300, 3))
+        y = X[:, 0] ** 2 + 2 * X[:, 1] - X[:, 2]
+        self.predict = RandomForestRegressor(n_estimators=20, random_state=0).fit(X, y).predict
+        self.lb, self.ub = np.full(3, -1.0), np.full(3, 1.0)
+        self.x0 = np.array([0.5, -0.5, 0.0])
+
+    def _check(self, x, error_before, error_after, target):
+        self.assertLessEqual(error_after, error_before)
+        self.assertTrue(np.all((x >= self.lb) & (x <= self.ub)))
+        self.assertAlmostEqual(abs(self.predict(x.reshape(1, -1))[0] - target), error_after)
+
+    def test_never_worse_and_inside_bounds(self):
+        for method in ('L-BFGS-B', 'Nelder-Mead', 'l-bfgs-b', 'nelder-mead'):
+            # 2.5 lies beyond what the forest can predict, pushing the search against the bounds
+            for target in (0.3, 2.5):
+                x, error_before, error_after = refine_solution(self.predict, self.x0, target, self.lb, self.ub,
+                                                               method=method, maxiter=20)
+                self._check(x, error_before, error_after, target)
+
+    def test_improves_a_poor_start(self):
+        x, error_before, error_after = refine_solution(self.predict, self.x0, 1.0, self.lb, self.ub,
+                                                       method='Nelder-Mead')
+        self.assertLess(error_after, error_before)
+        self._check(x, error_before, error_after, 1.0)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            refine_solution(self.predict, self.x0, 0.0, self.lb, self.ub, method='powell')
+
+
+class CompilePredictorTests(SimpleTestCase):
+    models = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        df, features, target = synthetic_dataset(120, 6, seed=0)
+        X, y = df[features].to_numpy(dtype=float), df[target].to_numpy(dtype=float)
+        cls.X_check = X[:60]
+        # Unseen points, many of them between training values and outside the training range
+        rng = np.random.default_rng(1)
+        cls.X_new = rng.uniform(X.min(axis=0) - 1, X.max(axis=0) + 1, size=(200, X.shape[1]))
+        for name in ('Decision Tree', 'Random Forest', 'XGBoost', 'CatBoost'):
+            model = get_model(name)
+            if name == 'Random Forest':
+                model.set_params(n_estimators=20)
+            cls.models[name] = model.fit(X, y)
+
+    def _assert_matches(self, model, predictor):
+        expected = model.predict(self.X_new)
+        np.testing.assert_allclose(predictor.predict(self.X_new), expected, rtol=1e-5,
+                                   atol=1e-5 * np.max(np.abs(expected)))
+
+    def test_numpy_node_and_oblivious_trees(self):
+        for name, model in self.models.items():
+            with self.subTest(name):
+                predictor = compile_predictor(model, self.X_check, backend='numpy')
+                self.assertEqual(predictor.backend, 'numpy')
+                self._assert_matches(model, predictor)
+
+    def test_forest_spread(self):
+        model = self.models['Random Forest']
+        mean, std = compile_predictor(model, self.X_check, backend='numpy').predict_with_std(self.X_new)
+        per_tree = np.stack([tree.predict(self.X_new) for tree in model.estimators_], axis=1)
+        np.testing.assert_allclose(mean, model.predict(self.X_new), rtol=1e-5)
+        np.testing.assert_allclose(std, per_tree.std(axis=1), rtol=1e-5, atol=1e-6 * np.abs(mean).max())
+
+    @skipUnless(HAS_ONNX, "needs onnxruntime, skl2onnx and onnxmltools")
+    def test_onnx(self):
+        for name, model in self.models.items():
+            with self.subTest(name):
+                predictor = compile_predictor(model, self.X_check, backend='onnx')
+                self.assertEqual(predictor.backend, 'onnx')
+                self._assert_matches(model, predictor)
+
+    def test_auto_falls_back_to_numpy(self):
+        with mock.patch.object(compiled, '_HAS_ONNX', False):
+            predictor = compile_predictor(self.models['XGBoost'], self.X_check, backend='auto')
+        self.assertEqual(predictor.backend, 'numpy')
+        self._assert_matches(self.models['XGBoost'], predictor)
+
+    def test_unsupported_model(self):
+        from sklearn.linear_model import LinearRegression
+
+        model = LinearRegression().fit(self.X_check, self.X_check[:, 0])
+        with self.assertRaises(ValueError):
+            compile_predictor(model, self.X_check, backend='numpy')
+
+
+class TreeSolverTests(SimpleTestCase):
+    models = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Integer features put many XGBoost splits exactly on values of the grid below
+        rng = np.random.default_rng(0)
+        X = rng.integers(0, 10, size=(200, 3)).astype(float)
+        y = X[:, 0] ** 2 + 3 * X[:, 1] - 2 * X[:, 2] + rng.normal(0, 0.5, len(X))
+        cls.lb, cls.ub = np.zeros(3), np.full(3, 9.0)
+        cls.grid = np.stack(np.meshgrid(*[np.arange(10.0)] * 3), axis=-1).reshape(-1, 3)
+        for name in ('Decision Tree', 'Random Forest', 'XGBoost', 'CatBoost'):
+            model = get_model(name)
+            if name == 'Random Forest':
+                model.set_params(n_estimators=20)
+            cls.models[name] = model.fit(X, y)
+
+    def test_leaves_reproduce_predictions_on_split_values(self):
+        for name, model in self.models.items():
+            with self.subTest(name):
+                trees, offset = extract_tree_leaves(model, self.lb, self.ub)
+                predictions = _leaf_values_at(trees, self.grid, upper_open=name == 'XGBoost') + offset
+                np.testing.assert_allclose(predictions, model.predict(self.grid), rtol=1e-4, atol=1e-3)
+
+    def test_invert_finds_exact_predictions(self):
+        for name, model in self.models.items():
+            with self.subTest(name):
+                trees, offset = extract_tree_leaves(model, self.lb, self.ub)
+                target = float(model.predict(self.grid[[123]])[0])
+                points, predictions = invert_tree_ensemble(trees, offset, target, self.lb, self.ub, n_results=4)
+
+                self.assertTrue(np.all((points >= self.lb) & (points <= self.ub)))
+                np.testing.assert_allclose(predictions, model.predict(points), rtol=1e-4, atol=1e-3)
+                errors = np.abs(predictions - target)
+                self.assertTrue(np.all(np.diff(errors) >= 0))
+                self.assertLess(errors[0], 0.05 * np.ptp(model.predict(self.grid)))
+
+    def test_unsupported_model(self):
+        from sklearn.linear_model import LinearRegression
+
+        with self.assertRaises(ValueError):
+            extract_tree_leaves(LinearRegression().fit(self.grid, self.grid[:, 0]), self.lb, self.ub)
+
+
+class FeatureConstraintsTests(SimpleTestCase):
+    features = ['a', 'b', 'total', 'c', 'd', 'fixed']
+
+    def setUp(self):
+        X = np.array([[1, 2, 3, 4.5, 5.5, 0], [2, 3, 5, 1.5, 8.5, 0]], dtype=float)
+        spec = {
+            'integer': ['a', 'b'],
+            'nonnegative': 'auto',
+            'fixed': {'fixed': 2.0},
+            'linked_sums': [
+                {'features': ['a', 'b'], 'total': 'total'},
+                {'features': ['c', 'd'], 'total': 10.0},
+            ],
+        }
+        self.constraints = FeatureConstraints(spec, self.features, [-5.0] * 6, [10.0] * 6, X=X)
+
+    def test_projects_onto_feasible_set(self):
+        x = np.random.default_rng(0).uniform(-5, 10, size=(4, 7, 6))
+        y = self.constraints(x)
+        self.assertEqual(y.shape, x.shape)
+        a, b, total, c, d, fixed = np.moveaxis(y, -1, 0)
+        np.testing.assert_array_equal(a, np.round(a))
+        np.testing.assert_array_equal(b, np.round(b))
+        self.assertTrue(np.all(y[..., :5] >= 0))
+        np.testing.assert_array_equal(fixed, 2.0)
+        np.testing.assert_allclose(total, a + b)
+        np.testing.assert_allclose(c + d, 10.0)
+
+    def test_feasible_points_are_kept(self):
+        x = np.array([1.0, 2.0, 3.0, 4.0, 6.0, 2.0])
+        np.testing.assert_array_equal(self.constraints(x), x)
+
+    def test_derived_total_stays_within_its_bounds(self):
+        spec = {'integer': ['a', 'b'], 'linked_sums': [{'features': ['a', 'b', 'c'], 'total': 'total'}]}
+        lb = np.array([0.0, 0.0, 2.5, 0.0, 0.0, 0.0])
+        ub = np.array([10.0, 10.0, 7.5, 10.0, 10.0, 10.0])
+        constraints = FeatureConstraints(spec, self.features, lb, ub)
+
+        x = np.random.default_rng(0).uniform(-2, 12, size=(500, 6))
+        y = constraints(x)
+        a, b, total, c = y[:, 0], y[:, 1], y[:, 2], y[:, 3]
+        np.testing.assert_allclose(total, a + b + c)
+        self.assertTrue(np.all((total >= 2.5) & (total <= 7.5)))
+        self.assertTrue(np.all((y >= lb) & (y <= ub)))
+        np.testing.assert_array_equal(y[:, :2], np.round(y[:, :2]))
+        # Parts whose sum is already inside the bounds are left alone
+        np.testing.assert_array_equal(constraints(np.array([1.0, 2.0, 0.0, 1.5, 4.0, 5.0])),
+                                      [1.0, 2.0, 4.5, 1.5, 4.0, 5.0])
+        # Above the bounds: the parts are lowered in order, integers by whole steps
+        np.testing.assert_array_equal(constraints(np.array([6.0, 4.0, 0.0, 3.0, 4.0, 5.0])),
+                                      [0.0, 4.0, 7.0, 3.0, 4.0, 5.0])
+
+    def test_rejects_unknown_types_and_features(self):
+        with self.assertRaises(ValueError):
+            FeatureConstraints({'even': ['a']}, self.features, [0.0] * 6, [1.0] * 6)
+        with self.assertRaises(ValueError):
+            FeatureConstraints({'integer': ['e']}, self.features, [0.0] * 6, [1.0] * 6)
+
+
+class ParetoTests(SimpleTestCase):
+    def test_front_keeps_non_dominated_rows(self):
+        F = np.array([[1, 4], [2, 2], [4, 1], [3, 3], [2, 2], [5, 5]], dtype=float)
+        np.testing.assert_array_equal(pareto_front(F), [0, 1, 2, 4])
+
+    def test_crowding_distance(self):
+        F = np.array([[0, 4], [1, 3], [3, 1], [4, 0]], dtype=float)
+        distance = crowding_distance(F)
+        self.assertTrue(np.isinf(distance[[0, 3]]).all())
+        np.testing.assert_allclose(distance[1:3], [1.5, 1.5])
+
+    def test_front_is_thinned_to_least_crowded(self):
+        F = np.array([[0, 10], [1, 9], [1.1, 8.9], [5, 5], [10, 0]], dtype=float)
+        front = pareto_front(F, size=3)
+        self.assertEqual(len(front), 3)
+        self.assertIn(0, front)
+        self.assertIn(4, front)
+
+
+class ColumnarResultsTests(SimpleTestCase):
+    features = ['x', 'y']
+
+    def _run(self, x, error):
+        return {
+            'solution': {'x': x, 'y': 2 * x},
+            **{field: 0.5 for field in RUN_FIELDS},
+            'error': error,
+            'convergence': [3.0, 2.0, error],
+            'r2': 0.9,
+            'mse': 1.5,
+            'y_pred_on_test': [1.0, 2.0],
+        }
+
+    def test_round_trip(self):
+        runs = [self._run(1.0, 0.25), self._run(3.0, float('nan'))]
+        payload = {
+            'results': [{
+                'target_value': 10.0,
+                'best_model': 'Random Forest',
+                'best_runtime': 0.5,
+                'best_fopt': 0.25,
+                'best_solution': {'features': {'x': 1.0, 'y': 2.0}, 'prediction': 10.25, 'error': 0.25,
+                                  'y_pred_on_test': [1.0, 2.0]},
+                'comparison_table': {'Random Forest': runs, 'Decision Tree': []},
+            }],
+            'combined_graphs': None,
+        }
+
+        stored = json.loads(json.dumps(encode_columnar(to_columnar(payload, self.features))))
+        [result] = from_columnar(stored)['results']
+
+        restored = result['comparison_table']['Random Forest']
+        self.assertEqual([run['solution'] for run in restored], [run['solution'] for run in runs])
+        self.assertEqual(restored[0]['error'], 0.25)
+        self.assertIsNone(restored[1]['error'])
+        self.assertEqual(restored[1]['convergence'], [3.0, 2.0, None])
+        self.assertEqual(restored[0]['r2'], 0.9)
+        self.assertEqual(restored[0]['y_pred_on_test'], [1.0, 2.0])
+        self.assertEqual(result['comparison_table']['Decision Tree'], [])
+        self.assertEqual(result['best_solution']['features'], {'x': 1.0, 'y': 2.0})
+        self.assertEqual(result['best_solution']['y_pred_on_test'], [1.0, 2.0])
+
+
+class RequestStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = RequestStore(self.directory.name, ttl=60)
+        self.fingerprint = request_fingerprint({'target': 'Epsilon', 'pso_config': {'maxiter': 5}})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _age(self, path, seconds):
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+    def test_fingerprint_ignores_key_order(self):
+        self.assertEqual(self.fingerprint, request_fingerprint({'pso_config': {'maxiter': 5}, 'target': 'Epsilon'}))
+
+    def test_claim_reuses_registered_task(self):
+        self.assertEqual(self.store.claim(self.fingerprint, 'task-1'), ('task-1', False))
+        self.assertEqual(self.store.claim(self.fingerprint, 'task-2'), ('task-1', True))
+        self.assertEqual(self.store.claim(self.fingerprint, 'task-3', is_reusable=lambda task_id: False),
+                         ('task-3', False))
+
+    def test_claim_after_ttl_starts_new_task(self):
+        self.store.claim(self.fingerprint, 'task-1')
+        self._age(os.path.join(self.store.requests_dir, self.fingerprint), 120)
+        self.assertEqual(self.store.claim(self.fingerprint, 'task-2'), ('task-2', False))
+
+    def test_results_expire(self):
+        self.store.put_result('task-1', {'results': [1, 2]})
+        self.assertEqual(self.store.get_result('task-1'), {'results': [1, 2]})
+        self.assertIsNone(self.store.get_result('../task-1'))
+
+        self._age(os.path.join(self.store.results_dir, 'task-1.json'), 120)
+        self.assertIsNone(self.store.get_result('task-1'))
+        self.store.prune()
+        self.assertEqual(os.listdir(self.store.results_dir), [])
+
+
+class ValidateRequestDataTests(SimpleTestCase):
+    def _request(self, **pso_config):
+        return {'data': [{'x': float(i), 'y': 2.0 * i} for i in range(5)], 'features': ['x'], 'target': 'y',
+                'target_value': [3.0], 'pso_config': pso_config}
+
+    def test_cv_folds(self):
+        for cv_folds in (0, 2, 5):
+            self.assertTrue(validate_request_data(self._request(cv_folds=cv_folds))['valid'], cv_folds)
+        for cv_folds in (1, 6, -1, 2.5, True):
+            self.assertFalse(validate_request_data(self._request(cv_folds=cv_folds))['valid'], cv_folds)
+
+    def test_refine_method_is_case_insensitive(self):
+        for refine in (None, 'l-bfgs-b', 'L-BFGS-B', 'Nelder-Mead'):
+            self.assertTrue(validate_request_data(self._request(refine=refine))['valid'], refine)
+        for refine in ('bfgs', True):
+            self.assertFalse(validate_request_data(self._request(refine=refine))['valid'], refine)
+
+
+class GraphCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = GraphCache(self.directory.name, max_tasks=2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_evicts_least_recently_viewed_tasks(self):
+        for i, task_id in enumerate(('task-1', 'task-2')):
+            self.cache.put(task_id, 'pso_convergence', b'png')
+            past = time.time() - 100 + i
+            os.utime(os.path.join(self.directory.name, task_id), (past, past))
+        self.assertEqual(self.cache.get('task-1', 'pso_convergence'), b'png')  # task-2 is now the oldest
+        self.cache.put('task-3', 'r2_heatmap', b'png')
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['task-1', 'task-3'])
+        self.assertIsNone(self.cache.get('task-2', 'pso_convergence'))
+
+    def test_rejects_path_task_ids(self):
+        with self.assertRaises(ValueError):
+            self.cache.get('../task-1', 'pso_convergence')
+
+
+class ConvergenceGraphTests(SimpleTestCase):
+    def _results(self, pareto_front=None):
+        run = {'convergence': [3.0, 2.0, 1.5]}
+        return [{'target_value': t, 'comparison_table': {'XGBoost': [run, run]}, 'pareto_front': pareto_front}
+                for t in (1.0, 2.0)]
+
+    def test_plots_error_convergence(self):
+        self.assertEqual(available_graphs(self._results()), list(GRAPH_RENDERERS))
+        self.assertIsInstance(plot_pso_convergence(self._results()), str)
+
+    def test_skipped_for_pareto_results(self):
+        results = self._results(pareto_front={'model': ['XGBoost'], 'error': [0.5]})
+        self.assertNotIn('pso_convergence', available_graphs(results))
+        self.assertIsNone(plot_pso_convergence(results))
+
+
+class OptimizeViewTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = RequestStore(self.directory.name, ttl=60)
+        self.request_data = {'data': [{'x': 1.0, 'y': 2.0}], 'features': ['x'], 'target': 'y', 'target_value': [2.0]}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _post(self):
+        from . import views
+        request = APIRequestFactory().post('/pso/optimize/', self.request_data, format='json')
+        with mock.patch.object(views, 'get_request_store', return_value=self.store):
+            return views.optimize(request)
+
+    def test_failed_enqueue_releases_the_claim(self):
+        from . import views
+        with mock.patch.object(views.run_optimization_task, 'apply_async', side_effect=ConnectionError("broker down")):
+            response = self._post()
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(os.listdir(self.store.requests_dir), [])
+
+        with mock.patch.object(views.run_optimization_task, 'apply_async') as apply_async:
+            response = self._post()
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(response.data['reused'])
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.kwargs['task_id'], response.data['task_id'])
+
+    def test_release_keeps_a_newer_claim(self):
+        fingerprint = request_fingerprint(self.request_data)
+        self.store.claim(fingerprint, 'task-2')
+        self.store.release(fingerprint, 'task-1')
+        self.assertEqual(self.store.claim(fingerprint, 'task-3', is_reusable=lambda task_id: True), ('task-2', True))
+
+
+class ModelCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ModelCache(self.directory.name, max_entries=2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_evicts_least_recently_used(self):
+        for i, key in enumerate(('a', 'b')):
+            self.cache.put(key, {'models': i})
+            past = time.time() - 100 + i
+            os.utime(self.cache._path(key), (past, past))
+        self.assertEqual(self.cache.get('a'), {'models': 0})  # 'b' is now the oldest
+        self.cache.put('c', {'models': 2})
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), {'models': 0})
+        self.assertEqual(self.cache.get('c'), {'models': 2})
+
+    def test_cross_validated_models_are_cached(self):
+        _optimizer(cv_folds=3, model_cache=self.cache)
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            optimizer, _ = _optimizer(cv_folds=3, model_cache=self.cache)
+        self.assertIn("from cache", log.getvalue())
+        self.assertIsNotNone(optimizer.model_performances[optimizer.objective_models[0]]['r2_std'])
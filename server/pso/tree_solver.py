@@ -0,0 +1,253 @@
+# tree_solver.py
+"""
+Inverse design for tree-ensemble regressors without black-box search.
+
+A tree ensemble predicts a constant per leaf, and each leaf covers an
+axis-aligned box of feature space bounded by the split thresholds on its
+path. `extract_tree_leaves` turns a trained Decision Tree, Random Forest,
+XGBoost or CatBoost model into those boxes, and `invert_tree_ensemble` runs
+a beam search that fixes one leaf per tree while intersecting the boxes.
+Interval arithmetic on the leaf values of the trees not fixed yet bounds
+the reachable prediction, so candidates that cannot reach the target are
+dropped early. Once every tree has a leaf, any point inside the remaining
+box has a known prediction, so the model is only called to verify results.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+from catboost import CatBoostRegressor
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+from xgboost import XGBRegressor
+
+
+def supports_tree_solver(model):
+    """Whether leaf boxes can be extracted from `model`"""
+    return isinstance(model, (DecisionTreeRegressor, RandomForestRegressor, XGBRegressor, CatBoostRegressor))
+
+
+def _leaf_arrays(leaves):
+    """Pack [(bounds, value)] into (features, lo, hi, values) restricted to the split features"""
+    feats = sorted({f for bounds, _ in leaves for f in bounds})
+    col = {f: j for j, f in enumerate(feats)}
+    lo = np.full((len(leaves), len(feats)), -np.inf)
+    hi = np.full((len(leaves), len(feats)), np.inf)
+    for i, (bounds, _) in enumerate(leaves):
+        for f, (f_lo, f_hi) in bounds.items():
+            lo[i, col[f]] = f_lo
+            hi[i, col[f]] = f_hi
+    values = np.array([value for _, value in leaves], dtype=float)
+    return np.array(feats, dtype=int), lo, hi, values
+
+
+def _sklearn_tree_leaves(tree, scale):
+    """Leaves of a fitted sklearn tree; samples with x <= threshold go left"""
+    leaves = []
+    stack = [(0, {})]
+    while stack:
+        node, bounds = stack.pop()
+        left, right = tree.children_left[node], tree.children_right[node]
+        if left == -1:
+            leaves.append((bounds, tree.value[node, 0, 0] * scale))
+            continue
+        f, thr = int(tree.feature[node]), float(tree.threshold[node])
+        f_lo, f_hi = bounds.get(f, (-np.inf, np.inf))
+        stack.append((left, {**bounds, f: (f_lo, min(f_hi, thr))}))
+        stack.append((right, {**bounds, f: (max(f_lo, thr), f_hi)}))
+    return leaves
+
+
+def _xgboost_tree_leaves(model):
+    """Leaves of every booster tree; samples with x < split go to the 'Yes' child"""
+    booster = model.get_booster()
+    names = booster.feature_names
+    index = {name: i for i, name in enumerate(names)} if names else None
+    df = booster.trees_to_dataframe()
+
+    trees = []
+    for _, tree_df in df.groupby('Tree'):
+        nodes = tree_df.set_index('ID')
+        leaves = []
+        stack = [(nodes.index[0], {})]
+        while stack:
+            node_id, bounds = stack.pop()
+            node = nodes.loc[node_id]
+            if node['Feature'] == 'Leaf':
+                leaves.append((bounds, float(node['Gain'])))
+                continue
+            f = index[node['Feature']] if index else int(node['Feature'][1:])
+            # XGBoost compares float32 values
+            thr = float(np.float32(node['Split']))
+            f_lo, f_hi = bounds.get(f, (-np.inf, np.inf))
+            stack.append((node['Yes'], {**bounds, f: (f_lo, min(f_hi, thr))}))
+            stack.append((node['No'], {**bounds, f: (max(f_lo, thr), f_hi)}))
+        trees.append(leaves)
+    return trees
+
+
+def _catboost_tree_leaves(model):
+    """Leaves of every oblivious tree; split i sets bit i of the leaf index when x > border"""
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        model.save_model(path, format='json')
+        with open(path) as f:
+            dump = json.load(f)
+    finally:
+        os.remove(path)
+
+    scale = dump.get('scale_and_bias', [1.0, [0.0]])[0]
+    trees = []
+    for tree in dump['oblivious_trees']:
+        splits = tree['splits']
+        leaves = []
+        for leaf, value in enumerate(tree['leaf_values']):
+            bounds = {}
+            for bit, split in enumerate(splits):
+                f, border = split['float_feature_index'], split['border']
+                f_lo, f_hi = bounds.get(f, (-np.inf, np.inf))
+                if (leaf >> bit) & 1:
+                    bounds[f] = (max(f_lo, border), f_hi)
+                else:
+                    bounds[f] = (f_lo, min(f_hi, border))
+            # Contradictory split combinations can never be reached
+            if all(f_lo < f_hi for f_lo, f_hi in bounds.values()):
+                leaves.append((bounds, value * scale))
+        trees.append(leaves)
+    return trees
+
+
+def _leaf_values_at(trees, X, upper_open=False):
+    """
+    Sum of the leaf values every tree assigns to the rows of X. Leaf boxes
+    hold lo < x <= hi, or lo <= x < hi with `upper_open` (XGBoost).
+    """
+    # All three libraries compare features as float32
+    X = np.asarray(X, dtype=np.float32).astype(np.float64)
+    total = np.zeros(len(X))
+    for feats, lo, hi, values in trees:
+        x = X[:, feats][:, None, :]
+        if upper_open:
+            inside = np.all((lo[None] <= x) & (x < hi[None]), axis=2)
+        else:
+            inside = np.all((lo[None] < x) & (x <= hi[None]), axis=2)
+        total += inside.astype(float) @ values
+    return total
+
+
+def extract_tree_leaves(model, lb, ub, n_checks=16, rtol=1e-3):
+    """
+    Extract the leaf boxes of a fitted tree model in its input space.
+
+    Returns (trees, offset) where each tree is (features, lo, hi, values) and
+    prediction(x) == offset + sum of the leaf values containing x. A leaf
+    holds lo < x <= hi, except for XGBoost, which sends x == split to the
+    right: lo <= x < hi. The offset
+    (base score / bias) and the extraction itself are checked against
+    `model.predict` on `n_checks` random points inside [lb, ub].
+    """
+    if isinstance(model, DecisionTreeRegressor):
+        raw_trees = [_sklearn_tree_leaves(model.tree_, 1.0)]
+    elif isinstance(model, RandomForestRegressor):
+        scale = 1.0 / len(model.estimators_)
+        raw_trees = [_sklearn_tree_leaves(est.tree_, scale) for est in model.estimators_]
+    elif isinstance(model, XGBRegressor):
+        raw_trees = _xgboost_tree_leaves(model)
+    elif isinstance(model, CatBoostRegressor):
+        raw_trees = _catboost_tree_leaves(model)
+    else:
+        raise ValueError(f"Tree solver does not support {type(model).__name__}")
+
+    n_features = len(lb)
+    trees = [_leaf_arrays(leaves) for leaves in raw_trees if leaves]
+
+    # Verify the extracted boxes reproduce the model and recover the constant offset
+    rng = np.random.default_rng(0)
+    lb, ub = np.asarray(lb, dtype=float), np.asarray(ub, dtype=float)
+    X = lb + rng.random((n_checks, n_features)) * (ub - lb)
+    diff = np.asarray(model.predict(X), dtype=float) - _leaf_values_at(trees, X, isinstance(model, XGBRegressor))
+    offset = float(np.median(diff))
+    if np.max(np.abs(diff - offset)) > rtol * (1.0 + np.max(np.abs(diff))):
+        raise ValueError(f"Extracted leaves do not reproduce {type(model).__name__} predictions")
+
+    return trees, offset
+
+
+def _reachable_stats(tree, box_lo, box_hi):
+    """Min, max and mean leaf value of `tree` reachable from each of the boxes"""
+    feats, lo, hi, values = tree
+    inside = np.all((lo[None] < box_hi[:, None, feats]) & (hi[None] > box_lo[:, None, feats]), axis=2)
+    v_min = np.where(inside, values, np.inf).min(axis=1)
+    v_max = np.where(inside, values, -np.inf).max(axis=1)
+    v_mean = (inside @ values) / np.maximum(inside.sum(axis=1), 1)
+    return v_min, v_max, v_mean
+
+
+def invert_tree_ensemble(trees, offset, target_value, lb, ub, beam_width=16, n_results=5):
+    """
+    Beam search for boxes whose ensemble prediction is closest to `target_value`.
+
+    Trees are fixed one at a time, largest leaf-value range first. Each
+    candidate keeps the box it is restricted to and the sum of its chosen
+    leaf values. Every tree still free contributes the interval of leaf
+    values reachable inside the candidate's box, which bounds the prediction
+    the candidate can still reach. Candidates are ranked by the distance from
+    the target to that interval, then by how far the estimate using the mean
+    reachable leaf value of the free trees is from the target.
+
+    Returns (points, predictions): box centres of shape (n, n_features) and
+    their exact ensemble predictions, best first.
+    """
+    lb, ub = np.asarray(lb, dtype=float), np.asarray(ub, dtype=float)
+
+    # Only leaves reachable inside [lb, ub] matter
+    reachable = []
+    for feats, lo, hi, values in trees:
+        mask = np.all((lo < ub[feats]) & (hi > lb[feats]), axis=1)
+        if mask.any():
+            reachable.append((feats, lo[mask], hi[mask], values[mask]))
+    spans = [values.max() - values.min() for *_, values in reachable]
+    order = [reachable[t] for t in np.argsort(spans)[::-1]]
+
+    # Beam state: box bounds and the fixed leaf-value sum of every candidate
+    box_lo = lb[None].copy()
+    box_hi = ub[None].copy()
+    fixed = np.zeros(1)
+
+    for step, (feats, lo, hi, values) in enumerate(order):
+        # Prediction interval and estimate contributed by the trees still free
+        free = [_reachable_stats(tree, box_lo, box_hi) for tree in order[step + 1:]]
+        free_lo = offset + sum(v_min for v_min, _, _ in free)
+        free_hi = offset + sum(v_max for _, v_max, _ in free)
+        free_mean = offset + sum(v_mean for _, _, v_mean in free)
+
+        # Interval intersection of every candidate box with every leaf box
+        new_lo = np.maximum(box_lo[:, None, feats], lo[None])
+        new_hi = np.minimum(box_hi[:, None, feats], hi[None])
+        state_idx, leaf_idx = np.nonzero(np.all(new_lo < new_hi, axis=2))
+        if state_idx.size == 0:
+            break
+
+        cand_fixed = fixed[state_idx] + values[leaf_idx]
+        pred_lo = cand_fixed + np.broadcast_to(free_lo, fixed.shape)[state_idx]
+        pred_hi = cand_fixed + np.broadcast_to(free_hi, fixed.shape)[state_idx]
+        estimate = cand_fixed + np.broadcast_to(free_mean, fixed.shape)[state_idx]
+        distance = np.maximum(0.0, np.maximum(pred_lo - target_value, target_value - pred_hi))
+        keep = np.lexsort((np.abs(estimate - target_value), distance))[:beam_width]
+
+        box_lo = box_lo[state_idx[keep]].copy()
+        box_hi = box_hi[state_idx[keep]].copy()
+        box_lo[:, feats] = new_lo[state_idx[keep], leaf_idx[keep]]
+        box_hi[:, feats] = new_hi[state_idx[keep], leaf_idx[keep]]
+        fixed = cand_fixed[keep]
+
+    predictions = fixed + offset
+    points = (box_lo + box_hi) / 2
+
+    # Best first, without repeating the same box
+    _, unique = np.unique(np.round(points, 12), axis=0, return_index=True)
+    unique = unique[np.argsort(np.abs(predictions[unique] - target_value), kind='stable')]
+    unique = unique[:n_results]
+    return points[unique], predictions[unique]
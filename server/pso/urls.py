@@ -4,5 +4,6 @@ from . import views
 urlpatterns = [
     path('optimize/', views.optimize, name='optimize'),
     path('status/<str:task_id>/', views.check_optimization_status, name='check-status'),
+    path('graphs/<str:task_id>/<str:graph_name>/', views.optimization_graph, name='optimization-graph'),
 
 ]
\ No newline at end of file
@@ -1,29 +1,36 @@
 # utils.py
-import base64
-import io
+import os
 import time
+from contextlib import contextmanager
+from functools import partial
 
-import matplotlib
+import billiard
 import numpy as np
 import pandas as pd
-import seaborn as sns
-from matplotlib.lines import Line2D
-
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
+from joblib import Parallel, delayed
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.tree import DecisionTreeRegressor
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import KFold, train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.decomposition import PCA
-from pyswarm import pso
 import warnings
 from xgboost import XGBRegressor
 from catboost import CatBoostRegressor
 
+from .graphs import generate_graphs
+from .compiled import COMPILE_BACKENDS, compile_predictor, supports_prediction_std
+from .constraints import FeatureConstraints, constraint_features
+from .model_cache import dataset_fingerprint
+from .pareto import ParetoObjectives, pareto_front, pareto_pso
+from .refine import REFINE_METHODS, refine_solution
+from .swarm import INIT_METHODS, pso, pso_multi_target, quasi_random_positions
+from .tree_solver import extract_tree_leaves, invert_tree_ensemble, supports_tree_solver
+
 warnings.filterwarnings('ignore')
 
+# Spread of the warm-start particles of later restarts, as a fraction of the bound widths
+WARM_START_JITTER = 0.05
+
 
 def get_available_models():
     """Get list of available ML models"""
@@ -40,11 +47,17 @@ def get_model(model_name):
     elif model_name == "XGBoost":
         return XGBRegressor(n_estimators=100, max_depth=10, random_state=42, verbosity=0)
     elif model_name == "CatBoost":
-        return CatBoostRegressor(iterations=100, depth=10, random_seed=42, verbose=0)
+        # No catboost_info/ training logs in the working directory
+        return CatBoostRegressor(iterations=100, depth=10, random_seed=42, verbose=0, allow_writing_files=False)
     else:
         raise ValueError(f"Model {model_name} not available")
 
 
+def get_model_params():
+    """Hyperparameters of every available model, used to fingerprint trained models"""
+    return {model_name: get_model(model_name).get_params() for model_name in get_available_models()}
+
+
 def validate_request_data(data):
     """Validate incoming request data"""
     required_fields = ['data', 'features', 'target', 'target_value']
@@ -62,6 +75,44 @@ def validate_request_data(data):
     if not isinstance(data['target_value'], list) or len(data['target_value']) == 0:
         return {'valid': False, 'message': 'Target values must be a non-empty list'}
 
+    refine = data.get('pso_config', {}).get('refine')
+    if refine and str(refine).lower() not in REFINE_METHODS:
+        return {'valid': False, 'message': f'Refine must be one of {", ".join(REFINE_METHODS)}'}
+
+    compile_backend = data.get('pso_config', {}).get('compile')
+    if compile_backend and compile_backend not in COMPILE_BACKENDS:
+        return {'valid': False, 'message': f'Compile must be one of {", ".join(COMPILE_BACKENDS)}'}
+
+    uncertainty_weight = data.get('pso_config', {}).get('uncertainty_weight')
+    if uncertainty_weight is not None and (not isinstance(uncertainty_weight, (int, float)) or uncertainty_weight < 0):
+        return {'valid': False, 'message': 'uncertainty_weight must be a non-negative number'}
+
+    cv_folds = data.get('pso_config', {}).get('cv_folds')
+    if cv_folds is not None and (not isinstance(cv_folds, int) or isinstance(cv_folds, bool)
+                                 or (cv_folds != 0 and not 2 <= cv_folds <= len(data['data']))):
+        return {'valid': False,
+                'message': 'cv_folds must be 0 or an integer between 2 and the number of data rows'}
+
+    objective_models = data.get('pso_config', {}).get('objective_models')
+    if objective_models is not None and (not isinstance(objective_models, int) or objective_models < 1):
+        return {'valid': False, 'message': 'objective_models must be a positive integer'}
+
+    feature_penalties = data.get('pso_config', {}).get('feature_penalties') or {}
+    for feature, weight in feature_penalties.items():
+        if feature not in data['features']:
+            return {'valid': False, 'message': f'Penalized feature {feature} is not in features'}
+        if not isinstance(weight, (int, float)):
+            return {'valid': False, 'message': f'Penalty of {feature} must be a number'}
+
+    init = data.get('pso_config', {}).get('init')
+    if init and init not in INIT_METHODS:
+        return {'valid': False, 'message': f'Init must be one of {", ".join(INIT_METHODS)}'}
+
+    constraints = data.get('pso_config', {}).get('constraints') or {}
+    for feature in constraint_features(constraints):
+        if feature not in data['features']:
+            return {'valid': False, 'message': f'Constrained feature {feature} is not in features'}
+
     # Validate that all data rows have required features and target
     for i, row in enumerate(data['data']):
         for feature in data['features']:
@@ -73,36 +124,209 @@ def validate_request_data(data):
     return {'valid': True, 'message': 'Valid data'}
 
 
-def objective_function(x, target_value, regressor, features):
-    """Objective function for PSO optimization"""
-    x_df = pd.DataFrame([x], columns=features)
-    prediction = regressor.predict(x_df)[0]
-    error = abs(prediction - target_value)
+def objective_function(X, target_value, regressor, scaler=None, uncertainty_weight=0.0):
+    """
+    Objective function for PSO optimization, scoring the whole swarm in one predict call.
+    With `uncertainty_weight`, the spread of the per-tree predictions is added to the error.
+    """
+    if uncertainty_weight:
+        predictions, penalties = _uncertainty_penalized(regressor, scaler, uncertainty_weight, X)
+        return np.abs(predictions - target_value) + penalties
+    if scaler is not None:
+        X = scaler.transform(X)
+    predictions = regressor.predict(X)
+    error = np.abs(predictions - target_value)
     return error
 
 
-def plot_to_base64(fig):
-    """Convert matplotlib figure to base64 string"""
+def _fit_and_predict(model_name, X_train, y_train, X_test):
+    """
+    Fit a fresh `model_name` and predict `X_test` (None for a final fit).
+    Returns (model, predictions), or None if training failed.
+    """
+    try:
+        model = get_model(model_name)
+        model.fit(X_train, y_train)
+        return model, (model.predict(X_test) if X_test is not None else None)
+    except Exception as e:
+        print(f"Failed to train {model_name}: {str(e)}")
+        return None
+
+
+class AffineScaler:
+    """
+    The transform of a fitted StandardScaler as plain NumPy arithmetic. The
+    objective scales a small swarm thousands of times per run, and sklearn's
+    `transform` validates its input on every call, costing more than a
+    compiled prediction.
+    """
+
+    def __init__(self, scaler):
+        self.mean = scaler.mean_ if scaler.with_mean else np.zeros(scaler.n_features_in_)
+        self.scale = scaler.scale_ if scaler.with_std else np.ones(scaler.n_features_in_)
+
+    def transform(self, X):
+        # A fresh array every call: models may keep or freeze their input
+        # (CatBoost marks it read-only), so a reused buffer is not safe.
+        # Same operations as StandardScaler.transform, so results are bit-identical
+        return (np.asarray(X, dtype=float) - self.mean) / self.scale
+
+
+def predict_raw(model, scaler, X, return_std=False):
+    """
+    Predict on a raw (unscaled) feature matrix, applying the fitted scaler if any.
+    With `return_std`, also return the standard deviation of the per-tree
+    predictions of bagged predictors (zeros for other models).
+    """
+    if scaler is not None:
+        X = scaler.transform(X)
+    if not return_std:
+        return model.predict(X)
+    if getattr(model, 'bagged', False):
+        return model.predict_with_std(X)
+    predictions = model.predict(X)
+    return predictions, np.zeros(len(predictions))
+
+
+def _uncertainty_penalized(model, scaler, weight, X):
+    """(predictions, weight * per-tree standard deviation), both from one pass over the trees"""
+    predictions, std = predict_raw(model, scaler, X, return_std=True)
+    return predictions, weight * std
+
+
+# Trained models and PSO settings of a pool worker, set once by _init_pso_worker
+_worker_state = {}
+
+
+def restart_seeds(seeds, solution_num, lb, ub, init_seed):
+    """
+    Warm-start particles of restart `solution_num`. The first restart starts
+    from all `seeds`; every later one from its own random half of them,
+    jittered by `WARM_START_JITTER` of the bound widths, so the restarts do
+    not all begin in the same basins.
+    """
+    seeds = np.asarray(seeds, dtype=float)
+    if solution_num == 0:
+        return np.clip(seeds, lb, ub)
+    rng = np.random.default_rng([init_seed, solution_num])
+    chosen = seeds[rng.choice(len(seeds), max(1, len(seeds) // 2), replace=False)]
+    return np.clip(chosen + rng.normal(0.0, WARM_START_JITTER, chosen.shape) * (ub - lb), lb, ub)
+
+
+def _init_pso_worker(state):
+    """Pool initializer: keep the shared optimizer state for every job of this worker"""
+    _worker_state.update(state)
+
+
+def _run_pso_job(job, state=None):
+    """
+    Run one PSO restart for (model_name, target_values, solution_num, seeds),
+    then polish each optimum locally when `refine` is set. `seeds` holds
+    warm-start particles per target (or None), placed into its swarm.
+    Returns (xopts, fopts, convergences, predictions, runtime, pre_refine_errors,
+    fronts, uncertainties) with one entry per target, or None if the run failed.
+    `pre_refine_errors` holds the error of the PSO optimum before polishing, or
+    None if unrefined. In Pareto mode each target is searched with the
+    restart's own objective weights and `fronts` holds the (X, F) archive of
+    its non-dominated particles; otherwise it holds None. `uncertainties` is
+    the per-tree standard deviation at each optimum when `uncertainty_weight`
+    is set, else None.
+    """
+    state = state or _worker_state
+    model_name, target_values, solution_num, seeds = job
+    model = state['models'][model_name]
+    scaler = state['scaler']
+    cfg = state['pso_config']
+    swarm_kwargs = {key: cfg[key] for key in ('swarmsize', 'omega', 'phip', 'phig', 'maxiter',
+                                              'patience', 'patience_tol')}
+    swarm_kwargs['fstop'] = cfg['error_tol']
+    swarm_kwargs['repair'] = state.get('constraints')
+    shape = (len(target_values), cfg['swarmsize'], len(cfg['lb']))
+    lb, ub = np.asarray(cfg['lb'], dtype=float), np.asarray(cfg['ub'], dtype=float)
+    init_positions = None
+    if cfg['init'] != 'uniform':
+        # Restart `solution_num` starts from its own block of the design shared by all restarts
+        init_positions = quasi_random_positions(
+            cfg['init'], lb, ub, shape, solution_num, cfg['n_solutions'], state['init_seed']
+        )
+    if any(seed is not None for seed in seeds):
+        if init_positions is None:
+            init_positions = lb + np.random.default_rng().random(shape) * (ub - lb)
+        # Warm-start particles replace at most half of each swarm
+        for i, seed in enumerate(seeds):
+            if seed is not None:
+                seed = restart_seeds(seed, solution_num, lb, ub, state['init_seed'])
+                n_seeds = min(len(seed), cfg['swarmsize'] // 2)
+                init_positions[i, :n_seeds] = seed[:n_seeds]
+    swarm_kwargs['init_positions'] = init_positions
+
+    try:
+        start_time = time.time()
+
+        fronts = [None] * len(target_values)
+        pareto = state.get('pareto')
+        if pareto is not None:
+            weights = pareto.weights(solution_num, state['init_seed'])
+            # Scalarized scores are not target errors, so error_tol cannot stop these runs
+            runs = [
+                pareto_pso(partial(predict_raw, model, scaler), target_value, pareto, weights,
+                           cfg['pareto_size'], cfg['lb'], cfg['ub'], **dict(
+                               swarm_kwargs, fstop=None,
+                               init_positions=None if init_positions is None else init_positions[i]))
+                for i, target_value in enumerate(target_values)
+            ]
+            xopts = np.array([run[0] for run in runs])
+            fopts, convergences, fronts = [[run[j] for run in runs] for j in (1, 2, 3)]
+        elif len(target_values) == 1:
+            xopt, fopt, convergence = pso(
+                objective_function, cfg['lb'], cfg['ub'],
+                args=(target_values[0], model, scaler, cfg['uncertainty_weight']), **swarm_kwargs
+            )
+            xopts, fopts, convergences = xopt.reshape(1, -1), [fopt], [convergence]
+        else:
+            predict = partial(predict_raw, model, scaler)
+            if cfg['uncertainty_weight']:
+                predict = partial(_uncertainty_penalized, model, scaler, cfg['uncertainty_weight'])
+            xopts, fopts, convergences = pso_multi_target(
+                predict, target_values, cfg['lb'], cfg['ub'], **swarm_kwargs
+            )
+
+        pre_refine_errors = [None] * len(target_values)
+        # Polishing only lowers the error, which would pull Pareto optima off their trade-off
+        if cfg['refine'] and pareto is None:
+            for i, target_value in enumerate(target_values):
+                xopts[i], pre_refine_errors[i], fopts[i] = refine_solution(
+                    partial(predict_raw, model, scaler), xopts[i], target_value, cfg['lb'], cfg['ub'],
+                    method=cfg['refine'], maxiter=cfg['refine_maxiter'], repair=swarm_kwargs['repair']
+                )
+
+        # Swarms of a multi-target run share one run, so split its wall time evenly
+        runtime = (time.time() - start_time) / len(target_values)
+        uncertainties = [None] * len(target_values)
+        if cfg['uncertainty_weight']:
+            predictions, uncertainties = predict_raw(model, scaler, xopts, return_std=True)
+        else:
+            predictions = predict_raw(model, scaler, xopts)
+        return xopts, fopts, convergences, predictions, runtime, pre_refine_errors, fronts, uncertainties
+
+    except Exception as e:
+        print(f"Optimization failed for {model_name} (run {solution_num}): {str(e)}")
+        return None
 
-    buffer = io.BytesIO()
-    # fname = f"{uuid.uuid4()}.png"
-    # fig.savefig(fname, format='png', dpi=100, bbox_inches='tight')
-    fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    buffer.close()
-    plt.show()
-    plt.close(fig)
-    return image_base64
 
+def clean_float(val):
+    """Replace NaN/inf with 0.0 so results stay JSON serializable"""
+    if np.isnan(val) or np.isinf(val):
+        return 0.0
+    return float(val)
 
 
 class MLOptimizer:
-    def __init__(self, data, features, target, pso_config, scale_before_fit=True):
+    def __init__(self, data, features, target, pso_config, scale_before_fit=True, model_cache=None,
+                 solution_store=None):
         self.data = pd.DataFrame(data)
         self.features = features
         self.target = target
-        self.pso_config = self._set_default_pso_config(pso_config)
         self.scale_before_fit = scale_before_fit
         self.scaler = StandardScaler() if scale_before_fit else None
         self.models = {}
@@ -112,7 +336,73 @@ class MLOptimizer:
         # Prepare data
         self.X = self.data[self.features]
         self.y = self.data[self.target]
-
+        self.pso_config = self._set_default_pso_config(pso_config)
+        # Shared by all restarts so they draw disjoint blocks of one initialization design
+        self.init_seed = np.random.SeedSequence().entropy
+
+        # Feature type constraints are enforced inside the swarm update, within tightened bounds
+        self.constraints = None
+        if self.pso_config['constraints']:
+            self.constraints = FeatureConstraints(self.pso_config['constraints'], self.features,
+                                                  self.pso_config['lb'], self.pso_config['ub'], X=self.X.values)
+            self.pso_config['lb'] = self.constraints.lb.tolist()
+            self.pso_config['ub'] = self.constraints.ub.tolist()
+
+        # Objectives of the Pareto mode, besides the target error
+        self.pareto = None
+        if self.pso_config['pareto']:
+            penalties = self.pso_config['feature_penalties'] or {}
+            self.pareto = ParetoObjectives(self.X.to_numpy(dtype=float), self.pso_config['lb'],
+                                           self.pso_config['ub'],
+                                           [penalties.get(feature, 0.0) for feature in self.features])
+
+        # Models and stored solutions are keyed by the data and settings they come from
+        cache_key = None
+        if model_cache is not None or solution_store is not None:
+            cache_key = dataset_fingerprint(self.data, self.features, self.target,
+                                            self.scale_before_fit, get_model_params(),
+                                            self.pso_config['cv_folds'])
+        self.cache_key = cache_key
+        self.solution_store = solution_store
+        self.stored_solutions = {}
+        if solution_store is not None and self.pso_config['warm_start']:
+            self.stored_solutions = solution_store.get(cache_key)
+
+        # Reuse models trained on identical data and settings
+        bundle = model_cache.get(cache_key) if model_cache is not None else None
+        if bundle is not None:
+            self.models = bundle['models']
+            self.scaler = bundle['scaler']
+            self.model_performances = bundle['model_performances']
+            print(f"Loaded {len(self.models)} trained models from cache ({cache_key[:12]})")
+        else:
+            if self.pso_config['cv_folds']:
+                self._cross_validate_models()
+            else:
+                self._split_data()
+
+                # Train models
+                self._train_models()
+
+            if model_cache is not None and self.models:
+                model_cache.put(cache_key, {
+                    'models': self.models,
+                    'scaler': self.scaler,
+                    'model_performances': self.model_performances,
+                })
+
+        # Models the PSO searches with, best (cross-)validated R² first
+        ranked = sorted(self.models, key=lambda name: (-self.model_performances[name]['r2'],
+                                                       self.model_performances[name].get('r2_std') or 0.0))
+        self.objective_models = ranked[:self.pso_config['objective_models'] or len(ranked)]
+
+        # What the PSO objective calls; reporting and the tree solver keep the original models
+        self.predictors = self._compile_models()
+        # Scaling used inside the PSO objective; reporting keeps the fitted scaler
+        self.objective_scaler = AffineScaler(self.scaler) if self.scaler is not None else None
+
+    def _split_data(self):
+        """Train-test split, scaling the features if requested"""
         # Train-test split - adjust for small datasets
         if len(self.data) < 10:
             # For very small datasets, use smaller test size or skip splitting
@@ -133,9 +423,6 @@ class MLOptimizer:
             self.X_train_scaled = self.X_train.values
             self.X_test_scaled = self.X_test.values
 
-        # Train models
-        self._train_models()
-
     def _set_default_pso_config(self, pso_config):
         """Set default PSO configuration with robust bounds calculation"""
         defaults = {
@@ -146,7 +433,27 @@ class MLOptimizer:
             'maxiter': 50,
             'n_solutions': 10,
             'nprocessors': 1,
-            'max_rounds': 5
+            'max_rounds': 5,
+            'multi_target': False,
+            'patience': 0,
+            'patience_tol': 0.0,
+            'error_tol': None,
+            'solver': 'pso',
+            'beam_width': 16,
+            'refine': None,
+            'refine_maxiter': 50,
+            'constraints': None,
+            'init': 'uniform',
+            'dedup_tol': 0.0,
+            'warm_start': False,
+            'warm_start_neighbors': 3,
+            'compile': None,
+            'cv_folds': 0,
+            'objective_models': None,
+            'pareto': False,
+            'feature_penalties': None,
+            'pareto_size': 50,
+            'uncertainty_weight': 0.0
         }
 
         # Use provided bounds or calculate from data
@@ -243,425 +550,504 @@ class MLOptimizer:
                 print(f"Failed to train {model_name}: {str(e)}")
                 continue
 
-    def _optimize_single_target(self, target_value, n_solutions=5):
-        results = {}
-
-        for model_name, model in self.models.items():
-            solutions = []
-
-            for solution_num in range(n_solutions):
-                try:
-                    start_time = time.time()
-
-                    xopt, fopt = pso(
-                        objective_function,
-                        self.pso_config['lb'],
-                        self.pso_config['ub'],
-                        args=(target_value, model, self.features),
-                        swarmsize=self.pso_config['swarmsize'],
-                        omega=self.pso_config['omega'],
-                        phip=self.pso_config['phip'],
-                        phig=self.pso_config['phig'],
-                        maxiter=self.pso_config['maxiter'],
-                        debug=False
-                    )
-
-                    runtime = time.time() - start_time
-
-                    if self.scale_before_fit:
-                        xopt_scaled = self.scaler.transform([xopt])
-                        prediction = model.predict(xopt_scaled)[0]
-                    else:
-                        x_df = pd.DataFrame([xopt], columns=self.features)
-                        prediction = model.predict(x_df)[0]
-
-                    error = abs(prediction - target_value)
-                    accuracy_like = max(0, 1 - error / abs(target_value) if abs(target_value) > 1e-10 else 0)
-
-                    # Clean up any problematic float values
-                    def clean_float(val):
-                        if np.isnan(val) or np.isinf(val):
-                            return 0.0
-                        return float(val)
-
-                    solutions.append({
-                        'solution': {feature: clean_float(xopt[i]) for i, feature in enumerate(self.features)},
-                        'prediction': clean_float(prediction),
-                        'error': clean_float(error),
-                        'runtime': clean_float(runtime),
-                        'fopt': clean_float(fopt),
-                        'mse': clean_float(self.model_performances[model_name]['mse']),
-                        'r2': clean_float(self.model_performances[model_name]['r2']),
-                        'accuracy_like': clean_float(accuracy_like),
-                        'y_pred_on_test': self.model_performances[model_name]['y_pred']
-                    })
-
-                except Exception as e:
-                    print(f"Optimization failed for {model_name} (run {solution_num}): {str(e)}")
-                    continue
-
-            results[model_name] = solutions
-
-        return results
-
-    def _generate_graphs(self, results):
-        """Generate visualization graphs"""
-        graphs = {}
-
-        try:
-
-            # 2. PSO Convergence
-            graphs['pso_convergence'] = self._plot_pso_convergence(results)
-
-            # 3. PCA Analysis
-            graphs['pca_analysis'] = self._plot_pca_analysis(results)
-
-            # 4. R² Heatmap
-            graphs['r2_heatmap'] = self._plot_r2_heatmap(results)
-
-            # 5. Error Distribution
-            graphs['error_distribution'] = self._plot_error_distribution(results)
-
-            # 6. Predicted vs Target Strip Plot
-            graphs['predicted_vs_target_strip'] = self._plot_predicted_vs_target_strip(results)
-
-            # 7. Predicted vs Target Scatter Plot
-            graphs['predicted_vs_target_scatter'] = self._plot_predicted_vs_target_scatter(results)
-
-            # 1. Model Comparison Chart
-            graphs['model_comparison'] = self._plot_model_comparison(results)
-
-        except Exception as e:
-            print(f"Graph generation failed: {str(e)}")
+    def _cross_validate_models(self):
+        """
+        k-fold evaluation of every model. The fold fits and each model's final
+        fit on all data run in parallel with joblib over `nprocessors` workers.
+        Metrics are fold means with their standard deviations, and `y_pred`
+        holds the out-of-fold predictions.
+        """
+        X = self.X.to_numpy(dtype=float)
+        y = self.y.to_numpy(dtype=float)
+        n_folds = min(int(self.pso_config['cv_folds']), len(X))
+        folds = list(KFold(n_splits=n_folds, shuffle=True, random_state=42).split(X))
+
+        # Each fold scales with its own training rows so held-out rows stay unseen
+        fold_data = []
+        for train_idx, test_idx in folds:
+            X_train, X_test = X[train_idx], X[test_idx]
+            if self.scale_before_fit:
+                fold_scaler = StandardScaler().fit(X_train)
+                X_train, X_test = fold_scaler.transform(X_train), fold_scaler.transform(X_test)
+            fold_data.append((X_train, y[train_idx], X_test))
+        X_all = self.scaler.fit_transform(X) if self.scale_before_fit else X
+
+        model_names = get_available_models()
+        tasks = [(model_name, *data) for model_name in model_names for data in fold_data]
+        tasks += [(model_name, X_all, y, None) for model_name in model_names]
+        n_jobs = max(1, min(int(self.pso_config.get('nprocessors') or 1), os.cpu_count() or 1, len(tasks)))
+        outputs = Parallel(n_jobs=n_jobs)(delayed(_fit_and_predict)(*task) for task in tasks)
+
+        fold_outputs = outputs[:len(model_names) * n_folds]
+        final_outputs = outputs[len(model_names) * n_folds:]
+        for m, model_name in enumerate(model_names):
+            runs = fold_outputs[m * n_folds:(m + 1) * n_folds]
+            if final_outputs[m] is None or any(run is None for run in runs):
+                continue
 
-        return graphs
+            oof = np.empty(len(y))
+            r2s, mses = [], []
+            for (_, test_idx), (_, y_pred) in zip(folds, runs):
+                oof[test_idx] = y_pred
+                # R² is undefined on a single held-out row
+                r2s.append(r2_score(y[test_idx], y_pred) if len(test_idx) > 1 else np.nan)
+                mses.append(mean_squared_error(y[test_idx], y_pred))
+
+            r2 = float(np.nanmean(r2s)) if np.any(np.isfinite(r2s)) else 0.0
+            r2_std = float(np.nanstd(r2s)) if np.any(np.isfinite(r2s)) else 0.0
+            self.models[model_name] = final_outputs[m][0]
+            self.model_performances[model_name] = {
+                'r2': r2,
+                'mse': float(np.mean(mses)),
+                'r2_std': r2_std,
+                'mse_std': float(np.std(mses)),
+                'cv_folds': n_folds,
+                'y_pred': [float(p) if np.isfinite(p) else 0.0 for p in oof]
+            }
+            print(f"Cross-validated {model_name} ({n_folds} folds): "
+                  f"R²={r2:.4f}±{r2_std:.4f}, MSE={np.mean(mses):.4f}±{np.std(mses):.4f}")
+
+    def _compile_models(self):
+        """
+        With `compile` set, compile every model into a lean predictor verified
+        against it on the data and on random points inside the bounds; models
+        that fail to compile are used as they are. With `uncertainty_weight`
+        set, bagged ensembles are compiled to numpy predictors, which give the
+        per-tree spread in the same pass as the prediction.
+        """
+        backend = self.pso_config['compile']
+        uncertainty = bool(self.pso_config['uncertainty_weight'])
+        if not backend and not uncertainty:
+            return {model_name: self.models[model_name] for model_name in self.objective_models}
+
+        lb = np.asarray(self.pso_config['lb'], dtype=float)
+        ub = np.asarray(self.pso_config['ub'], dtype=float)
+        rng = np.random.default_rng(0)
+        X_check = np.vstack([self.X.to_numpy(dtype=float), lb + rng.random((256, lb.size)) * (ub - lb)])
+        if self.scaler is not None:
+            X_check = self.scaler.transform(X_check)
+
+        predictors = {}
+        for model_name in self.objective_models:
+            model = self.models[model_name]
+            model_backend = 'numpy' if uncertainty and supports_prediction_std(model) else backend
+            if not model_backend:
+                if uncertainty:
+                    print(f"{model_name} has no per-tree spread; optimizing without uncertainty penalty")
+                predictors[model_name] = model
+                continue
+            try:
+                predictors[model_name] = compile_predictor(model, X_check, model_backend)
+                print(f"Compiled {model_name} ({predictors[model_name].backend})")
+            except Exception as e:
+                print(f"Using {model_name} uncompiled: {str(e)}")
+                predictors[model_name] = model
+        return predictors
+
+    def _predict(self, model, X):
+        """Predict on a raw (unscaled) feature matrix"""
+        return predict_raw(model, self.objective_scaler, X)
+
+    def _build_solution(self, model_name, target_value, xopt, fopt, convergence, prediction, runtime,
+                        pre_refine_error=None, uncertainty=None):
+        """Package one PSO optimum together with the metrics of the model that produced it"""
+        error = abs(prediction - target_value)
+        accuracy_like = max(0, 1 - error / abs(target_value) if abs(target_value) > 1e-10 else 0)
+
+        return {
+            'solution': {feature: clean_float(xopt[i]) for i, feature in enumerate(self.features)},
+            'prediction': clean_float(prediction),
+            'error': clean_float(error),
+            'runtime': clean_float(runtime),
+            'fopt': clean_float(fopt),
+            'pre_refine_error': None if pre_refine_error is None else clean_float(pre_refine_error),
+            'uncertainty': None if uncertainty is None else clean_float(uncertainty),
+            'duplicates': 0,
+            'convergence': [clean_float(f) for f in convergence],
+            'mse': clean_float(self.model_performances[model_name]['mse']),
+            'r2': clean_float(self.model_performances[model_name]['r2']),
+            'mse_std': self.model_performances[model_name].get('mse_std'),
+            'r2_std': self.model_performances[model_name].get('r2_std'),
+            'accuracy_like': clean_float(accuracy_like),
+            'y_pred_on_test': self.model_performances[model_name]['y_pred']
+        }
 
-    # ───────────────────────────────────────────────────────────
-    # 1️⃣  MODEL-COMPARISON  (bar chart of mean R² / MSE / ACC)
-    # ───────────────────────────────────────────────────────────
-    def _plot_model_comparison(self, results):
-        """Aggregate per-model metrics across all PSO runs and plot."""
+    @contextmanager
+    def _pso_runner(self, n_jobs):
+        """
+        Yield (run, batch_size): `run(jobs)` executes PSO jobs serially or in a
+        process pool sized by `nprocessors`, reused across calls, and yields
+        their outputs in order as they finish.
+        """
+        n_workers = min(int(self.pso_config.get('nprocessors') or 1), os.cpu_count() or 1, n_jobs)
+        state = {'models': self.predictors, 'scaler': self.objective_scaler, 'pso_config': self.pso_config,
+                 'constraints': self.constraints, 'init_seed': self.init_seed, 'pareto': self.pareto}
+
+        if n_workers <= 1:
+            yield (lambda jobs: (_run_pso_job(job, state) for job in jobs)), 1
+            return
+
+        # billiard (Celery's multiprocessing fork) may start children from inside a
+        # Celery worker; spawned workers receive the trained models once, on start-up
+        pool = billiard.get_context('spawn').Pool(
+            processes=n_workers, initializer=_init_pso_worker, initargs=(state,)
+        )
         try:
-            plot_data = []
-
-            for res in results:
-                for model_name, runs in res['comparison_table'].items():
-                    # ── aggregate (mean) across runs ──────────────────────────
-                    r2 = np.mean([r['r2'] for r in runs])
-                    mse = np.mean([r['mse'] for r in runs])
-                    acc = np.mean([r['accuracy_like'] for r in runs])
-                    plot_data.append({
-                        'Model': model_name,
-                        'R2 Score': r2,
-                        'MSE': mse,
-                        'Accuracy (pseudo)': acc
-                    })
-
-            results_df = pd.DataFrame(plot_data)
-            metrics_df = results_df.groupby("Model")[["R2 Score", "MSE", "Accuracy (pseudo)"]].mean().reset_index()
-
-            colors = ['#4c72b0', '#55a868', '#c44e52', '#8172b3'][:len(metrics_df)]
-            bar_width = 0.2
-            x_spacing = 0.3
-            models = metrics_df["Model"].tolist()
-            x_pos = [i * x_spacing for i in range(len(models))]
-
-            fig, axes = plt.subplots(1, 3, figsize=(12, 3))
-            metrics = [("R2 Score", "R² Score"),
-                       ("MSE", "MSE"),
-                       ("Accuracy (pseudo)", "Accuracy")]
-
-            for i, (key, ylabel) in enumerate(metrics):
-                vals = metrics_df[key]
-                axes[i].bar(x_pos, vals, width=bar_width, color=colors, edgecolor='white', linewidth=.5)
-                axes[i].set_xticks(x_pos)
-                axes[i].set_xticklabels(models, rotation=45, ha='right')
-                axes[i].set_ylabel(ylabel)
-                for pos, val in zip(x_pos, vals):
-                    axes[i].text(pos, val * 1.02, f"{val:.2f}", ha='center', va='bottom', fontsize=8)
-
-            plt.suptitle("Model Performance Metrics (mean across PSO runs)", y=1.08)
-            plt.tight_layout()
-            return plot_to_base64(fig)
-
-        except Exception as e:
-            print(f"Model comparison plot failed: {e}")
-            return None
+            yield (lambda jobs: pool.imap(_run_pso_job, jobs)), n_workers
+        finally:
+            pool.close()
+            pool.join()
+
+    def _optimize_targets(self, target_values, n_solutions=5, progress_callback=None):
+        """
+        Run `n_solutions` PSO restarts per model for every target value.
+
+        Each (model, target, restart) is an independent job; in multi-target
+        mode a job covers all targets at once with one swarm per target.
+        With `error_tol` set, a model stops restarting for a target once one
+        of its solutions is within that error.
+        With `warm_start`, every other target (in sorted order) is solved
+        first and the rest start with particles seeded from the solutions of
+        their nearest solved targets; stored solutions seed both waves.
+        `progress_callback`, if given, receives a `_progress` snapshot each
+        time a job finishes.
+        Returns one {model_name: solutions} mapping per target value, and in
+        Pareto mode one Pareto front per target value (otherwise None).
+        """
+        results = [{model_name: [] for model_name in self.objective_models} for _ in target_values]
+        archives = [[] for _ in target_values]
+        counters = {'runs_completed': 0, 'runs_failed': 0, 'iterations': 0}
+        runs_total = len(self.objective_models) * len(target_values) * n_solutions
+
+        def report(model_name, group, runs, iterations, failed=0):
+            counters['runs_completed'] += runs
+            counters['runs_failed'] += failed
+            counters['iterations'] += iterations
+            if progress_callback is not None:
+                progress_callback(self._progress(
+                    target_values, results, counters, runs_total, model_name, group
+                ))
+
+        # Tree models are inverted directly when the tree solver is selected
+        pso_models = list(self.objective_models)
+        if self.pso_config.get('solver') == 'tree':
+            solved_models = self._solve_with_trees(target_values, n_solutions, results)
+            pso_models = [model_name for model_name in pso_models if model_name not in solved_models]
+            for model_name in solved_models:
+                report(model_name, tuple(range(len(target_values))), n_solutions * len(target_values), 0)
+
+        warm_start = self.pso_config['warm_start']
+        if warm_start and len(target_values) > 1:
+            order = sorted(range(len(target_values)), key=lambda k: target_values[k])
+            waves = [order[::2], order[1::2]]
+        else:
+            waves = [list(range(len(target_values)))]
 
-    def _plot_pso_convergence(self, results):
-        """Plot PSO convergence curves from multiple explicit runs"""
-        try:
-            convergence_data = []
-
-            for result in results:
-                target_value = result['target_value']
-
-                for model_name, model_solutions in result['comparison_table'].items():
-                    for iteration, solution in enumerate(model_solutions):
-                        convergence_data.append({
-                            'Target Value': target_value,
-                            'Model': model_name,
-                            'Iteration': iteration,
-                            '% Error': solution['error'] * 100  # Convert to percentage
-                        })
-
-            convergence_df = pd.DataFrame(convergence_data)
-            convergence_df = convergence_df.groupby(['Model', 'Iteration'])['% Error'].min().reset_index()
-
-            plt.figure(figsize=(10, 6))
-            for model in convergence_df['Model'].unique():
-                subset = convergence_df[convergence_df['Model'] == model]
-                plt.plot(subset['Iteration'], subset['% Error'], marker='o', label=model)
-
-            plt.title("PSO Convergence Curve (Best % Error per Iteration)")
-            plt.xlabel("Iteration")
-            plt.ylabel("Best % Error")
-            plt.legend()
-            plt.grid(True)
-            plt.tight_layout()
-            fig = plt.gcf()
-            return plot_to_base64(fig)
+        error_tol = self.pso_config.get('error_tol')
+        solved = set()
+        n_jobs = len(pso_models) * n_solutions * len(target_values)
 
-        except Exception as e:
-            print(f"PSO convergence plot failed: {str(e)}")
+        with self._pso_runner(n_jobs) as (run, batch_size):
+            for wave in waves:
+                if self.pso_config.get('multi_target') and len(wave) > 1:
+                    target_groups = [tuple(wave)]
+                else:
+                    target_groups = [(k,) for k in wave]
+
+                seeds = {}
+                if warm_start:
+                    seeds = {(model_name, k): self._warm_start_seeds(model_name, k, target_values, results)
+                             for model_name in pso_models for k in wave}
+
+                # Ordered by restart so early stopping can skip the later ones
+                pending = [(model_name, group, solution_num)
+                           for solution_num in range(n_solutions)
+                           for model_name in pso_models
+                           for group in target_groups]
+                wave_batch_size = batch_size if error_tol is not None else len(pending)
+
+                while pending:
+                    batch, pending = pending[:wave_batch_size], pending[wave_batch_size:]
+                    job_groups = []
+                    for model_name, group, solution_num in batch:
+                        unsolved = tuple(k for k in group if (model_name, k) not in solved)
+                        if unsolved:
+                            job_groups.append((model_name, unsolved, solution_num))
+                        # Restarts skipped by early stopping count as done
+                        counters['runs_completed'] += len(group) - len(unsolved)
+                    jobs = [(model_name, tuple(target_values[k] for k in group), solution_num,
+                             tuple(seeds.get((model_name, k)) for k in group))
+                            for model_name, group, solution_num in job_groups]
+
+                    for (model_name, group, _), output in zip(job_groups, run(jobs)):
+                        if output is None:
+                            report(model_name, group, len(group), 0, failed=len(group))
+                            continue
+                        (xopts, fopts, convergences, predictions, runtime, pre_refine_errors, fronts,
+                         uncertainties) = output
+                        for i, k in enumerate(group):
+                            if fronts[i] is not None:
+                                archives[k].append((model_name, *fronts[i]))
+                            solution = self._build_solution(
+                                model_name, target_values[k], xopts[i], fopts[i], convergences[i], predictions[i],
+                                runtime, pre_refine_errors[i], uncertainties[i]
+                            )
+                            results[k][model_name].append(solution)
+                            if error_tol is not None and solution['error'] <= error_tol:
+                                solved.add((model_name, k))
+                        report(model_name, group, len(group), sum(len(c) - 1 for c in convergences))
+
+        for model_results in results:
+            for model_name, solutions in model_results.items():
+                model_results[model_name] = self._merge_duplicates(model_name, solutions)
+
+        fronts = None
+        if self.pareto is not None:
+            fronts = [self._pareto_front(target_value, model_results, candidates)
+                      for target_value, model_results, candidates in zip(target_values, results, archives)]
+        return results, fronts
+
+    def _warm_start_seeds(self, model_name, k, target_values, results):
+        """
+        Starting particles for target `k` of `model_name`: the best solutions of
+        the `warm_start_neighbors` nearest targets solved so far in this request
+        or found in the solution store, plus their linear interpolation when
+        the target lies between two of them.
+        """
+        known_targets, known_X = [], []
+        for target_value, model_results in zip(target_values, results):
+            if model_results[model_name]:
+                best = min(model_results[model_name], key=lambda sol: sol['error'])
+                known_targets.append(target_value)
+                known_X.append([best['solution'][f] for f in self.features])
+
+        stored = self.stored_solutions.get(model_name)
+        if stored is not None:
+            known_targets.extend(stored['targets'])
+            known_X.extend(stored['X'])
+
+        if not known_targets:
             return None
+        known_targets = np.asarray(known_targets, dtype=float)
+        known_X = np.asarray(known_X, dtype=float)
+        target_value = float(target_values[k])
+
+        nearest = np.argsort(np.abs(known_targets - target_value), kind='stable')
+        seeds = [known_X[nearest[:self.pso_config['warm_start_neighbors']]]]
+
+        below = np.flatnonzero(known_targets < target_value)
+        above = np.flatnonzero(known_targets > target_value)
+        if below.size and above.size:
+            lo = below[np.argmax(known_targets[below])]
+            hi = above[np.argmin(known_targets[above])]
+            w = (target_value - known_targets[lo]) / (known_targets[hi] - known_targets[lo])
+            seeds.append(((1 - w) * known_X[lo] + w * known_X[hi])[None])
+
+        return np.vstack(seeds)
+
+    def _pareto_front(self, target_value, model_results, archives):
+        """
+        Non-dominated solutions for one target over the PSO archives and the
+        reported solutions of every model, as columns ordered by error: the
+        model, the solutions (rows x features), the prediction and one array
+        per objective. At most `pareto_size` rows are kept, spread along the
+        front by crowding distance.
+        """
+        models, X, F = [], [], []
+        for model_name, X_front, F_front in archives:
+            models.extend([model_name] * len(X_front))
+            X.append(X_front)
+            F.append(F_front)
+        for model_name, solutions in model_results.items():
+            if solutions:
+                X_solutions = np.array([[sol['solution'][f] for f in self.features] for sol in solutions])
+                models.extend([model_name] * len(solutions))
+                X.append(X_solutions)
+                F.append(self.pareto(X_solutions, [sol['error'] for sol in solutions]))
+
+        n_features = len(self.features)
+        X = np.vstack(X) if X else np.empty((0, n_features))
+        F = np.vstack(F) if F else np.empty((0, len(self.pareto.names)))
+        # Reported solutions are usually in the archives too
+        _, unique = np.unique(F, axis=0, return_index=True)
+        keep = unique[pareto_front(F[unique], self.pso_config['pareto_size'])]
+        keep = keep[np.argsort(F[keep, 0], kind='stable')]
+        models = np.array(models, dtype=object)[keep]
+
+        # One predict call per model for the signed predictions
+        predictions = np.empty(len(keep))
+        for model_name in set(models):
+            rows = models == model_name
+            predictions[rows] = self._predict(self.models[model_name], X[keep][rows])
+
+        return {
+            'model': models.tolist(),
+            'solutions': X[keep].tolist(),
+            'prediction': predictions.tolist(),
+            **{name: F[keep, j].tolist() for j, name in enumerate(self.pareto.names)},
+        }
 
-    # ───────────────────────────────────────────────────────────
-    # 2️⃣  PCA-SCATTER  (every PSO run shown)
-    # ───────────────────────────────────────────────────────────
-    def _plot_pca_analysis(self, results):
-        """PCA scatter: colour=model, size=%error (all runs)."""
-        try:
-            rows = []
-            for res in results:
-                tgt = res["target_value"]
-                for mdl, runs in res["comparison_table"].items():
-                    for sol in runs:  # ← all runs
-                        rows.append({
-                            "Model": mdl,
-                            "Target": tgt,
-                            "Predicted": sol["prediction"],
-                            "%Error": sol["error"],
-                            **sol["solution"]  # feature columns
-                        })
-
-            if not rows:
-                print("PCA plot skipped: empty.")
-                return None
-
-            df = pd.DataFrame(rows)
-            metric_cols = {"Model", "Target", "Predicted", "%Error"}
-            feat_cols = [c for c in df.columns if c not in metric_cols]
-            if not feat_cols:
-                print("PCA plot skipped: no numeric features.")
-                return None
-
-            # Determine number of PCA components based on available features
-            n_features = len(feat_cols)
-            n_samples = len(df)
-            
-            print(f"PCA Analysis: {n_samples} samples, {n_features} features")
-            
-            # PCA components cannot exceed min(n_samples, n_features)
-            max_components = min(n_samples, n_features)
-            n_components = min(2, max_components)
-            
-            if n_components < 1:
-                print("PCA plot skipped: insufficient data for PCA analysis.")
-                return None
-            
-            print(f"Using {n_components} PCA components")
-            
-            pca = PCA(n_components=n_components)
-            pca_result = pca.fit_transform(df[feat_cols])
-            
-            if n_components == 1:
-                # For 1D PCA, create a second dimension with zeros for visualization
-                df["PCA1"] = pca_result[:, 0]
-                df["PCA2"] = np.zeros(len(df))  # Add zeros for second dimension
-                print("PCA analysis completed with 1D projection (adding zeros for PCA2)")
+    def _merge_duplicates(self, model_name, solutions):
+        """
+        Drop solutions that re-found the optimum of a better one. Two solutions
+        are the same optimum when their distance, in units of the bound widths
+        and weighted by the model's feature importances (features the model
+        ignores are arbitrary), is within `dedup_tol`. Equal predictions alone
+        do not make a duplicate: every good solution predicts about the
+        target, and trees predict the same leaf value in separate regions.
+        Each kept solution counts the restarts merged into it in `duplicates`.
+        """
+        tol = self.pso_config['dedup_tol']
+        if not tol or len(solutions) < 2:
+            return solutions
+
+        weights = getattr(self.models[model_name], 'feature_importances_', None)
+        if weights is None or not np.sum(weights) > 0:
+            weights = np.ones(len(self.features))
+        weights = np.asarray(weights, dtype=float) / np.sum(weights)
+
+        span = np.asarray(self.pso_config['ub'], dtype=float) - np.asarray(self.pso_config['lb'], dtype=float)
+        X = np.array([[sol['solution'][f] for f in self.features] for sol in solutions]) / span
+        same = np.sqrt(np.sum(weights * (X[:, None, :] - X[None, :, :]) ** 2, axis=2)) <= tol
+
+        kept = []
+        for i in np.argsort([sol['error'] for sol in solutions], kind='stable'):
+            match = next((j for j in kept if same[i, j]), None)
+            if match is None:
+                kept.append(i)
             else:
-                df["PCA1"] = pca_result[:, 0]
-                df["PCA2"] = pca_result[:, 1]
-                print("PCA analysis completed with 2D projection")
-
-            bins = [0, 5, 10, 20, 50, 100, np.inf]
-            labels = ["0–5%", "5–10%", "10–20%", "20–50%", "50–100%", "≥100%"]
-            size_map = dict(zip(labels, [50, 100, 150, 200, 250, 300]))
-            df["ErrBin"] = pd.cut(df["%Error"] * 100, bins=bins, labels=labels)
-            df["ErrSize"] = df["ErrBin"].map(size_map)
-
-            plt.figure(figsize=(10, 6))
-            sns.scatterplot(data=df, x="PCA1", y="PCA2",
-                            hue="Model", size="ErrSize",
-                            palette="tab10", sizes=(50, 300), alpha=.7, legend=False)
-
-            # colour legend
-            handles = [Line2D([0], [0], marker='o', linestyle='', markerfacecolor=c,
-                              markeredgecolor='w', markersize=10, label=m)
-                       for m, c in zip(df["Model"].unique(),
-                                       sns.color_palette("tab10", n_colors=len(df["Model"].unique())))]
-            l1 = plt.legend(handles=handles, title="Model", loc='upper right')
-            plt.gca().add_artist(l1)
-
-            # size legend
-            for lab, sz in size_map.items():
-                plt.scatter([], [], s=sz, c='gray', alpha=.6, label=lab)
-            plt.legend(title="% Error", loc='lower right')
-
-            plt.title("Optimised Solutions in PCA Space")
-            plt.tight_layout()
-            return plot_to_base64(plt.gcf())
-
-        except Exception as e:
-            print(f"PCA analysis plot failed: {e}")
-            return None
+                solutions[match]['duplicates'] += 1
+        return [solutions[i] for i in sorted(kept)]
+
+    def _progress(self, target_values, results, counters, runs_total, model_name, group):
+        """
+        Snapshot of a running optimization: run (completed, failed) and PSO
+        iteration counts, the job that just finished, the best fopt per model and the best solution
+        found so far for every target, in the rows of `best_solutions`.
+        """
+        model_best_fopt = {}
+        best_solutions = []
+        for target_value, model_results in zip(target_values, results):
+            best_model, best = None, None
+            for name, solutions in model_results.items():
+                for sol in solutions:
+                    if sol['fopt'] < model_best_fopt.get(name, float('inf')):
+                        model_best_fopt[name] = sol['fopt']
+                    if best is None or sol['error'] < best['error']:
+                        best_model, best = name, sol
+            if best is None:
+                continue
 
-    # ───────────────────────────────────────────────────────────
-    # 3️⃣  R²  HEATMAP  (one value per model – first run is fine)
-    # ───────────────────────────────────────────────────────────
-    def _plot_r2_heatmap(self, results):
-        """Heat-map of R² (one per model)."""
-        try:
-            heatmap_rows = []
-            for res in results:
-                tgt = res['target_value']
-                for model_name, runs in res['comparison_table'].items():
-                    heatmap_rows.append({
-                        "Model": model_name,
-                        "Target Value": tgt,
-                        "R2": runs[0]['r2']  # identical across runs
-                    })
-            df = pd.DataFrame(heatmap_rows)
-            pivot = df.pivot(index="Model", columns="Target Value", values="R2")
-
-            plt.figure(figsize=(8, 5))
-            sns.heatmap(pivot, annot=True, cmap="Blues", fmt=".2f",
-                        vmin=df["R2"].min(), vmax=df["R2"].max(),
-                        cbar_kws={'label': 'R²'})
-            plt.title("Model R² vs Target Value")
-            plt.tight_layout()
-            return plot_to_base64(plt.gcf())
+            row = {
+                'target_value': float(target_value),
+                'best_model': best_model,
+                'best_runtime': best['runtime'],
+                'best_fopt': best['fopt'],
+                'prediction': best['prediction'],
+                'error': best['error'],
+            }
+            row.update(best['solution'])
+            best_solutions.append(row)
+
+        return {
+            'runs_completed': counters['runs_completed'],
+            'runs_failed': counters['runs_failed'],
+            'runs_total': runs_total,
+            'iterations': counters['iterations'],
+            'current_model': model_name,
+            'current_targets': [float(target_values[k]) for k in group],
+            'model_best_fopt': model_best_fopt,
+            'best_solutions': best_solutions,
+        }
 
-        except Exception as e:
-            print(f"R² heatmap plot failed: {e}")
-            return None
+    def _solve_with_trees(self, target_values, n_solutions, results):
+        """
+        Fill `results` for every tree-ensemble model using the leaf-box solver.
+        Returns the names of the models it handled; the rest fall back to PSO.
+        """
+        lb = np.asarray(self.pso_config['lb'], dtype=float).reshape(1, -1)
+        ub = np.asarray(self.pso_config['ub'], dtype=float).reshape(1, -1)
+        if self.scale_before_fit:
+            lb, ub = self.scaler.transform(lb), self.scaler.transform(ub)
+        lb, ub = lb[0], ub[0]
 
-    # ───────────────────────────────────────────────────────────
-    # 4️⃣  ERROR  BOX-PLOT  (all runs)
-    # ───────────────────────────────────────────────────────────
-    def _plot_error_distribution(self, results):
-        """Box-plot of % error per model/target (all runs)."""
-        try:
-            rows = []
-            for res in results:
-                tgt = str(res['target_value'])
-                for model_name, runs in res['comparison_table'].items():
-                    for sol in runs:
-                        rows.append({
-                            "Model": model_name,
-                            "Target Value": tgt,
-                            "% Error": sol['error'] * 100
-                        })
-
-            if not rows:
-                return None
-            df = pd.DataFrame(rows)
-
-            plt.figure(figsize=(12, 6))
-            sns.boxplot(data=df, x="Model", y="% Error", hue="Target Value",
-                        palette="viridis", showfliers=True)
-            plt.axhline(0, ls='--', c='gray', alpha=.5)
-            plt.title("% Error Distribution")
-            plt.tight_layout()
-            return plot_to_base64(plt.gcf())
+        solved_models = []
+        for model_name in self.objective_models:
+            model = self.models[model_name]
+            if not supports_tree_solver(model):
+                continue
+            try:
+                start_time = time.time()
+                trees, offset = extract_tree_leaves(model, lb, ub)
+
+                for k, target_value in enumerate(target_values):
+                    points, _ = invert_tree_ensemble(
+                        trees, offset, target_value, lb, ub,
+                        beam_width=max(self.pso_config['beam_width'], n_solutions),
+                        n_results=n_solutions
+                    )
+                    if self.scale_before_fit:
+                        points = self.scaler.inverse_transform(points)
+                    if self.constraints is not None:
+                        points = self.constraints(points)
+
+                    # One verifying predict call for all candidates of this target
+                    predictions = self._predict(model, points)
+                    runtime = (time.time() - start_time) / len(points)
+                    for xopt, prediction in zip(points, predictions):
+                        fopt = abs(prediction - target_value)
+                        results[k][model_name].append(self._build_solution(
+                            model_name, target_value, xopt, fopt, [fopt], prediction, runtime
+                        ))
+                    start_time = time.time()
 
-        except Exception as e:
-            print(f"Error-boxplot failed: {e}")
-            return None
+                solved_models.append(model_name)
+                print(f"Tree solver handled {model_name}: {len(trees)} trees")
 
-    # ───────────────────────────────────────────────────────────
-    # 5️⃣  STRIP  (Predicted vs Target)  – one point *per run*
-    # ───────────────────────────────────────────────────────────
-    def _plot_predicted_vs_target_strip(self, results):
-        try:
-            rows = []
-            for res in results:
-                tgt = res['target_value']
-                for model_name, runs in res['comparison_table'].items():
-                    for sol in runs:
-                        rows.append({
-                            "Model": model_name,
-                            "Target Value": tgt,
-                            "Predicted": sol['prediction'],
-                            "R2": sol['r2'],
-                            "MSE": sol['mse'],
-                            "ACC": sol['accuracy_like']
-                        })
-            df = pd.DataFrame(rows)
-
-            # legend labels with mean metrics
-            mean_metrics = df.groupby("Model")[["R2", "MSE", "ACC"]].mean()
-            lbl_map = {m: f"{m} (R²={r['R2']:.2f}, MSE={r['MSE']:.2f}, ACC={r['ACC']:.2f})"
-                       for m, r in mean_metrics.iterrows()}
-            df["ModelLbl"] = df["Model"].map(lbl_map)
-
-            plt.figure(figsize=(12, 6))
-            sns.stripplot(data=df, x="Target Value", y="Predicted",
-                          hue="ModelLbl", dodge=True, jitter=.2, alpha=.7)
-            xs = sorted(df["Target Value"].unique())
-            # plt.plot(xs, xs, 'k--', alpha=.3)
-            plt.title("Predicted vs Target (all PSO runs)")
-            plt.tight_layout()
-            return plot_to_base64(plt.gcf())
-        except Exception as e:
-            print(f"Strip plot failed: {e}")
-            return None
+            except Exception as e:
+                print(f"Tree solver failed for {model_name}, falling back to PSO: {str(e)}")
+                for result in results:
+                    result[model_name] = []
+
+        return solved_models
+
+    def _store_solutions(self, target_values, per_target_results):
+        """Add the best solution of every model and target to the solution store"""
+        solutions = {}
+        for model_name in self.objective_models:
+            targets, X, errors = [], [], []
+            for target_value, model_results in zip(target_values, per_target_results):
+                if model_results[model_name]:
+                    best = min(model_results[model_name], key=lambda sol: sol['error'])
+                    targets.append(float(target_value))
+                    X.append([best['solution'][f] for f in self.features])
+                    errors.append(best['error'])
+            if targets:
+                solutions[model_name] = (targets, X, errors)
 
-    # ───────────────────────────────────────────────────────────
-    # 6️⃣  SCATTER  (Predicted vs Target)  – best run per model
-    # ───────────────────────────────────────────────────────────
-    def _plot_predicted_vs_target_scatter(self, results):
         try:
-            rows = []
-            for res in results:
-                tgt = res['target_value']
-                for model_name, runs in res['comparison_table'].items():
-                    best = min(runs, key=lambda d: d['error'])  # one point per model
-                    rows.append({
-                        "Model": model_name,
-                        "Target Value": tgt,
-                        "Predicted": best['prediction'],
-                        "R2": best['r2']
-                    })
-            df = pd.DataFrame(rows)
-            mean_r2 = df.groupby("Model")["R2"].mean()
-            lbl_map = {m: f"{m} (R²={r:.2f})" for m, r in mean_r2.items()}
-            df["ModelLbl"] = df["Model"].map(lbl_map)
-
-            plt.figure(figsize=(12, 6))
-            sns.scatterplot(data=df, x="Target Value", y="Predicted",
-                            hue="ModelLbl", style="ModelLbl", s=100, alpha=.8)
-
-            mn = min(df["Target Value"].min(), df["Predicted"].min())
-            mx = max(df["Target Value"].max(), df["Predicted"].max())
-            # plt.plot([mn, mx], [mn, mx], 'k--', alpha=.3)
-            plt.grid(True, alpha=.2)
-            plt.title("Predicted vs Target (best PSO run per model)")
-            plt.tight_layout()
-            return plot_to_base64(plt.gcf())
+            self.solution_store.add(self.cache_key, solutions)
         except Exception as e:
-            print(f"Scatter plot failed: {e}")
-            return None
+            print(f"Failed to store solutions: {str(e)}")
 
-    def optimize_for_targets(self, target_values):
-        """Optimize for multiple target values with multiple runs per model"""
+    def _generate_graphs(self, results):
+        """Generate visualization graphs"""
+        return generate_graphs(results)
+
+    def optimize_for_targets(self, target_values, render_graphs=True, progress_callback=None):
+        """
+        Optimize for multiple target values with multiple runs per model.
+        With render_graphs=False the graphs are left for pso.graphs to render on request.
+        `progress_callback` receives partial results as PSO runs finish.
+        """
         results = []
+        n_solutions = self.pso_config.get('n_solutions', 5)
 
-        for target_value in target_values:
-            # Run multiple PSO optimizations per model
-            model_results = self._optimize_single_target(target_value, self.pso_config.get('n_solutions', 5))
+        per_target_results, fronts = self._optimize_targets(target_values, n_solutions, progress_callback)
+        if self.solution_store is not None:
+            self._store_solutions(target_values, per_target_results)
 
+        for k, (target_value, model_results) in enumerate(zip(target_values, per_target_results)):
             if not model_results:
                 continue
 
@@ -677,6 +1063,10 @@ class MLOptimizer:
                         best_model = model_name
                         best_solution = sol
 
+            if best_solution is None:
+                raise ValueError(f"No solution found for target {float(target_value)}: "
+                                 f"every optimization run failed")
+
             # Store results in the same format for compatibility
             result = {
                 'target_value': float(target_value),
@@ -688,6 +1078,7 @@ class MLOptimizer:
                     'prediction': best_solution['prediction'],
                     'target_value': float(target_value),
                     'error': best_solution['error'],
+                    'pre_refine_error': best_solution['pre_refine_error'],
                     'runtime': best_solution['runtime'],
                     'mse': best_solution['mse'],
                     'r2': best_solution['r2'],
@@ -695,11 +1086,12 @@ class MLOptimizer:
                     'y_pred_on_test': best_solution['y_pred_on_test']
                 },
                 'comparison_table': model_results,  # Each model maps to a list of solutions
+                'pareto_front': fronts[k] if fronts is not None else None,
             }
 
             results.append(result)
 
         # Generate all relevant graphs
-        graphs = self._generate_graphs(results)
+        graphs = self._generate_graphs(results) if render_graphs else None
 
         return {  "results": results,"combined_graphs": graphs}
@@ -3,12 +3,20 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from celery.result import AsyncResult
+from django.conf import settings
 import pandas as pd
 import numpy as np
+import base64
 import json
 import math
+import re
+import uuid
 
-from .tasks import run_optimization_task
+from .graph_cache import GraphCache
+from .graphs import GRAPH_RENDERERS, available_graphs, render_graph
+from .request_store import request_fingerprint
+from .results import COLUMNAR_FORMAT, from_columnar
+from .tasks import get_request_store, run_optimization_task
 
 
 def clean_float_values(obj):
@@ -34,18 +42,94 @@ def clean_float_values(obj):
         return obj
 
 
+def columnar_status_response(payload):
+    """
+    Status response for a columnar task result. Its arrays were made NaN-safe
+    when the task stored them, so they are returned as-is.
+    """
+    all_results = payload["results"]
+    response = {
+        "status": "SUCCESS",
+        "format": payload["format"],
+        "features": payload["features"],
+        "model_metrics": payload["model_metrics"],
+        "results": all_results,
+        "combined_graphs": payload.get("combined_graphs"),
+        "error": payload.get("error")
+    }
+
+    # Graphs not rendered by the task are fetched one by one from the graph endpoint
+    if response["combined_graphs"] is None and all_results:
+        response["graph_names"] = available_graphs(all_results)
+
+    if len(all_results) > 1:
+        response["best_solutions"] = [
+            {
+                'target_value': result_item['target_value'],
+                'best_model': result_item['best_model'],
+                'best_runtime': result_item['best_runtime'],
+                'best_fopt': result_item['best_fopt'],
+                'prediction': result_item['best_solution']['prediction'],
+                'error': result_item['best_solution']['error'],
+                **result_item['best_solution']['features'],
+            }
+            for result_item in all_results
+        ]
+
+    return response
+
+
+def reusable_task(task_id):
+    """Whether an earlier task may answer an identical request: it has not failed or errored"""
+    async_result = AsyncResult(task_id)
+    if async_result.state in ('FAILURE', 'REVOKED'):
+        return False
+    if async_result.state == 'SUCCESS':
+        result = async_result.result
+        return not (isinstance(result, dict) and result.get('error'))
+    return True
+
+
+def task_payload(task_id):
+    """Result of a finished task from the result backend or the request store, else None"""
+    async_result = AsyncResult(task_id)
+    if async_result.state == 'SUCCESS':
+        return async_result.get()
+    if async_result.state == 'PENDING':
+        # Unknown to the backend: queued, or its result has expired there
+        request_store = get_request_store()
+        if request_store is not None:
+            return request_store.get_result(task_id)
+    return None
+
+
 @api_view(['POST'])
 def optimize(request):
     """
     This endpoint enqueues the long-running PSO optimization in a Celery task,
-    and returns a task_id immediately.
+    and returns a task_id immediately. An identical request submitted within
+    PSO_REQUEST_TTL seconds gets the task_id of the first one instead
+    ("reused": true), unless it sets "reuse": false.
     """
     try:
         request_data = request.data
-        # Queue the Celery task
-        task = run_optimization_task.delay(request_data)
-        # Return the task ID so the client can poll the status
-        return Response({"task_id": task.id}, status=202)
+        request_store = get_request_store()
+        if request_store is None or request_data.get('reuse', True) is False:
+            # Queue the Celery task
+            task = run_optimization_task.delay(request_data)
+            # Return the task ID so the client can poll the status
+            return Response({"task_id": task.id, "reused": False}, status=202)
+
+        fingerprint = request_fingerprint({key: value for key, value in request_data.items() if key != 'reuse'})
+        task_id, reused = request_store.claim(fingerprint, str(uuid.uuid4()), is_reusable=reusable_task)
+        if not reused:
+            try:
+                run_optimization_task.apply_async(args=[request_data], task_id=task_id)
+            except Exception:
+                # The task never reached a worker; identical requests must not be pointed at it
+                request_store.release(fingerprint, task_id)
+                raise
+        return Response({"task_id": task_id, "reused": reused}, status=202)
 
     except KeyError as e:
         return Response({"error": f"Missing key in request data: {str(e)}"}, status=400)
@@ -60,13 +144,19 @@ def check_optimization_status(request, task_id):
     If finished, returns the result (the dictionary from the task).
     """
     async_result = AsyncResult(task_id)
-    if async_result.state == 'PENDING':
+    payload = task_payload(task_id)
+    if async_result.state == 'PENDING' and payload is None:
         return Response({"status": "PENDING"}, status=200)
     elif async_result.state == 'PROGRESS':
-        return Response({"status": "IN PROGRESS"}, status=200)
-    elif async_result.state == 'SUCCESS':
+        # Counts and best solutions so far, published by the task as PSO runs finish
+        meta = async_result.info or {}
+        return Response({"status": "IN PROGRESS", **meta}, status=200)
+    elif payload is not None:
         # Task completed, get the results
-        payload = async_result.get()
+        if payload.get("format") == COLUMNAR_FORMAT:
+            return Response(columnar_status_response(payload), status=200)
+
+        # Results stored by older tasks as one dict per PSO run
         all_results = payload.get("results", [])
         comb_graphs = payload.get("combined_graphs")
         
@@ -81,6 +171,10 @@ def check_optimization_status(request, task_id):
             "error": payload.get("error")
         }
 
+        # Graphs not rendered by the task are fetched one by one from the graph endpoint
+        if comb_graphs is None and all_results:
+            response["graph_names"] = available_graphs(all_results)
+
 
         best_solutions_list = []
         if all_results:  # ensure it's not None or empty
@@ -113,3 +207,42 @@ def check_optimization_status(request, task_id):
     else:
         # Other states: STARTED, RETRY, etc.
         return Response({"status": async_result.state}, status=200)
+
+
+@api_view(['GET'])
+def optimization_graph(request, task_id, graph_name):
+    """
+    Renders one named graph from the stored results of a finished optimization task.
+    The PNG is cached on disk, so each graph is drawn at most once per task.
+    """
+    if graph_name not in GRAPH_RENDERERS:
+        return Response({"error": f"Unknown graph: {graph_name}"}, status=404)
+    if not re.fullmatch(r'[\w-]+', task_id):
+        return Response({"error": "Invalid task id"}, status=400)
+
+    payload = task_payload(task_id)
+    if payload is None:
+        return Response({"status": AsyncResult(task_id).state, "error": "Task has not finished"}, status=409)
+
+    graph_cache = GraphCache(settings.PSO_GRAPH_CACHE_DIR,
+                             max_tasks=getattr(settings, 'PSO_GRAPH_CACHE_MAX_TASKS', 200))
+    png = graph_cache.get(task_id, graph_name)
+    if png is not None:
+        image = base64.b64encode(png).decode('utf-8')
+        return Response({"graph": graph_name, "image": image}, status=200)
+
+    if payload.get("format") == COLUMNAR_FORMAT:
+        payload = from_columnar(payload)
+    results = payload.get("results")
+    if not results:
+        return Response({"error": "Task has no results to plot"}, status=404)
+    if graph_name not in available_graphs(results):
+        return Response({"error": f"{graph_name} does not apply to the results of this task"}, status=404)
+
+    image = render_graph(graph_name, results)
+    if image is None:
+        return Response({"error": f"Failed to render {graph_name}"}, status=500)
+
+    graph_cache.put(task_id, graph_name, base64.b64decode(image))
+
+    return Response({"graph": graph_name, "image": image}, status=200)